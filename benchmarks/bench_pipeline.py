@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This script benchmarks the stages of the solve pipeline: loading the RANK 
+# and TANK models, solving for their steady states, finding the paths after 
+# each shock (also along a lambda ray, with and without re-using the 
+# Jacobian), the steady states along a lambda ray with and without the 
+# presolver, a small eta x lambda sweep and the export of plots. For each 
+# stage, it reports the cold (first call, including compilation) and the warm 
+# (best of the repetitions, or the second run) wall time, the growth of the 
+# resident memory over the stage, the peak memory of the process so far and 
+# the solves per second, and saves the results as JSON such that versions 
+# can be compared
+#
+# Run from the root of the repository, e.g.
+#     python benchmarks/bench_pipeline.py --compare benchmarks/results/old.json
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import sys
+import json
+import time as tm
+import argparse
+import platform
+import resource
+import tempfile
+
+sys.path.insert(0, os.getcwd()) # Make the rank_tank package importable
+
+import numpy as np
+
+###############################################################################
+###############################################################################
+
+def peak_memory_mb(children = False):
+    """Peak resident memory of this process (or of its finished children) 
+    over its whole lifetime, i.e. of all stages so far."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children 
+                               else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return usage/2**20 if sys.platform == 'darwin' else usage/2**10
+
+def current_memory_mb():
+    """Current resident memory of this process (None where /proc is not 
+    available, e.g. on macOS)."""
+    try:
+        with open('/proc/self/statm') as file:
+            pages = int(file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages*resource.getpagesize()/2**20
+
+def memory_usage(start, children = False):
+    """Memory entries of the results of a stage which started with the 
+    resident memory `start` (see `current_memory_mb`): the growth of the 
+    resident memory over the stage and the peak of the process so far (with 
+    `children`, also of its finished worker processes). The peak is that of 
+    the stage only if the stage used more memory than all stages before."""
+    end = current_memory_mb()
+    peak = peak_memory_mb()
+    if children:
+        peak = max(peak, peak_memory_mb(children = True))
+    return {'memory_growth_mb': None if start is None or end is None 
+            else end - start, 
+            'process_peak_memory_mb': peak}
+
+def time_calls(function, repeat):
+    """Wall times of `repeat` + 1 calls: the first (cold) one and the best of 
+    the following (warm) ones."""
+    times, memory = [], current_memory_mb()
+    for _ in range(repeat + 1):
+        start = tm.perf_counter()
+        function()
+        times.append(tm.perf_counter() - start)
+    return {'cold_s': times[0], 
+            'warm_s': min(times[1:]) if repeat > 0 else None, 
+            **memory_usage(memory)}
+
+###############################################################################
+###############################################################################
+
+# Stages
+
+def bench_models(paths, shocks, repeat):
+    """ep.load, solve_stst and find_path (per shock) for each model."""
+    import econpizza as ep
+    
+    results = {}
+    for name, path in paths.items():
+        results['load_' + name] = time_calls(lambda: ep.load(path), repeat)
+        model = ep.load(path)
+        results['solve_stst_' + name] = time_calls(model.solve_stst, repeat)
+        for shock in shocks:
+            stage = 'find_path_%s_%s' % (name, shock[0])
+            results[stage] = time_calls(lambda: model.find_path(shock = shock), 
+                                        repeat)
+            results[stage]['solves_per_s'] = 1/(results[stage]['warm_s'] or 
+                                                results[stage]['cold_s'])
+    return results
+
+def bench_reuse(paths, shock, lambda_sequence = np.linspace(0.1, 0.3, 9)):
+    """find_path of TANK along a lambda ray, each point warm-started from the 
+    previous one, with a fresh Jacobian at every point and with the 
+    factorized Jacobian of the previous point (reuse_jacobian, see 
+    `ModelHandle.find_path`). Also reports the largest difference between 
+    the paths of the two."""
+    from rank_tank.model_handle import ModelHandle
+    
+    handle = ModelHandle(paths['tank'])
+    results, paths_found = {}, {}
+    for reuse in (False, True):
+        times, guess, paths_found[reuse] = [], None, []
+        memory = current_memory_mb()
+        for ll in lambda_sequence:
+            handle.solve_stst({'lam': ll})
+            start = tm.perf_counter()
+            x, flag = handle.find_path(shock, guess = guess, 
+                                       reuse_jacobian = reuse)
+            times.append(tm.perf_counter() - start)
+            guess = None if flag else x
+            paths_found[reuse].append(np.asarray(x))
+        stage = 'find_path_ray_' + ('reuse' if reuse else 'fresh')
+        results[stage] = {'cold_s': times[0], 
+                          'warm_s': float(np.median(times[1:])), 
+                          'points': len(times), 
+                          'solves_per_s': len(times)/sum(times), 
+                          **memory_usage(memory)}
+    results['find_path_ray_reuse']['max_path_difference'] = float(max( 
+        np.max(np.abs(xx - yy)) for xx, yy in zip(paths_found[False], 
+                                                   paths_found[True])))
+    return results
+
+def bench_presolve(paths, lambda_sequence = np.linspace(0.1, 0.3, 9)):
+    """solve_stst of TANK along a lambda ray, from the initial guesses of the 
+    YAML file and warm-started from the previous point, with and without 
+    the presolver (see presolve.py; its own time is included). Also reports 
+    the iteration count of econpizza (where exposed, see `solver_info`) and 
+    the largest difference between the steady states of the two."""
+    from rank_tank.model_handle import ModelHandle
+    from rank_tank.instrumentation import solver_info
+    
+    results, steady_states = {}, {}
+    for presolve in (False, True):
+        handle = ModelHandle(paths['tank'], presolve = presolve)
+        handle.solve_stst() # Compilation, not timed
+        for warm in (False, True):
+            times, iterations, guess = [], [], None
+            memory = current_memory_mb()
+            steady_states[presolve, warm] = []
+            for ll in lambda_sequence:
+                start = tm.perf_counter()
+                result = handle.solve_stst({'lam': ll}, 
+                                           guess = guess if warm else None)
+                times.append(tm.perf_counter() - start)
+                iterations.append(solver_info(result).get('iterations'))
+                guess = handle.steady_state()
+                steady_states[presolve, warm].append( 
+                    np.array([handle.model['stst'][vv] 
+                              for vv in handle.variables]))
+            stage = 'solve_stst_ray_%s_%s' % ('warm' if warm else 'cold', 
+                                              'presolve' if presolve else 
+                                              'plain')
+            results[stage] = {'cold_s': times[0], 
+                              'warm_s': float(np.median(times[1:])), 
+                              'points': len(times), 
+                              'solves_per_s': len(times)/sum(times), 
+                              'iterations': None if None in iterations else 
+                              float(np.mean(iterations)), 
+                              **memory_usage(memory)}
+    for warm in (False, True):
+        stage = 'solve_stst_ray_%s_presolve' % ('warm' if warm else 'cold')
+        results[stage]['max_stst_difference'] = float(max( 
+            np.max(np.abs(xx - yy)) for xx, yy in 
+            zip(steady_states[False, warm], steady_states[True, warm])))
+    return results
+
+def bench_sweep(paths, shock, workers):
+    """A small fixed eta x lambda sweep (without solution cache), run twice 
+    on the same pool of workers: the first (cold) run includes starting the 
+    workers and compiling the models, the second (warm) one does not."""
+    from rank_tank.sweep import SweepExecutor, run_sweep
+    
+    eta_sequence = np.array([0.48, 1.])
+    lambda_sequence = np.array([0.1, 0.2, 0.3])
+    times, memory = [], current_memory_mb()
+    start = tm.perf_counter()
+    with SweepExecutor(paths['rank'], paths['tank'], workers) as executor:
+        for _ in range(2):
+            _, records = run_sweep(paths['rank'], paths['tank'], 
+                                   eta_sequence, lambda_sequence, shock, 
+                                   executor = executor)
+            times.append(tm.perf_counter() - start)
+            start = tm.perf_counter()
+    return {'sweep': {'cold_s': times[0], 'warm_s': times[1], 
+                      'points': len(records), 'workers': workers, 
+                      'solves_per_s': len(records)/times[1], 
+                      **memory_usage(memory, children = True)}}
+
+def bench_plots(n_figures, workers):
+    """Export of `n_figures` IRF plots as SVG into a temporary folder, twice: 
+    the first (cold) export includes starting the exporters, the second 
+    (warm) one re-uses them."""
+    import pandas as pd
+    from rank_tank.plotting import FigureSpec, render_figures
+    
+    data = pd.DataFrame({'Quarters': range(50), 
+                         'RANK': np.sin(np.arange(50)/5), 
+                         'TANK': np.cos(np.arange(50)/5)})
+    with tempfile.TemporaryDirectory() as directory:
+        specs = [FigureSpec(data, 'Figure %s' % ff, 
+                            path = os.path.join(directory, 'fig%s.svg' % ff), 
+                            columns = ['RANK', 'TANK']) 
+                 for ff in range(n_figures)]
+        results = time_calls(lambda: render_figures( 
+            specs, workers = workers, force = True, 
+            manifest = os.path.join(directory, 'manifest.json')), 1)
+    return {'plot_export': dict(results, figures = n_figures, 
+                                figures_per_s = n_figures/results['warm_s'])}
+
+###############################################################################
+###############################################################################
+
+def compare(results, previous, threshold):
+    """Stages which became slower by more than `threshold` (relative)."""
+    regressions = []
+    for stage, values in results['stages'].items():
+        old = previous['stages'].get(stage)
+        if old is None:
+            continue
+        for key in ('cold_s', 'warm_s'):
+            if values.get(key) and old.get(key) and \
+                    values[key] > (1 + threshold) * old[key]:
+                regressions.append((stage, key, old[key], values[key]))
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark the stages '
+                                     'of the RANK/TANK solve pipeline')
+    parser.add_argument('--repeat', type = int, default = 3, 
+                        help = 'number of warm repetitions per stage')
+    parser.add_argument('--workers', type = int, default = None, 
+                        help = 'worker processes of the sweep and the export')
+    parser.add_argument('--stages', nargs = '+', 
+                        default = ['models', 'reuse', 'presolve', 'sweep', 
+                                   'plots'], 
+                        choices = ['models', 'reuse', 'presolve', 'sweep', 
+                                   'plots'])
+    parser.add_argument('--output', default = None, 
+                        help = 'JSON file of the results (default: '
+                        'benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', default = None, 
+                        help = 'JSON file of earlier results to compare with')
+    parser.add_argument('--threshold', type = float, default = 0.2, 
+                        help = 'relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+    
+    absolute_path = os.getcwd()
+    paths = {name: os.path.join(absolute_path, "models", name + ".yaml") 
+             for name in ('rank', 'tank')}
+    shocks = [('e_z', 0.02), ('e_beta', 0.02)]
+    
+    stages = {}
+    if 'models' in args.stages:
+        stages.update(bench_models(paths, shocks, args.repeat))
+    if 'reuse' in args.stages:
+        stages.update(bench_reuse(paths, shocks[1]))
+    if 'presolve' in args.stages:
+        stages.update(bench_presolve(paths))
+    if 'sweep' in args.stages:
+        stages.update(bench_sweep(paths, shocks[0], args.workers))
+    if 'plots' in args.stages:
+        stages.update(bench_plots(13, args.workers))
+    
+    try:
+        from importlib.metadata import version
+        econpizza_version = version('econpizza')
+    except Exception:
+        econpizza_version = None
+    results = {'timestamp': tm.strftime('%Y-%m-%dT%H:%M:%S'), 
+               'python': platform.python_version(), 
+               'econpizza': econpizza_version, 
+               'machine': platform.platform(), 
+               'cpu_count': os.cpu_count(), 
+               'stages': stages}
+    
+    # Report and save
+    for stage, values in stages.items():
+        print('%-28s cold %8.3f s   warm %8s   memory growth %9s   process '
+              'peak %7.1f MB' % 
+              (stage, values['cold_s'], 
+               '%.3f s' % values['warm_s'] if values['warm_s'] else '-', 
+               '%.1f MB' % values['memory_growth_mb'] 
+               if values['memory_growth_mb'] is not None else '-', 
+               values['process_peak_memory_mb']))
+    
+    output = args.output or os.path.join(absolute_path, 'benchmarks', 
+                                         'results', 
+                                         tm.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok = True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent = 1)
+    print('Results saved to', output)
+    
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for stage, key, old, new in regressions:
+            print('REGRESSION %s (%s): %.3f s -> %.3f s' % (stage, key, old, 
+                                                            new))
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
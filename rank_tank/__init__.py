@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+
+Helper modules shared by run_models.py and run_loop_eta_lambda.py
+"""
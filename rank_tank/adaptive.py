@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the adaptive sweep over eta and lambda: starting from a 
+# coarse grid, the cells of the (eta, lambda) plane in which the TANK impact 
+# response relative to RANK changes fastest, or in which the feasibility of 
+# the solution flips, are refined recursively until the budget of model 
+# solves is used up
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pandas as pd
+from rank_tank.sweep import sweep_executor
+
+###############################################################################
+###############################################################################
+
+def cell_score(values):
+    """Refinement priority of a cell given the values at its corners: cells in 
+    which feasibility flips (some corners failed) come first, then the cells 
+    with the largest change of the impact response."""
+    values = np.asarray(values)
+    feasible = np.isfinite(values)
+    if not feasible.any():
+        return -np.inf # Nothing to learn inside an infeasible region
+    if not feasible.all():
+        return np.inf
+    return values.max() - values.min()
+
+def split_cell(cell):
+    """Split a cell ((eta_0, eta_1), (lam_0, lam_1)) into its four quarters."""
+    (e0, e1), (l0, l1) = cell
+    em, lm = (e0 + e1)/2, (l0 + l1)/2
+    return [((e0, em), (l0, lm)), ((em, e1), (l0, lm)), 
+            ((e0, em), (lm, l1)), ((em, e1), (lm, l1))]
+
+def corners(cell):
+    (e0, e1), (l0, l1) = cell
+    return [(e0, l0), (e1, l0), (e0, l1), (e1, l1)]
+
+def run_adaptive_sweep(rank_model, tank_model, eta_sequence, 
+                       lambda_sequence, specific_shock, variable = 'c', 
+                       impact = 1, percent = 100, budget = 200, 
+                       cells_per_round = None, min_width = (0.01, 0.005), 
+                       tol = 0.01, workers = None, cache_directory = None, 
+                       executor = None):
+    """Adaptive sweep starting from the coarse grid eta_sequence x 
+    lambda_sequence.
+    
+    In every round, the `cells_per_round` cells with the highest priority (see 
+    `cell_score`) are split into quarters; the new grid points (and the RANK 
+    models of new values of eta; RANK is solved once per eta) are solved in 
+    parallel. Every model solve counts against `budget`, and cells whose 
+    split would exceed it are skipped (the coarse grid is always solved). 
+    The sweep stops once no cell can be split within the budget, no cell 
+    changes by more than `tol` (in units of the impact response) or all cells 
+    are narrower than `min_width` (in eta, lambda). An open `SweepExecutor` 
+    may be given as `executor` to re-use its workers.
+    
+    Returns the scattered results (data frame with columns eta, lam, impact 
+    and error) and the list of all point records."""
+    
+    values = {} # Impact response relative to RANK for each point (NaN: failed)
+    errors = {}
+    impact_rank = {}
+    records = []
+    used = 0
+    
+    def new_points(points):
+        """The points (in order, without duplicates) which are not solved 
+        yet."""
+        return [pp for pp in dict.fromkeys(points) if pp not in values]
+    
+    def cost(points):
+        """Model solves needed for the new points: TANK for every point and 
+        RANK for every new eta."""
+        return len(points) + len(set(ee for ee, _ in points) - 
+                                 set(impact_rank))
+    
+    def solve(points, executor):
+        """Solve new points and store their impact responses."""
+        nonlocal used
+        points = new_points(points)
+        records_rank, records_tank = executor.solve_points( 
+            points, specific_shock, variable, impact, 
+            solved_etas = impact_rank)
+        impact_rank.update({ee: rr['impact'] if rr['error'] is None 
+                            else np.nan for ee, rr in records_rank.items()})
+        records.extend(records_rank.values())
+        records.extend(records_tank)
+        used += len(records_rank) + len(records_tank)
+        
+        for pp, rr in zip(points, records_tank):
+            values[pp] = percent * (rr['impact'] - impact_rank[pp[0]]) \
+                if rr['error'] is None else np.nan
+            errors[pp] = rr['error']
+    
+    eta_sequence = np.sort(eta_sequence)
+    lambda_sequence = np.sort(lambda_sequence)
+    cells = [((e0, e1), (l0, l1)) 
+             for e0, e1 in zip(eta_sequence[:-1], eta_sequence[1:]) 
+             for l0, l1 in zip(lambda_sequence[:-1], lambda_sequence[1:])]
+    
+    with sweep_executor(rank_model, tank_model, workers, cache_directory, 
+                        executor) as executor:
+        # Coarse grid
+        solve([(ee, ll) for ee in eta_sequence for ll in lambda_sequence], 
+              executor)
+        per_round = cells_per_round or executor.workers
+        
+        while used < budget:
+            # Cells which may still be refined, by priority
+            candidates = [cc for cc in cells 
+                          if cc[0][1] - cc[0][0] > min_width[0] and 
+                          cc[1][1] - cc[1][0] > min_width[1]]
+            scores = [cell_score([values[pp] for pp in corners(cc)]) 
+                      for cc in candidates]
+            order = [ii for ii in np.argsort(scores)[::-1] 
+                     if scores[ii] > tol]
+            if not order:
+                break
+            
+            # Refine the cells with the highest priority whose split fits 
+            # into the budget left
+            chosen, points = [], []
+            for ii in order:
+                if len(chosen) == per_round:
+                    break
+                split = points + [pp for sub in split_cell(candidates[ii])
+                                  for pp in corners(sub)]
+                if used + cost(new_points(split)) <= budget:
+                    chosen.append(candidates[ii])
+                    points = split
+            if not chosen:
+                break
+            cells = [cc for cc in cells if cc not in chosen] + \
+                [sub for cc in chosen for sub in split_cell(cc)]
+            solve(points, executor)
+    
+    points = pd.DataFrame([(ee, ll, vv, errors[(ee, ll)]) 
+                           for (ee, ll), vv in values.items()], 
+                          columns = ['eta', 'lam', 'impact', 'error'])
+    return points.sort_values(['eta', 'lam'], ignore_index = True), records
+
+def interpolate_surface(points, eta_grid, lambda_grid, method = 'linear'):
+    """Interpolate the scattered (feasible) results onto the regular grid 
+    eta_grid x lambda_grid. Returns a data frame like the impact data frame 
+    of the regular sweep (index: lambda, columns: eta); points outside of the 
+    hull of the feasible results are NaN."""
+    from scipy.interpolate import griddata
+    
+    feasible = points.dropna(subset = ['impact'])
+    ee, ll = np.meshgrid(eta_grid, lambda_grid)
+    surface = griddata(feasible[['eta', 'lam']].to_numpy(), 
+                       feasible['impact'].to_numpy(), (ee, ll), 
+                       method = method)
+    return pd.DataFrame(surface, index = lambda_grid, columns = eta_grid)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains a persistent on-disk cache of solved steady states and 
+# paths: entries are keyed by the hash of the model, the fixed values 
+# overriding the YAML file, the shock and the horizon, are stored as .npz 
+# files and are evicted in least-recently-used order once the cache exceeds 
+# its maximum size
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+
+###############################################################################
+###############################################################################
+
+def solution_key(model_hash, fixed_values, shock, horizon = None):
+    """Content-addressed key of a solution."""
+    content = json.dumps({'model': model_hash, 
+                          'fixed_values': {kk: float(vv) for kk, vv in 
+                                           sorted(fixed_values.items())}, 
+                          'shock': [shock[0], float(shock[1])], 
+                          'horizon': horizon}, sort_keys = True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+class SolutionCache:
+    """Cache of solved steady states and paths in `directory`, holding at most 
+    `max_bytes` bytes. The size of the cache is kept as a running total 
+    (from one scan of the directory and the entries written since), such 
+    that the directory is only scanned again once the total exceeds 
+    `max_bytes`; entries written by other processes sharing the directory 
+    are counted at that scan."""
+    
+    def __init__(self, directory = os.path.join('.cache', 'solutions'), 
+                 max_bytes = 2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = None # Running total of the bytes of the entries
+        os.makedirs(directory, exist_ok = True)
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+    
+    def get(self, key):
+        """Return the cached (x, flag, stst) for `key`, or None."""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                x = data['x']
+                flag = bool(data['flag'])
+                stst = dict(zip(data['stst_keys'].tolist(), 
+                                data['stst_values'].tolist()))
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+        
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return x, flag, stst
+    
+    def put(self, key, x, flag, stst):
+        """Store a solution with the boolean flag `flag` (the file is written 
+        atomically, such that several processes can share the cache) and 
+        evict old entries if the cache exceeds `max_bytes`."""
+        if self.size is None:
+            self.evict()
+        handle, tmp_path = tempfile.mkstemp(dir = self.directory, 
+                                            suffix = '.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.savez(file, x = np.asarray(x), flag = bool(flag), 
+                         stst_keys = np.array(list(stst.keys())), 
+                         stst_values = np.array(list(stst.values()), 
+                                                dtype = float))
+                size = file.tell()
+            try: # An entry which is replaced no longer counts
+                self.size -= os.path.getsize(self._path(key))
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, self._path(key))
+        except BaseException: # Do not leave the temporary file behind
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.size += size
+        if self.size > self.max_bytes:
+            self.evict()
+    
+    def evict(self):
+        """Remove the least recently used entries until the cache fits into 
+        `max_bytes` (scanning the directory for the sizes and the times of 
+        last use of all entries)."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError: # Removed by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.size = total
+    
+    def clear(self):
+        """Remove all entries."""
+        max_bytes, self.max_bytes = self.max_bytes, -1
+        self.evict()
+        self.max_bytes = max_bytes
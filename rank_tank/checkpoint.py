@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the append-only checkpoint store of the sweep: every 
+# solved (eta, lambda, shock) point record is appended to a JSON lines file 
+# as soon as it is solved, such that an interrupted sweep can be restarted 
+# (skipping the completed points) and the grid can be extended by solving 
+# only the new points
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import json
+import numpy as np
+
+###############################################################################
+###############################################################################
+
+def point_key(record):
+    """Key of a point record: the model and the hash of its YAML file, all of 
+    its fixed values which differ from those of the YAML file (see 
+    `ModelHandle.canonical_fixed_values`), the horizon, the shock, the 
+    measured response and the metrics extracted (values are rounded, such 
+    that grid values built by np.arange are recognised)."""
+    def rounded(value):
+        return None if value is None else round(float(value), 10)
+    fixed_values = tuple(sorted((kk, rounded(vv)) for kk, vv in 
+                                record.get('fixed_values', {}).items()))
+    return (record['model'], record.get('model_hash'), fixed_values, 
+            record.get('horizon'), record['shock'], rounded(record['size']), 
+            record['variable'], record['period'], record.get('metric_spec'))
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+class CheckpointStore:
+    """Append-only store of point records in the JSON lines file `path`."""
+    
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+    
+    def completed(self):
+        """Dictionary of all stored records by their `point_key` (a record 
+        stored later replaces an earlier one of the same point)."""
+        records = {}
+        try:
+            with open(self.path) as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError: # Line cut off by an interruption
+                        continue
+                    records[point_key(record)] = record
+        except FileNotFoundError:
+            pass
+        return records
+    
+    def append(self, records):
+        """Append the records of solved points and make sure they reach the 
+        disk. Records with a failure reason are not stored, such that a 
+        resumed sweep tries these points again."""
+        with open(self.path, 'a') as file:
+            for record in records:
+                if record.get('reason') is not None:
+                    continue
+                file.write(json.dumps(record, default = _to_json) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module maps the feasibility frontier of TANK in the (eta, lambda) 
+# space: along each eta ray, the largest value of lambda for which the steady 
+# state and the path can be solved is found by bisection. Later sweeps can 
+# then prune the points beyond the frontier before attempting to solve them
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pandas as pd
+from rank_tank.sweep import sweep_executor, _solve_task
+
+###############################################################################
+###############################################################################
+
+def is_feasible(record):
+    """A point is feasible if both stages were solved and `find_path` did not 
+    return a flag (the boolean flag of `ModelHandle.find_path`)."""
+    return record['error'] is None and record['flag'] is False
+
+class FeasibilityFrontier:
+    """Feasibility frontier along the eta rays.
+    
+    `frontier` is a data frame with one row per eta holding the largest 
+    feasible (lam_feasible) and the smallest infeasible (lam_infeasible) value 
+    of lambda found (NaN if all/no tested values were feasible); `points` 
+    holds all tested points with their failure reason and flag. Feasibility 
+    is assumed to be lost once lambda exceeds the frontier, which is the case 
+    for the share of hand-to-mouth agents."""
+    
+    def __init__(self, frontier, points):
+        self.frontier = frontier.sort_values('eta', ignore_index = True)
+        self.points = points
+    
+    def limit(self, eta):
+        """Smallest value of lambda known to be infeasible at `eta`; between 
+        two mapped rays, the larger limit of the two is used (such that 
+        pruning stays conservative)."""
+        etas = self.frontier['eta'].to_numpy()
+        limits = self.frontier['lam_infeasible'].fillna(np.inf).to_numpy()
+        if eta <= etas[0]:
+            return limits[0] if np.isclose(eta, etas[0]) else np.inf
+        if eta >= etas[-1]:
+            return limits[-1] if np.isclose(eta, etas[-1]) else np.inf
+        upper = np.searchsorted(etas, eta)
+        if np.isclose(eta, etas[upper]):
+            return limits[upper]
+        return max(limits[upper - 1], limits[upper])
+    
+    def is_outside(self, eta, lam):
+        """True if (eta, lam) lies beyond the frontier."""
+        return lam >= self.limit(eta)
+    
+    def save(self, path):
+        """Save the frontier (the tested points go to a second file with 
+        suffix _points)."""
+        root, extension = path.rsplit('.', 1)
+        self.frontier.to_csv(path, index = False)
+        self.points.to_csv(root + '_points.' + extension, index = False)
+    
+    @classmethod
+    def load(cls, path):
+        root, extension = path.rsplit('.', 1)
+        return cls(pd.read_csv(path), 
+                   pd.read_csv(root + '_points.' + extension))
+
+###############################################################################
+###############################################################################
+
+def map_frontier(rank_model, tank_model, eta_sequence, lam_low, 
+                 lam_high, specific_shock, tol = 0.005, workers = None, 
+                 cache_directory = None, executor = None):
+    """Map the feasibility frontier of TANK between `lam_low` and `lam_high` 
+    for each eta by bisection (to a precision of `tol` in lambda). The rays 
+    are bisected simultaneously, i.e. every round solves one point per ray in 
+    parallel (in the workers of `executor`, if an open `SweepExecutor` is 
+    given). If the lower end of a ray is infeasible but the upper end is 
+    feasible, feasibility is not lost along the ray as assumed, such that the 
+    ray is not bisected and gets no limit (none of its points are pruned). 
+    Returns a `FeasibilityFrontier`."""
+    tested = []
+    
+    def test(points, executor):
+        tasks = [('tank', {'eta': ee, 'lam': ll}, specific_shock, 'c', 1) 
+                 for ee, ll in points]
+        records = executor.map(_solve_task, tasks)
+        tested.extend(records)
+        return [is_feasible(rr) for rr in records]
+    
+    eta_sequence = list(eta_sequence)
+    lower = {ee: np.nan for ee in eta_sequence} # Largest feasible value
+    upper = {ee: np.nan for ee in eta_sequence} # Smallest infeasible value
+    
+    with sweep_executor(rank_model, tank_model, workers, cache_directory, 
+                        executor) as executor:
+        # Ends of the bracket
+        feasible_low = test([(ee, lam_low) for ee in eta_sequence], executor)
+        feasible_high = test([(ee, lam_high) for ee in eta_sequence], executor)
+        for ee, fl, fh in zip(eta_sequence, feasible_low, feasible_high):
+            if fh: # Also if the lower end fails: no limit along the ray
+                lower[ee] = lam_high
+            elif fl:
+                lower[ee], upper[ee] = lam_low, lam_high
+            else: # Not even the lower end works
+                upper[ee] = lam_low
+        
+        # Bisection along all rays with a bracket
+        active = [ee for ee in eta_sequence 
+                  if np.isfinite(lower[ee]) and np.isfinite(upper[ee])]
+        while active:
+            midpoints = [(ee, (lower[ee] + upper[ee])/2) for ee in active]
+            for (ee, ll), feasible in zip(midpoints, test(midpoints, executor)):
+                if feasible:
+                    lower[ee] = ll
+                else:
+                    upper[ee] = ll
+            active = [ee for ee in active if upper[ee] - lower[ee] > tol]
+    
+    frontier = pd.DataFrame({'eta': eta_sequence, 
+                             'lam_feasible': [lower[ee] for ee in eta_sequence], 
+                             'lam_infeasible': [upper[ee] for ee in eta_sequence]})
+    points = pd.DataFrame(tested)[['eta', 'lam', 'flag', 'reason', 'error']]
+    points['feasible'] = [is_feasible(rr) for rr in tested]
+    return FeasibilityFrontier(frontier, points)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the (opt-in) instrumentation of the solve pipeline: 
+# every model solve emits one structured record with the wall time of each 
+# stage (parsing, loading/compilation, steady state, path, cache look-up, 
+# plot export), the iteration count and residual of the steady state solve 
+# and the iteration count and flag of find_path. Records are written as JSON 
+# lines (one file per process, such that the workers of the sweep can write 
+# concurrently) and can be aggregated into a hotspot summary at the end of a 
+# run
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import re
+import json
+import glob
+import time as tm
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+###############################################################################
+###############################################################################
+
+# The directory of the records is passed on to the worker processes through 
+# this environment variable (worker processes inherit the environment)
+ENVIRONMENT_VARIABLE = 'RANK_TANK_INSTRUMENT'
+
+class NullRecorder:
+    """Recorder which does nothing (instrumentation disabled)."""
+    
+    enabled = False
+    
+    @contextmanager
+    def stage(self, name):
+        yield
+    
+    @contextmanager
+    def solve_record(self, **fields):
+        yield {}
+
+class Recorder:
+    """Recorder writing its records to `directory`."""
+    
+    enabled = True
+    
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok = True)
+        self.path = os.path.join(directory, 'records-%s.jsonl' % os.getpid())
+        self.current = None # Record of the solve in progress
+    
+    def emit(self, record):
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(record, default = str) + '\n')
+    
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; the time is added to the record of the solve in 
+        progress (or emitted as a record of its own)."""
+        start = tm.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = tm.perf_counter() - start
+            if self.current is None:
+                self.emit({'pid': os.getpid(), 'stages': {name: elapsed}})
+            else:
+                stages = self.current['stages']
+                stages[name] = stages.get(name, 0.) + elapsed
+    
+    @contextmanager
+    def solve_record(self, **fields):
+        """Collect the record of one model solve (fields such as the flag can 
+        be added to the yielded dictionary) and emit it at the end."""
+        record = dict(fields, pid = os.getpid(), stages = {}, error = None)
+        outer, self.current = self.current, record
+        try:
+            yield record
+        except Exception as error:
+            record['error'] = repr(error)
+            raise
+        finally:
+            self.current = outer
+            self.emit(record)
+
+_recorder = {}
+
+def enable(directory, clear = True):
+    """Enable the instrumentation in this process and in all worker processes 
+    started afterwards. With `clear`, records of earlier runs are removed."""
+    if clear:
+        for path in glob.glob(os.path.join(directory, 'records-*.jsonl')):
+            os.remove(path)
+    os.environ[ENVIRONMENT_VARIABLE] = directory
+    _recorder.clear()
+
+def disable():
+    """Disable the instrumentation in this process and in all worker 
+    processes started afterwards (the records written are kept)."""
+    os.environ.pop(ENVIRONMENT_VARIABLE, None)
+    _recorder.clear()
+
+def get_recorder():
+    """The recorder of this process (a `NullRecorder` unless enabled)."""
+    directory = os.environ.get(ENVIRONMENT_VARIABLE)
+    if 'recorder' not in _recorder or _recorder['directory'] != directory:
+        _recorder['directory'] = directory
+        _recorder['recorder'] = NullRecorder() if not directory else \
+            Recorder(directory)
+    return _recorder['recorder']
+
+def solver_info(result):
+    """Iteration count and residual of the result of a steady state solve (as 
+    far as the installed econpizza version exposes them)."""
+    info = {}
+    get = result.get if isinstance(result, dict) else \
+        (lambda key: getattr(result, key, None))
+    for key in ('niter', 'nit', 'iterations'):
+        if get(key) is not None:
+            info['iterations'] = int(get(key))
+            break
+    if get('fun') is not None:
+        info['residual'] = float(np.max(np.abs(get('fun'))))
+    return info
+
+def path_iterations(output):
+    """Iteration count of the Newton method of `find_path` from its verbose 
+    output (econpizza does not return it), or None if the output has no 
+    iterations."""
+    counts = re.findall(r'Iteration\s+(\d+)', output)
+    return int(counts[-1]) if counts else None
+
+###############################################################################
+###############################################################################
+
+def load_records(directory):
+    """All records written to `directory` (by all processes)."""
+    records = []
+    for path in sorted(glob.glob(os.path.join(directory, 'records-*.jsonl'))):
+        with open(path) as file:
+            records += [json.loads(line) for line in file if line.strip()]
+    return records
+
+def hotspot_summary(directory):
+    """Aggregate the stage times of all records: number of calls, total, mean 
+    and maximum wall time and share of the total time per stage (sorted by 
+    total time). Note that the stages of different processes overlap in wall 
+    time."""
+    rows = [(stage, elapsed) for record in load_records(directory) 
+            for stage, elapsed in record['stages'].items()]
+    if not rows:
+        return pd.DataFrame(columns = ['calls', 'total_s', 'mean_s', 'max_s', 
+                                       'share'])
+    times = pd.DataFrame(rows, columns = ['stage', 'seconds'])
+    summary = times.groupby('stage')['seconds'].agg(calls = 'count', 
+                                                    total_s = 'sum', 
+                                                    mean_s = 'mean', 
+                                                    max_s = 'max')
+    summary['share'] = summary['total_s']/summary['total_s'].sum()
+    return summary.sort_values('total_s', ascending = False)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the post-processing of the IRFs: one vectorized 
+# transform turns the paths of all models into percent deviations from steady 
+# state for all requested variables at once
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pandas as pd
+
+###############################################################################
+###############################################################################
+
+def deviations(x, indices, horizon, percent = 100):
+    """(Percent) deviations of the columns `indices` of the path(s) `x` from 
+    steady state for the first `horizon` periods. `x` is either a single path 
+    (time x variable) or a stack of paths (... x time x variable); by 
+    construction, the last value of each path is the steady state."""
+    x = np.asarray(x)[..., indices]
+    stst = x[..., -1:, :]
+    return percent * (x[..., :horizon, :] - stst)/stst
+
+def percent_deviations(paths, variables, varlists, horizon, percent = 100, 
+                       shock_labels = None):
+    """Percent deviations from steady state of the variables in `varlists` for 
+    all models at once.
+    
+    `paths`, `variables` and `varlists` are dictionaries keyed by the model 
+    name, holding the path(s) (time x variable, or shock x time x variable), 
+    the list of variables of the model and the variables to be extracted. 
+    
+    Returns a data frame indexed by the quarter (and by the shock, with labels 
+    `shock_labels`, for stacked paths) with columns (model, variable)."""
+    frames = {}
+    for name, x in paths.items():
+        indices = [variables[name].index(v) for v in varlists[name]]
+        irfs = deviations(x, indices, horizon, percent)
+        
+        if irfs.ndim == 3: # Stack of paths: one block of rows per shock
+            labels = shock_labels or list(range(irfs.shape[0]))
+            index = pd.MultiIndex.from_product([labels, range(irfs.shape[1])], 
+                                               names = ['Shock', 'Quarters'])
+            irfs = irfs.reshape(-1, irfs.shape[-1])
+        else:
+            index = pd.RangeIndex(irfs.shape[0], name = 'Quarters')
+        
+        frames[name] = pd.DataFrame(irfs, index = index, 
+                                    columns = list(varlists[name]))
+    
+    return pd.concat(frames, axis = 1, names = ['Model', 'Variable'])
+
+def irf_frame(irfs, columns, shock = None):
+    """Data frame for plotting: a 'Quarters' column plus one column per entry 
+    of `columns`, a dictionary mapping the column label to a (model, variable) 
+    column of `irfs` (as returned by `percent_deviations`). For stacked paths, 
+    `shock` selects the block of rows of one shock."""
+    if shock is not None:
+        irfs = irfs.xs(shock, level = 'Shock')
+    frame = irfs[list(columns.values())]
+    frame.columns = list(columns.keys())
+    return frame.rename_axis('Quarters').reset_index()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the linear (first-order) fast path of the sweep: the 
+# equations of a model are linearized around its steady state (with the 
+# Jacobians of the compiled equations of econpizza) and the path after a shock 
+# is the solution of the stacked, sparse linear system. Points at which the 
+# linear path hits the ZLB (i.e. the notional nominal interest rate falls 
+# below one, where max(1, Rn) has a kink) or is far from the non-linear path 
+# (as estimated by one Newton correction) are solved by the non-linear solver 
+# instead, and a 
+# sample of the remaining points is verified non-linearly to report the 
+# accuracy of the surface
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank.model_handle import SolveError, deviation_scale
+from rank_tank.sweep import (worker_handle, impact_response, impact_frame, 
+                             sweep_executor, _solve_task)
+
+###############################################################################
+###############################################################################
+
+# Linear paths
+
+_compiled = {} # Compiled Jacobian and residual functions per model
+_orderings = {} # Fill-reducing column orderings per model and horizon
+_path_jacobians = {} # Compiled Jacobians along a path per model
+
+def model_functions(handle):
+    """Jitted functions of the model of `handle` (compiled once per model and 
+    process): the Jacobians of the equations with respect to the lagged, 
+    current and future variables and the shocks, and the residuals of the 
+    equations along a whole path. The functions take the arguments in the 
+    order (xlag, x, xprime, xss, shocks, pars)."""
+    if handle.model_hash not in _compiled:
+        import jax
+        
+        eqns = handle.model['context']['func_eqns']
+        def func(xlag, x, xprime, xss, shocks, pars):
+            # econpizza 0.6 takes the parameters before the shocks: pass both 
+            # by keyword
+            return eqns(xlag, x, xprime, xss, pars = pars, shocks = shocks)
+        
+        jacobians = jax.jit(jax.jacfwd(func, argnums = (0, 1, 2, 4)))
+        
+        def residuals(x, xss, shocks, pars):
+            # x holds the initial state, the path and the terminal state
+            return jax.vmap(lambda xlag, xx, xprime, ee: func( 
+                xlag, xx, xprime, xss, ee, pars))(x[:-2], x[1:-1], x[2:], 
+                                                  shocks)
+        _compiled[handle.model_hash] = jacobians, jax.jit(residuals)
+    return _compiled[handle.model_hash]
+
+def sparse_factor(handle, system):
+    """LU factorization of the stacked linear `system` of the model of 
+    `handle` (a sparse matrix). The sparsity pattern of the system depends 
+    only on the equations of the model and on its size, not on the parameter 
+    point, such that the fill-reducing column ordering of the factorization 
+    is computed once per model and size and re-used at all other points, 
+    which then only need the numeric factorization. Returns the function 
+    solving the system for a vector or a matrix of right-hand sides."""
+    from scipy.sparse.linalg import splu
+    
+    system = system.tocsc()
+    key = handle.model_hash, system.shape
+    if key not in _orderings:
+        factor = splu(system)
+        # Column j of the permuted system is column perm_c^{-1}[j]
+        _orderings[key] = np.argsort(factor.perm_c)
+        return factor.solve
+    
+    # Solve with the columns in the cached order: A[:, p] y = b, x[p] = y
+    order = _orderings[key]
+    factor = splu(system[:, order], permc_spec = 'NATURAL')
+    
+    def solve(rhs):
+        dx = np.empty_like(rhs)
+        dx[order] = factor.solve(rhs)
+        return dx
+    return solve
+
+def sparse_solve(handle, system, rhs):
+    """Solve the stacked linear `system` of the model of `handle` for `rhs` 
+    (a vector or a matrix of right-hand sides, see `sparse_factor`)."""
+    return sparse_factor(handle, system)(rhs)
+
+def linear_system(handle, horizon = 200):
+    """Equations of the model of `handle` (with its steady state solved) 
+    F(x_{t-1}, x_t, x_{t+1}, e_t) linearized around the steady state and 
+    stacked over the `horizon` - 1 periods between the initial and the 
+    terminal steady state (like the paths of `find_path` with this horizon). 
+    
+    Returns the block tridiagonal system (sparse), the Jacobian of the 
+    equations with respect to the shocks, the steady state and the vector 
+    of parameters."""
+    from scipy import sparse
+    
+    model = handle.model
+    xss = np.array([model['stst'][vv] for vv in model['variables']])
+    pars = np.array([model['pars'][pp] for pp in model['parameters']])
+    e0 = np.zeros(len(model['shocks']))
+    jacobians, _ = model_functions(handle)
+    
+    A, B, C, D = (np.asarray(jj) for jj in jacobians(xss, xss, xss, xss, e0, 
+                                                      pars))
+    periods = horizon - 1
+    system = sparse.kron(sparse.eye(periods), B) + \
+        sparse.kron(sparse.eye(periods, k = -1), A) + \
+        sparse.kron(sparse.eye(periods, k = 1), C)
+    return system, D, xss, pars
+
+def linear_path(handle, shock, horizon = 200):
+    """First-order path of the model of `handle` (with its steady state 
+    solved) after `shock`: the stacked linear system of the horizon 
+    `horizon` (see `linear_system`) is solved as a sparse system.
+    
+    Returns the path (in levels, with the initial and the terminal steady 
+    state as first and last row) and its estimated error relative to the 
+    size of the response: the largest Newton correction of the residuals of 
+    the non-linear equations along the path (the linear system solved for 
+    them), relative to the largest deviation of the path from the steady 
+    state (both scaled by `deviation_scale`)."""
+    model = handle.model
+    system, D, xss, pars = linear_system(handle, horizon)
+    _, residuals = model_functions(handle)
+    solve = sparse_factor(handle, system)
+    
+    shocks = np.zeros((horizon - 1, len(model['shocks'])))
+    shocks[0, model['shocks'].index(shock[0])] = shock[1]
+    rhs = np.zeros((horizon - 1)*len(xss))
+    rhs[:len(xss)] = -D @ shocks[0]
+    
+    dx = solve(rhs).reshape(horizon - 1, len(xss))
+    x = np.vstack((xss, xss + dx, xss))
+    correction = solve(np.asarray(residuals(x, xss, shocks, pars)).ravel())
+    scale = deviation_scale(xss)
+    error = float(np.max(np.abs(correction.reshape(dx.shape))/scale)/
+                  max(np.max(np.abs(dx)/scale), np.finfo(float).tiny))
+    return x, error
+
+def newton_path(handle, x, xlag, xss, shocks, pars, tol, max_iter):
+    """Solve the stacked non-linear system for the path `x` (period x 
+    variable) from the state `xlag` by Newton's method with the Jacobians 
+    along the path. Returns the path and whether it converged."""
+    from scipy import sparse
+    from scipy.sparse.linalg import spsolve
+    import jax
+    
+    if handle.model_hash not in _path_jacobians:
+        jacobians, _ = model_functions(handle)
+        _path_jacobians[handle.model_hash] = jax.jit(jax.vmap( 
+            jacobians, in_axes = (0, 0, 0, None, 0, None)))
+    _, residuals = model_functions(handle)
+    
+    horizon, n = x.shape
+    for _ in range(max_iter):
+        full = np.vstack((xlag, x, xss))
+        error = np.asarray(residuals(full, xss, shocks, pars))
+        if np.max(np.abs(error)) < tol:
+            return x, True
+        A, B, C, _ = (np.asarray(jj) for jj in _path_jacobians[ 
+            handle.model_hash](full[:-2], full[1:-1], full[2:], xss, shocks, 
+                               pars))
+        system = sparse.block_diag(B) + \
+            sparse.bmat([[None, sparse.block_diag(C[:-1])], 
+                         [sparse.csr_matrix((n, n)), None]]) + \
+            sparse.bmat([[None, sparse.csr_matrix((n, n))], 
+                         [sparse.block_diag(A[1:]), None]])
+        x = x - spsolve(system.tocsc(), error.ravel()).reshape(horizon, n)
+    return x, False
+
+def solve_linear_point(name, fixed_values, specific_shock, variable, impact, 
+                       horizon = 200, tol = 0.1, zlb = ('Rn', 1.)):
+    """Linear counterpart of `solve_point` (see sweep.py): the record holds 
+    the impact response of the linear path, its estimated error relative to 
+    the size of the response (see `linear_path`) and whether it hits the ZLB 
+    (the variable zlb[0] falls below zlb[1]). Points where it does or where 
+    the error exceeds `tol` are marked with `linear_ok` False."""
+    record = dict(fixed_values, model = name, shock = specific_shock[0], 
+                  size = specific_shock[1], variable = variable, 
+                  period = impact, impact = np.nan, flag = None, 
+                  reason = None, error = None, method = 'linear', 
+                  path_error = np.nan, zlb = None, linear_ok = False)
+    try:
+        handle = worker_handle(name)
+        try:
+            handle.solve_stst(fixed_values)
+        except Exception as error:
+            raise SolveError('steady_state', error) from error
+        x, path_error = linear_path(handle, specific_shock, horizon)
+        record.update(impact = impact_response(handle, x, variable, impact), 
+                      path_error = path_error)
+        if zlb[0] in handle['variables']:
+            record['zlb'] = bool(np.min(x[:, handle['variables'].index( 
+                zlb[0])]) < zlb[1])
+        record['linear_ok'] = path_error <= tol and not record['zlb']
+    except SolveError as error:
+        record.update(reason = error.stage, error = repr(error.error))
+    except Exception as error:
+        record.update(reason = 'other', error = repr(error))
+    return record
+
+def _solve_linear_ray_task(task):
+    """Linear records of RANK and of TANK along the lambda grid for one 
+    eta (used as the function mapped by the pool, such that each worker 
+    compiles the Jacobians once)."""
+    ee, lambda_sequence, specific_shock, variable, impact, kwargs = task
+    records = [solve_linear_point('rank', {'eta': ee}, specific_shock, 
+                                  variable, impact, **kwargs)]
+    records += [solve_linear_point('tank', {'eta': ee, 'lam': ll}, 
+                                   specific_shock, variable, impact, **kwargs)
+                for ll in lambda_sequence]
+    return records
+
+###############################################################################
+###############################################################################
+
+# The linear sweep
+
+def run_linear_sweep(rank_model, tank_model, eta_sequence, lambda_sequence, 
+                     specific_shock, variable = 'c', impact = 1, 
+                     percent = 100, horizon = 200, tol = 0.1, 
+                     zlb = ('Rn', 1.), verify = 5, workers = None, 
+                     cache_directory = None, executor = None):
+    """Sweep over eta and lambda with the linear fast path: all points are 
+    first solved to first order (one task per eta ray, see 
+    `solve_linear_point`); the points hitting the ZLB, with an estimated 
+    path error above `tol` or failing otherwise are then solved by the 
+    non-linear solver, and `verify` of the remaining TANK points (spread over 
+    the grid) are solved non-linearly as well to measure the error of the 
+    linear ones.
+    
+    Each TANK point is relative to the RANK point of the same eta solved 
+    with the same method (where the linear RANK point is flagged, all points 
+    of its eta are solved non-linearly).
+    
+    Returns the data frame of the TANK impact response relative to RANK 
+    (index: lambda, columns: eta), the list of all point records (with the 
+    `method` used; the RANK point of an eta with both linear and non-linear 
+    TANK points has a record of each method) and a report with the number of linear and non-linear 
+    points and the largest error of the verified points (in the units of the 
+    data frame)."""
+    lambda_sequence = np.sort(lambda_sequence)
+    kwargs = {'horizon': horizon, 'tol': tol, 'zlb': zlb}
+    tasks = [(ee, lambda_sequence, specific_shock, variable, impact, kwargs)
+             for ee in eta_sequence]
+    
+    with sweep_executor(rank_model, tank_model, workers, cache_directory, 
+                        executor) as executor:
+        records = [rr for result in executor.map(_solve_linear_ray_task, tasks)
+                   for rr in result]
+        
+        # Points which need the non-linear solver (the whole eta column where 
+        # the linear RANK point does, as the linear TANK points are compared 
+        # with the linear RANK point of the same eta), and a sample of the 
+        # others (every k-th of the linear TANK points) for the verification
+        rank_ok = {rr['eta']: rr['linear_ok'] for rr in records
+                   if rr['model'] == 'rank'}
+        flagged = [ii for ii, rr in enumerate(records)
+                   if not rr['linear_ok'] or not rank_ok[rr['eta']]]
+        linear = [ii for ii, rr in enumerate(records)
+                  if rr['model'] == 'tank' and rr['linear_ok'] and 
+                  rank_ok[rr['eta']]]
+        verified = linear[::max(1, len(linear)//verify)][:verify] \
+            if verify > 0 else []
+        nonlinear = sorted(set(flagged + verified))
+        # TANK points solved non-linearly are compared with the non-linear 
+        # RANK model of the same eta, which is solved in addition to the 
+        # linear one where the latter is kept for the other points
+        etas = set(records[ii]['eta'] for ii in nonlinear)
+        rank_nonlinear = [ii for ii, rr in enumerate(records)
+                          if rr['model'] == 'rank' and rr['eta'] in etas and 
+                          ii not in nonlinear]
+        solved = executor.map(_solve_task, [ 
+            (records[ii]['model'], {kk: records[ii][kk] for kk in ('eta', 'lam')
+                                    if kk in records[ii]}, 
+             specific_shock, variable, impact)
+            for ii in nonlinear + rank_nonlinear])
+    
+    solved = dict(zip(nonlinear + rank_nonlinear, solved))
+    for ii, rr in solved.items():
+        rr.update(method = 'nonlinear', 
+                  path_error = records[ii]['path_error'], 
+                  zlb = records[ii]['zlb'], 
+                  linear_ok = records[ii]['linear_ok'])
+    
+    # Error of the linear impact responses relative to RANK at the verified 
+    # points: the linear relative to the linear RANK and the non-linear 
+    # relative to the non-linear RANK, as in the data frame
+    impact_rank = {(rr['eta'], rr['method']): rr['impact']
+                   for rr in records + list(solved.values())
+                   if rr['model'] == 'rank' and rr['error'] is None}
+    errors = []
+    for ii in verified:
+        ee = records[ii]['eta']
+        if solved[ii]['error'] is not None or \
+                (ee, 'nonlinear') not in impact_rank:
+            continue
+        linear_value = records[ii]['impact'] - impact_rank[ee, 'linear']
+        nonlinear_value = solved[ii]['impact'] - impact_rank[ee, 'nonlinear']
+        errors.append(percent*abs(linear_value - nonlinear_value))
+    
+    points = len(records)
+    for ii in nonlinear:
+        records[ii] = solved[ii]
+    records += [solved[ii] for ii in rank_nonlinear]
+    
+    # Each TANK point relative to the RANK point of the same eta and method
+    frame = impact_frame([rr for rr in records if rr['method'] == 'linear'], 
+                         eta_sequence, lambda_sequence, percent)
+    frame = frame.fillna(impact_frame([rr for rr in records
+                                       if rr['method'] == 'nonlinear'], 
+                                      eta_sequence, lambda_sequence, percent))
+    
+    report = {'points': points, 'linear': points - len(nonlinear), 
+              'nonlinear': len(solved), 'flagged': len(flagged), 
+              'verified': len(errors), 
+              'max_error': max(errors) if errors else np.nan}
+    return frame, records, report
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the metrics extracted from every solved path of a 
+# sweep: instead of only the impact response of one variable, a configurable 
+# set of metrics (impact, peak, trough, half-life, cumulative discounted 
+# response and time to return to steady state) is computed for many variables 
+# in one vectorized pass over the path and kept in the point record
+###############################################################################
+###############################################################################
+
+# Import packages
+import json
+import hashlib
+from dataclasses import dataclass, asdict
+import numpy as np
+from rank_tank.model_handle import deviation_scale
+
+###############################################################################
+###############################################################################
+
+all_metrics = ('impact', 'peak', 'trough', 'half_life', 'cumulative', 
+               'time_to_return')
+
+def path_metrics(x, indices, metrics = all_metrics, impact = 1, 
+                 discount = 0.99, tol = 1e-4):
+    """Metrics of the deviations from steady state of the columns `indices` 
+    of the path(s) `x` (time x variable, or ... x time x variable; by 
+    construction, the last value of each path is the steady state), relative 
+    to the steady state or absolute for variables whose steady state is 
+    below one in absolute value (such as bprof, which is zero in RANK; see 
+    `deviation_scale`).
+    
+    impact: deviation in period `impact`; peak/trough: largest/smallest 
+    deviation; half_life: periods after the largest absolute deviation until 
+    the absolute deviation has halved; cumulative: sum of the deviations 
+    discounted with `discount`; time_to_return: first period from which on 
+    the absolute deviation stays below `tol`. The last period is the steady 
+    state by construction and does not count for half-lives and returns: 
+    those which do not happen before it are NaN.
+    
+    Returns a dictionary of arrays (... x variable) keyed by the metric."""
+    x = np.asarray(x)[..., indices]
+    stst = x[..., -1:, :]
+    dev = (x - stst)/deviation_scale(stst)
+    periods = np.arange(dev.shape[-2])[:, None]
+    results = {}
+    
+    if 'impact' in metrics:
+        results['impact'] = dev[..., impact, :]
+    if 'peak' in metrics:
+        results['peak'] = dev.max(axis = -2)
+    if 'trough' in metrics:
+        results['trough'] = dev.min(axis = -2)
+    if 'half_life' in metrics:
+        size = np.abs(dev[..., :-1, :])
+        top = size.argmax(axis = -2)[..., None, :]
+        halved = (size <= 0.5*np.take_along_axis(size, top, axis = -2)) & \
+            (periods[:-1] > top)
+        results['half_life'] = np.where(halved.any(axis = -2), 
+                                        halved.argmax(axis = -2) - 
+                                        top[..., 0, :], np.nan)
+    if 'cumulative' in metrics:
+        results['cumulative'] = (discount**periods*dev).sum(axis = -2)
+    if 'time_to_return' in metrics:
+        # Below tol from a period on: running "and" from the end of the path
+        below = np.flip(np.logical_and.accumulate( 
+            np.flip(np.abs(dev[..., :-1, :]) < tol, axis = -2), axis = -2), 
+            axis = -2)
+        results['time_to_return'] = np.where(below.any(axis = -2), 
+                                             below.argmax(axis = -2), np.nan)
+    return results
+
+@dataclass
+class MetricSpec:
+    """Metrics to extract from each path of a sweep (see `path_metrics`). 
+    `discount` None discounts with the steady state value of the variable 
+    beta of the model. The values are stored in the point records under 
+    '<variable>_<metric>'."""
+    variables: tuple = ('c', 'y', 'n', 'pi', 'w', 'i', 'R', 'RR')
+    metrics: tuple = all_metrics
+    impact: int = 1
+    discount: float = None
+    tol: float = 1e-4
+    
+    def label(self):
+        """Short identifier of the spec (stored in the point records, such 
+        that records with other metrics are recognised)."""
+        content = json.dumps(asdict(self), sort_keys = True)
+        return hashlib.sha256(content.encode()).hexdigest()[:12]
+    
+    def columns(self):
+        """Names of the metric columns of the point records."""
+        return ['%s_%s' % (vv, mm) for vv in self.variables
+                for mm in self.metrics]
+    
+    def compute(self, variables, x):
+        """Metric columns of the path `x` of a model with the list of 
+        `variables` (variables the model does not have are NaN)."""
+        present = [vv for vv in self.variables if vv in variables]
+        discount = self.discount
+        if discount is None:
+            discount = x[-1, variables.index('beta')] \
+                if 'beta' in variables else 0.99
+        values = path_metrics(x, [variables.index(vv) for vv in present], 
+                              self.metrics, self.impact, discount, self.tol)
+        columns = dict.fromkeys(self.columns(), np.nan)
+        for mm, value in values.items():
+            for vv, vvalue in zip(present, value):
+                columns['%s_%s' % (vv, mm)] = float(vvalue)
+        return columns
+
+###############################################################################
+###############################################################################
+
+def metric_tensor(records, spec, eta_sequence, lambda_sequence):
+    """Gather the metric columns of the point records of a sweep into an 
+    array of dimension model x metric x variable x eta x lambda (the RANK 
+    values, which do not depend on lambda, are repeated along lambda; points 
+    which were not solved are NaN)."""
+    eta_sequence, lambda_sequence = list(eta_sequence), list(lambda_sequence)
+    tensor = np.full((2, len(spec.metrics), len(spec.variables), 
+                      len(eta_sequence), len(lambda_sequence)), np.nan)
+    for rr in records:
+        if rr.get('error') is not None or rr['eta'] not in eta_sequence:
+            continue
+        ee = eta_sequence.index(rr['eta'])
+        if rr['model'] == 'rank':
+            mm, ll = 0, slice(None)
+        elif rr['lam'] in lambda_sequence:
+            mm, ll = 1, lambda_sequence.index(rr['lam'])
+        else:
+            continue
+        for ii, metric in enumerate(spec.metrics):
+            for jj, variable in enumerate(spec.variables):
+                tensor[mm, ii, jj, ee, ll] = rr.get('%s_%s' % (variable, 
+                                                               metric), 
+                                                    np.nan)
+    return tensor
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains a reusable handle to an econpizza model: the equations 
+# of rank.yaml/tank.yaml are compiled once by ep.load, after which any entry 
+# of the `parameters` list (and any fixed steady state value) can be changed 
+# at runtime without loading the model again
+###############################################################################
+###############################################################################
+
+# Import packages
+import io
+import copy
+import json
+import contextlib
+import hashlib
+import warnings
+import numpy as np
+from rank_tank.cache import solution_key
+from rank_tank.instrumentation import (get_recorder, solver_info, 
+                                       path_iterations)
+from rank_tank.presolve import SteadyStatePresolver, PresolveError
+
+###############################################################################
+###############################################################################
+
+class SolveError(RuntimeError):
+    """Error of one stage of a solve: `stage` is 'steady_state' or 'path'."""
+    
+    def __init__(self, stage, error):
+        super().__init__('%s failed: %r' % (stage, error))
+        self.stage = stage
+        self.error = error
+
+def path_flag(flag):
+    """The flag of `find_path` as a boolean (True if the path was not found): 
+    econpizza returns it together with the residuals, as (flag, f)."""
+    if isinstance(flag, tuple):
+        flag = flag[0]
+    return bool(flag)
+
+def deviation_scale(stst):
+    """Scale of the deviations from the steady state `stst`: deviations are 
+    relative to the steady state, or absolute for variables whose steady 
+    state is below one in absolute value (e.g. bprof, which is zero in 
+    RANK)."""
+    return np.maximum(np.abs(stst), 1.)
+
+def terminal_deviation(x):
+    """Largest absolute deviation from steady state (the last value of the 
+    path, by construction; see `deviation_scale`) in the period before the 
+    terminal condition."""
+    stst = x[-1]
+    return float(np.max(np.abs(x[-2] - stst)/deviation_scale(stst)))
+
+class ModelHandle:
+    """Compile-once, re-parameterize-many handle to a RANK or TANK model.
+    
+    `model` is either the path to a YAML file or an already parsed model 
+    dictionary (as returned by `ep.parse`). The model is loaded (and hence 
+    compiled) once, when it is first needed; `solve_stst` and `find_path` 
+    then take the values of `parameters` entries such as eta or lam as 
+    runtime inputs. With `presolve`, the root-finding of the steady state 
+    starts from the solution of the presolver (see presolve.py)."""
+    
+    def __init__(self, model, presolve = True):
+        import econpizza as ep # Imported here such that workers load it lazily
+        
+        if isinstance(model, str):
+            with open(model) as file: # Hash of the YAML model text
+                self.model_hash = hashlib.sha256(file.read().encode()).hexdigest()
+            with get_recorder().stage('parse'):
+                model = ep.parse(model)
+        else:
+            self.model_hash = hashlib.sha256(json.dumps(
+                model, sort_keys = True, default = str).encode()).hexdigest()
+        self.dictionary = copy.deepcopy(model)
+        self._model = None
+        
+        # Keep the values of the YAML file, such that every solve starts from 
+        # the baseline calibration
+        steady_state = self.dictionary['steady_state']
+        self.default_fixed_values = dict(steady_state['fixed_values'])
+        self.default_init_guesses = dict(steady_state.get('init_guesses') or {})
+        self.fixed_values = {}
+        self.horizons = {} # Horizons chosen by `select_horizon`
+        self.path_jacobian = None # Horizon and factorized stacked Jacobian
+        self.path_iterations = None # Newton iterations of the last path
+        self.presolver = None
+        if presolve:
+            try:
+                self.presolver = SteadyStatePresolver(self.dictionary)
+            except PresolveError as error: # Equations it cannot read
+                warnings.warn('the steady state of %s is not presolved: %s'
+                              % (self.dictionary['name'], error))
+    
+    @property
+    def model(self):
+        """The loaded econpizza model (loaded on first access)."""
+        if self._model is None:
+            import econpizza as ep
+            with get_recorder().stage('load'): # Includes the compilation
+                self._model = ep.load(copy.deepcopy(self.dictionary))
+        return self._model
+    
+    def __getitem__(self, key):
+        # Entries of the YAML file do not require loading the model
+        if self._model is None and key in self.dictionary:
+            return self.dictionary[key]
+        return self.model[key]
+    
+    @property
+    def variables(self):
+        return self.dictionary['variables']
+    
+    def canonical_fixed_values(self, fixed_values):
+        """Drop the fixed values which equal those of the YAML file, such that 
+        a solution is keyed identically whether the baseline calibration is 
+        set explicitly (e.g. eta = 1 in the sweep) or not."""
+        canonical = {}
+        for kk, vv in fixed_values.items():
+            default = self.default_fixed_values.get(kk)
+            if isinstance(default, (int, float)) and \
+                    abs(float(vv) - default) < 1e-12:
+                continue
+            canonical[kk] = vv
+        return canonical
+    
+    def set_fixed_values(self, fixed_values = None):
+        """Set the fixed values (parameters or steady state values) for the 
+        next steady state solve; all values not given are reset to the values 
+        of the YAML file."""
+        fixed_values = dict(fixed_values or {})
+        unknown = [kk for kk in fixed_values if kk not in 
+                   self.dictionary['parameters'] and kk not in 
+                   self.default_fixed_values]
+        if unknown:
+            raise KeyError('%s are neither parameters nor fixed values of the '
+                           'model %s' % (unknown, self.dictionary['name']))
+        
+        self.fixed_values = fixed_values
+        self.model['steady_state']['fixed_values'] = \
+            {**self.default_fixed_values, **fixed_values}
+    
+    def solve_stst(self, fixed_values = None, guess = None, **kwargs):
+        """Solve for the steady state given the fixed values. If `guess` (a 
+        dictionary of previously solved steady state values and parameters) is 
+        given, the root-finding starts from it instead of the initial guesses 
+        of the YAML file. With the presolver, it starts from the steady state 
+        found by the presolver (from the guess), such that econpizza only 
+        confirms it; if the presolver fails, from the guess itself."""
+        self.set_fixed_values(fixed_values)
+        
+        fixed = self.model['steady_state']['fixed_values']
+        if guess is None:
+            init_guesses = dict(self.default_init_guesses)
+        else: # Seed all values which are not fixed with the guess
+            init_guesses = {kk: vv for kk, vv in guess.items() 
+                            if kk not in fixed}
+        if self.presolver is not None:
+            try:
+                with get_recorder().stage('presolve'):
+                    presolved = self.presolver.solve(self.fixed_values, guess)
+                names = self.dictionary['variables'] + \
+                    self.dictionary['parameters']
+                init_guesses = {kk: vv for kk, vv in presolved.items() 
+                                if kk in names and kk not in fixed}
+            except PresolveError: # Start from the guesses above
+                pass
+        self.model['steady_state']['init_guesses'] = init_guesses
+        
+        return self.model.solve_stst(**kwargs)
+    
+    def find_path(self, shock, guess = None, reuse_jacobian = False, **kwargs):
+        """Find the path after `shock`, starting from the path `guess` if 
+        given (and of the length of the path; shifted to the current steady 
+        state). A path which is not found is reported by the flag rather than 
+        by an exception.
+        
+        With `reuse_jacobian`, the path is first found by Newton steps with 
+        the factorized Jacobian of the stacked system of an earlier solve 
+        with the same horizon (possibly at another parameter point, e.g. the 
+        neighbouring grid point; see `chord_path`), such that econpizza does 
+        not compute the Jacobians along the path nor compile its functions 
+        for the new parameters; if these steps fail, the path is found by 
+        econpizza. Returns the path and the flag (a boolean, see 
+        `path_flag`). The number of Newton iterations is kept as 
+        `path_iterations` (if the instrumentation is enabled, for the paths 
+        of econpizza; see `path_iterations` in instrumentation.py)."""
+        import jax.numpy as jnp
+        
+        kwargs = {'raise_errors': False, 'verbose': False, **kwargs}
+        horizon = kwargs.get('horizon', 200)
+        if guess is not None and len(guess) == horizon + 1:
+            # The last period of the guess is the terminal condition: shift 
+            # the guess (e.g. the path of a neighbouring parameter point) to 
+            # the current steady state
+            stst = jnp.array(list(self.model['stst'].values()))
+            kwargs['init_guess'] = jnp.asarray(guess) - guess[-1] + stst
+        
+        if reuse_jacobian:
+            x = self.chord_path(shock, horizon, kwargs.get('init_guess'))
+            if x is not None:
+                return x, False
+        
+        self.path_iterations = None
+        if get_recorder().enabled and not kwargs['verbose']:
+            # econpizza only prints its iterations: capture them
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                x, flag = self.model.find_path(shock = shock, 
+                                               **dict(kwargs, verbose = True))
+            self.path_iterations = path_iterations(output.getvalue())
+        else:
+            x, flag = self.model.find_path(shock = shock, **kwargs)
+        return x, path_flag(flag)
+    
+    def chord_path(self, shock, horizon = 200, guess = None, tol = 1e-8, 
+                   max_iter = 30):
+        """Path after `shock` (with path length `horizon`) by Newton steps 
+        with the factorized Jacobian of the stacked system of the last call 
+        with the same horizon, starting from the path `guess` or from the 
+        steady state. The Jacobian is computed at the current steady state if 
+        there is none (see `linear_system` in linear.py) and dropped if the 
+        steps do not converge to `tol` within `max_iter` steps, such that the 
+        next call computes it afresh. Returns the path (the number of steps 
+        is kept as `path_iterations`), or None if the steps do not 
+        converge."""
+        from rank_tank.linear import (linear_system, sparse_factor, 
+                                      model_functions)
+        
+        model = self.model
+        xss = np.array([model['stst'][vv] for vv in model['variables']])
+        pars = np.array([model['pars'][pp] for pp in model['parameters']])
+        if self.path_jacobian is None or self.path_jacobian[0] != horizon:
+            with get_recorder().stage('path_jacobian'):
+                system, _, _, _ = linear_system(self, horizon)
+                self.path_jacobian = horizon, sparse_factor(self, system)
+        solve = self.path_jacobian[1]
+        _, residuals = model_functions(self)
+        
+        shocks = np.zeros((horizon - 1, len(model['shocks'])))
+        shocks[0, model['shocks'].index(shock[0])] = shock[1]
+        x = np.tile(xss, (horizon - 1, 1)) if guess is None else \
+            np.array(guess[1:-1], dtype = float)
+        for steps in range(max_iter):
+            full = np.vstack((xss, x, xss))
+            error = np.asarray(residuals(full, xss, shocks, pars))
+            if not np.isfinite(error).all():
+                break
+            if np.max(np.abs(error)) < tol:
+                self.path_iterations = steps
+                return full
+            x = x - solve(error.ravel()).reshape(x.shape)
+        self.path_jacobian = None
+        return None
+    
+    def steady_state(self):
+        """The solved steady state values and parameters as one dictionary 
+        (suitable as `guess` for `solve_stst`)."""
+        return {**self.model['pars'], **self.model['stst']}
+    
+    def solve(self, shock, fixed_values = None, horizon = None, guess = None, 
+              cache = None, reuse_jacobian = False):
+        """Solve for the steady state given the fixed values and for the path 
+        after `shock` (with path length `horizon`, if given). `guess` is a 
+        dictionary with the warm start {'stst': ..., 'x': ...} of a previous 
+        solution. If a `SolutionCache` is given, cached solutions are returned 
+        without solving (or even loading) the model and new ones are stored. 
+        `reuse_jacobian` re-uses the factorized Jacobian of an earlier solve 
+        (see `find_path`).
+        
+        Returns the path `x`, the flag of `find_path` and the steady state 
+        dictionary; raises a `SolveError` if a stage fails."""
+        fixed_values = dict(fixed_values or {})
+        recorder = get_recorder()
+        
+        with recorder.solve_record(model = self.dictionary['name'], 
+                                   fixed_values = fixed_values, shock = shock, 
+                                   horizon = horizon, 
+                                   warm_start = bool(guess)) as record:
+            if cache is not None:
+                key = solution_key(self.model_hash, 
+                                   self.canonical_fixed_values(fixed_values), 
+                                   shock, horizon)
+                with recorder.stage('cache'):
+                    cached = cache.get(key)
+                record['cache_hit'] = cached is not None
+                if cached is not None:
+                    record['flag'] = cached[1]
+                    return cached
+            
+            guess = guess or {}
+            try:
+                with recorder.stage('solve_stst'):
+                    result = self.solve_stst(fixed_values, 
+                                             guess = guess.get('stst'))
+                record.update(solver_info(result))
+            except Exception as error:
+                raise SolveError('steady_state', error) from error
+            
+            path_kwargs = {} if horizon is None else {'horizon': horizon}
+            try:
+                with recorder.stage('find_path'):
+                    x, flag = self.find_path(shock, guess = guess.get('x'), 
+                                             reuse_jacobian = reuse_jacobian, 
+                                             **path_kwargs)
+            except Exception as error:
+                raise SolveError('path', error) from error
+            record.update(flag = flag, path_iterations = self.path_iterations)
+            stst = self.steady_state()
+            
+            if cache is not None:
+                with recorder.stage('cache'):
+                    cache.put(key, x, flag, stst)
+        return x, flag, stst
+    
+    def select_horizon(self, shock, fixed_values = None, periods = 50, 
+                       candidates = (75, 100, 150, 200, 300), tol = 1e-6):
+        """Shortest horizon (path length) among `candidates` for which the 
+        path after `shock` has returned to the steady state (the deviation in 
+        the period before the terminal condition is below `tol`) and whose 
+        first `periods` periods, the ones which are used, agree with the path 
+        of the next longer candidate (up to `tol`, see `deviation_scale`). If 
+        no candidate passes, the longest one is returned.
+        
+        The choice is remembered per shock and fixed values."""
+        fixed_values = dict(fixed_values or {})
+        key = json.dumps([self.canonical_fixed_values(fixed_values), 
+                          [shock[0], float(shock[1])], periods, 
+                          sorted(candidates), tol], sort_keys = True, 
+                         default = float)
+        if key in self.horizons:
+            return self.horizons[key]
+        
+        candidates = sorted(hh for hh in candidates if hh > periods)
+        paths = {}
+        def path(horizon):
+            if horizon not in paths:
+                paths[horizon] = self.find_path(shock, horizon = horizon)
+            return paths[horizon]
+        
+        with get_recorder().stage('select_horizon'):
+            self.solve_stst(fixed_values)
+            horizon = candidates[-1]
+            for short, long in zip(candidates[:-1], candidates[1:]):
+                x, flag = path(short)
+                if flag or terminal_deviation(x) > tol:
+                    continue
+                x_long, flag_long = path(long)
+                stst = deviation_scale(x[-1])
+                if not flag_long and np.max(np.abs(
+                        x[:periods] - x_long[:periods])/stst) < tol:
+                    horizon = short
+                    break
+        
+        self.horizons[key] = horizon
+        return horizon
+    
+    def solve_shocks(self, shocks, fixed_values = None, horizon = None, 
+                     cache = None):
+        """Solve for the paths after each shock in the list `shocks` (of 
+        (name, size) tuples, such as several shocks or several sizes of one 
+        shock). The steady state is solved only once and the factorized 
+        Jacobian of the stacked system around it is re-used for all shocks 
+        (see `chord_path`).
+        
+        Returns the stacked (shock x time x variable) array of paths and the 
+        list of flags of `find_path`."""
+        fixed_values = dict(fixed_values or {})
+        paths, flags = [None]*len(shocks), [None]*len(shocks)
+        
+        # Serve what is already cached
+        keys = [solution_key(self.model_hash, 
+                             self.canonical_fixed_values(fixed_values), 
+                             shock, horizon) for shock in shocks]
+        if cache is not None:
+            for ss, key in enumerate(keys):
+                cached = cache.get(key)
+                if cached is not None:
+                    paths[ss], flags[ss], _ = cached
+        
+        missing = [ss for ss in range(len(shocks)) if paths[ss] is None]
+        if missing:
+            recorder = get_recorder()
+            with recorder.solve_record(model = self.dictionary['name'], 
+                                       fixed_values = fixed_values, 
+                                       shocks = [shocks[ss] for ss in missing], 
+                                       horizon = horizon) as record:
+                with recorder.stage('solve_stst'):
+                    result = self.solve_stst(fixed_values)
+                record.update(solver_info(result))
+                self.path_jacobian = None # Computed at this steady state
+                
+                path_kwargs = {} if horizon is None else {'horizon': horizon}
+                iterations = []
+                for ss in missing:
+                    with recorder.stage('find_path'):
+                        paths[ss], flags[ss] = self.find_path( 
+                            shocks[ss], reuse_jacobian = True, **path_kwargs)
+                    iterations.append(self.path_iterations)
+                    if cache is not None:
+                        cache.put(keys[ss], paths[ss], flags[ss], 
+                                  self.steady_state())
+                record.update(flags = [flags[ss] for ss in missing], 
+                              path_iterations = iterations)
+        
+        return np.stack(paths), flags
+
+def solve_shock_batch(handles, shocks, fixed_values = None, horizon = None, 
+                      cache = None):
+    """Solve several models (a dictionary of model handles, e.g. RANK and 
+    TANK) for the list of shocks in one go. Returns dictionaries of the 
+    stacked (shock x time x variable) paths and of the flags, keyed like 
+    `handles`."""
+    paths, flags = {}, {}
+    for name, handle in handles.items():
+        paths[name], flags[name] = handle.solve_shocks(shocks, fixed_values, 
+                                                       horizon, cache)
+    return paths, flags
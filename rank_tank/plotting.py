@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the rendering stage for the figures: figures are 
+# described declaratively (data frame, labels, output path), exported as SVG 
+# by one long-lived Kaleido exporter (or a small pool of exporter processes 
+# kept alive for the session) and skipped if neither their data nor their 
+# labels changed since the last export
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import json
+import atexit
+import hashlib
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing as mp
+
+###############################################################################
+###############################################################################
+
+# Colours used in the paper
+colours_models = {'RANK': '#636EFA', 'TANK': '#FFA15A'}
+colours_agents = {'TANK Hand-to-Mouth': '#FF6692', 
+                  'TANK Unconstrained': '#00CC96'}
+
+@dataclass
+class FigureSpec:
+    """Declarative description of a figure.
+    
+    kind: 'irf' (IRFs over quarters, one line per column of `columns`) or 
+    'sensitivity' (one line per column of `data`, over its index)"""
+    data: object # pandas data frame
+    yaxis_title: str
+    path: str = None # Output path (None: the figure is not exported)
+    kind: str = 'irf'
+    columns: list = None
+    colours: dict = field(default_factory = dict)
+    xaxis_title: str = 'Quarters'
+    legend_title: str = None
+    y_range: list = None
+    
+    def digest(self):
+        """Hash of the data and the labels of the figure."""
+        content = json.dumps({kk: vv for kk, vv in vars(self).items() 
+                              if kk != 'data'}, sort_keys = True, default = str)
+        content += self.data.to_csv()
+        return hashlib.sha256(content.encode()).hexdigest()
+
+###############################################################################
+###############################################################################
+
+# Building figures
+
+def build_figure(spec):
+    """Create the Plotly figure described by `spec`."""
+    import plotly.express as px # Imported only when plots are requested
+    
+    if spec.kind == 'irf':
+        fig = px.line(spec.data, x = "Quarters", y = spec.columns,
+                      color_discrete_map = spec.colours)
+        fig.update_layout(title='', # Empty title
+                          xaxis_title=spec.xaxis_title, # x-axis labeling
+                          yaxis_title=spec.yaxis_title, # y-axis labeling
+                          font=dict(size=20),
+                          legend=dict(orientation="h", # For horizontal legend
+                                      yanchor="bottom", y=1.02, xanchor="right", 
+                                      x=1), 
+                          legend_title=spec.legend_title, 
+                          plot_bgcolor = 'whitesmoke', 
+                          margin=dict(l=15, r=15, t=5, b=5))
+        fig.update_traces(line=dict(width=6))
+    
+    elif spec.kind == 'sensitivity':
+        # Round the column names (correct machine precision for readable 
+        # legend in plot)
+        data = spec.data.rename(columns = lambda cc: str(round(cc, 2)))
+        fig = px.line(data, markers = True, 
+                      color_discrete_sequence=px.colors.qualitative.Plotly[:data.shape[1]]) 
+        fig.update_traces(line=dict(width=4),
+                          marker=dict(size=14))
+        fig.update_layout(title='', # Empty title
+                          xaxis_title=spec.xaxis_title, # x-axis labeling
+                          yaxis_title=spec.yaxis_title, # y-axis labeling
+                          plot_bgcolor = 'whitesmoke', 
+                          font=dict(size=20), 
+                          margin=dict(l=15, r=15, t=5, b=5), 
+                          legend=dict(orientation="h", # For horizontal legend
+                                      yanchor="bottom", y=1, xanchor="right", 
+                                      x=1),
+                          legend_title=spec.legend_title)
+    
+    else:
+        raise ValueError('unknown kind of figure: %s' % spec.kind)
+    
+    if spec.y_range is not None:
+        fig.update_yaxes(range=spec.y_range) # Fix range of y-axis
+    return fig
+
+def _export(spec):
+    """Build and export a figure (run in the worker processes; Plotly keeps 
+    one Kaleido exporter per process alive between calls)."""
+    from rank_tank.instrumentation import get_recorder
+    
+    os.makedirs(os.path.dirname(os.path.abspath(spec.path)), exist_ok = True)
+    recorder = get_recorder()
+    with recorder.stage('build_figure'):
+        fig = build_figure(spec)
+    with recorder.stage('export'): # Kaleido
+        fig.write_image(spec.path)
+    return spec.path
+
+###############################################################################
+###############################################################################
+
+# Rendering stage
+
+# Pools of exporter processes (by their number of processes), started once 
+# and kept alive between calls of `render_figures`, such that every process 
+# starts its Kaleido exporter only once per session
+_pools = {}
+
+def _exporter_pool(workers):
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor( 
+            max_workers = workers, mp_context = mp.get_context('spawn'))
+    return _pools[workers]
+
+@atexit.register
+def shutdown_exporters():
+    """Stop the pools of exporter processes."""
+    for pool in _pools.values():
+        pool.shutdown()
+    _pools.clear()
+
+def _load_manifest(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def render_figures(specs, show = False, workers = None, force = False, 
+                   manifest = os.path.join('.cache', 'figures.json')):
+    """Render a list of figure specs.
+    
+    If `show`, the figures are displayed (with the default renderer of the 
+    session); in any case, all specs with an output path are exported. With 
+    `workers = 1` (the default), they are exported in this process, by one 
+    Kaleido exporter which stays alive for the session; with more workers, 
+    by a pool of `workers` exporter processes, which is started on first 
+    use and kept for later calls (see `shutdown_exporters`). Figures whose 
+    data and labels are unchanged since their last export (according to the 
+    `manifest` file) are skipped unless `force`.
+    
+    Returns the list of exported paths."""
+    if show:
+        for spec in specs:
+            build_figure(spec).show() # Display plot
+    
+    digests = _load_manifest(manifest)
+    exports = []
+    for spec in specs:
+        if spec.path is None:
+            continue
+        key = os.path.abspath(spec.path)
+        digest = spec.digest()
+        if not force and digests.get(key) == digest and os.path.exists(key):
+            continue # Unchanged since the last export
+        digests[key] = digest
+        exports.append(spec)
+    
+    if not exports:
+        return []
+    
+    if workers is None or workers == 1:
+        paths = [_export(spec) for spec in exports]
+    else:
+        try:
+            paths = list(_exporter_pool(workers).map(_export, exports))
+        except BrokenProcessPool: # Start a new pool on the next call
+            _pools.pop(workers).shutdown()
+            raise
+    
+    # Only record the digests once all exports succeeded
+    os.makedirs(os.path.dirname(os.path.abspath(manifest)), exist_ok = True)
+    with open(manifest, 'w') as file:
+        json.dump(digests, file, indent = 1)
+    
+    return paths
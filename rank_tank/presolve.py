@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the steady state presolver: in steady state, most of 
+# the variables of rank.yaml/tank.yaml follow recursively from the fixed 
+# values (e.g. g = 0.2*y once y is known). The presolver works out from the 
+# equations of the YAML file which of the unknowns of the steady state (the 
+# variables which are not fixed and the parameters determined in steady state, 
+# such as chi) can be computed one after another, in which order, and which 
+# small core systems need a joint root-finding (a block triangular 
+# decomposition with scipy.sparse.csgraph). 
+#
+# econpizza root-finds the square system of all unknowns of the steady state 
+# and cannot be handed the core unknowns alone (fixing the recursive unknowns 
+# as well would leave it with more equations than unknowns). The solution of 
+# the presolver is therefore handed to econpizza as initial guess, such that 
+# `solve_stst` starts at the root and only confirms it. Whether this pays off 
+# depends on how far the guess otherwise is from the root; the stage 
+# `presolve` of benchmarks/bench_pipeline.py measures it along a lambda ray
+###############################################################################
+###############################################################################
+
+# Import packages
+import re
+import ast
+import numpy as np
+
+###############################################################################
+###############################################################################
+
+# Functions which may appear in the equations
+_functions = {'exp': np.exp, 'log': np.log, 'sqrt': np.sqrt, 'abs': abs, 
+              'max': max, 'min': min}
+_globals = {'__builtins__': {}, **_functions}
+
+class PresolveError(RuntimeError):
+    """The presolver could not read the equations or find the steady 
+    state."""
+
+# Syntax which may appear in the expressions of the YAML file: numbers, 
+# names, arithmetic, comparisons and calls of `_functions`
+_syntax = (ast.Expression, ast.Constant, ast.Name, ast.Load, ast.BinOp, 
+           ast.UnaryOp, ast.operator, ast.unaryop, ast.Compare, ast.cmpop, 
+           ast.BoolOp, ast.boolop, ast.IfExp, ast.Call)
+
+def _compile(expression):
+    """Compile an expression of the YAML file after checking that it only 
+    uses the syntax of `_syntax` (such that evaluating it cannot run other 
+    code); raises a `PresolveError` otherwise."""
+    try:
+        tree = ast.parse(expression, mode = 'eval')
+    except SyntaxError as error:
+        raise PresolveError('cannot read %s' % expression) from error
+    for node in ast.walk(tree):
+        if not isinstance(node, _syntax) or \
+                (isinstance(node, ast.Name) and node.id.startswith('__')) or \
+                (isinstance(node, ast.Call) and 
+                 not (isinstance(node.func, ast.Name) and 
+                      node.func.id in _functions and not node.keywords)):
+            raise PresolveError('cannot read %s' % expression)
+    return compile(tree, '<steady state>', 'eval')
+
+def _evaluate(code, namespace):
+    """Value of the compiled expression `code` given the names of 
+    `namespace` (without builtins); errors of the evaluation (e.g. a division 
+    by zero) are raised as a `PresolveError`."""
+    try:
+        return float(eval(code, _globals, namespace))
+    except (ArithmeticError, ValueError, TypeError, NameError) as error:
+        raise PresolveError('cannot evaluate the steady state equations: %r'
+                            % error) from error
+
+class _SteadyState(ast.NodeTransformer):
+    """Replace xLag, xPrime and xSS of the variables x by x."""
+    
+    def __init__(self, variables):
+        self.variables = set(variables)
+    
+    def visit_Name(self, node):
+        for suffix in ('Lag', 'Prime', 'SS'):
+            if node.id.endswith(suffix) and \
+                    node.id[:-len(suffix)] in self.variables:
+                return ast.copy_location(ast.Name(node.id[:-len(suffix)], 
+                                                  node.ctx), node)
+        return node
+
+def _lines(text):
+    """Equations of a block of the YAML file (a list, or a string with one 
+    equation per line or separated by '~'), without comments."""
+    if isinstance(text, str):
+        text = re.split(r'~|\n', text)
+    lines = [line.split('#')[0].strip() for line in text or []]
+    return [line for line in lines if line]
+
+def _residual(equation, transformer):
+    """Steady state form of the equation 'lhs = rhs' as the expression 
+    lhs - (rhs)."""
+    sides = re.split(r'(?<![=<>!])=(?!=)', equation.replace('^', '**'))
+    if len(sides) != 2:
+        raise PresolveError('not an equation: %s' % equation)
+    try:
+        tree = ast.parse('(%s) - (%s)' % tuple(sides), mode = 'eval')
+    except SyntaxError as error:
+        raise PresolveError('cannot read %s' % equation) from error
+    return ast.unparse(transformer.visit(tree))
+
+def evaluate_values(values, namespace = None):
+    """Evaluate the entries of `values` in order (numbers, or expressions of 
+    the entries before them such as R: pi/beta). Returns the dictionary of 
+    floats."""
+    namespace = dict(namespace or {})
+    results = {}
+    for kk, vv in values.items():
+        if isinstance(vv, str):
+            vv = _evaluate(_compile(vv.replace('^', '**')), namespace)
+        results[kk] = namespace[kk] = float(vv)
+    return results
+
+###############################################################################
+###############################################################################
+
+class SteadyStatePresolver:
+    """Presolver of the steady state of the model of the parsed YAML file 
+    `dictionary`. The structure of the steady state system (which unknowns 
+    are computed from which equations, in which order) depends only on which 
+    values are fixed, not on the fixed values themselves, and is worked out 
+    once per set of fixed names (see `structure`). Raises a `PresolveError` 
+    if the equations use syntax other than arithmetic and the functions 
+    of the YAML files (see `_compile`)."""
+    
+    def __init__(self, dictionary):
+        self.variables = list(dictionary['variables'])
+        self.parameters = list(dictionary['parameters'])
+        self.shocks = list(dictionary.get('shocks') or [])
+        transformer = _SteadyState(self.variables)
+        
+        # Auxiliary equations define further names (e.g. par_cap_util0 = 
+        # MPKSS); in steady state, they are equations of these names
+        self.auxiliaries = []
+        equations = []
+        for line in _lines(dictionary.get('aux_equations')):
+            name = line.split('=')[0].strip()
+            self.auxiliaries.append(name)
+            equations.append(_residual(line, transformer))
+        equations += [_residual(line, transformer)
+                      for line in _lines(dictionary['equations'])]
+        self.equations = equations
+        self.code = [_compile(ee) for ee in equations]
+        self.names = [set(node.id for node in ast.walk(ast.parse(ee))
+                          if isinstance(node, ast.Name)) for ee in equations]
+        
+        steady_state = dictionary['steady_state']
+        self.default_fixed_values = dict(steady_state['fixed_values'])
+        self.default_init_guesses = dict(steady_state.get('init_guesses')
+                                         or {})
+        self._structures = {}
+    
+    def unknowns(self, fixed):
+        """Unknowns of the steady state given the fixed names."""
+        return [nn for nn in self.variables + self.parameters + 
+                self.auxiliaries if nn not in fixed]
+    
+    def residuals(self, values):
+        """Residuals of all steady state equations at `values`."""
+        namespace = {**dict.fromkeys(self.shocks, 0.), **values}
+        return np.array([_evaluate(code, namespace) for code in self.code])
+    
+    def _initial_values(self, fixed, guess = None):
+        """Fixed values and starting values of all unknowns: the `guess` 
+        (e.g. a neighbouring steady state), the initial guesses of the YAML 
+        file or one."""
+        values = evaluate_values(fixed)
+        init_guesses = evaluate_values(self.default_init_guesses, values)
+        for nn in self.unknowns(fixed):
+            values[nn] = float((guess or {}).get(nn, init_guesses.get(nn, 1.)))
+        return values
+    
+    def _incidence(self, fixed, values, step = 1e-6):
+        """Incidence of the unknowns in the equations: an unknown enters an 
+        equation if it appears in it and changes its residual (which drops, 
+        e.g., i in the adjustment costs Phi/2*(i/iLag - 1)**2, which vanish 
+        in steady state). The derivatives are taken at a perturbed point, 
+        such that they do not vanish by accident."""
+        unknowns = self.unknowns(fixed)
+        perturbed = dict(values)
+        factors = np.random.default_rng(0).uniform(0.9, 1.1, len(unknowns))
+        for nn, ff in zip(unknowns, factors):
+            perturbed[nn] *= ff
+        base = self.residuals(perturbed)
+        
+        incidence = np.zeros((len(self.equations), len(unknowns)), dtype = bool)
+        for jj, nn in enumerate(unknowns):
+            rows = [ii for ii, names in enumerate(self.names) if nn in names]
+            if not rows:
+                continue
+            shifted = dict(perturbed)
+            shifted[nn] += step*max(1., abs(shifted[nn]))
+            change = self.residuals(shifted)[rows] - base[rows]
+            # Keep it if it changes the residual or cannot be evaluated
+            incidence[rows, jj] = ~(np.abs(change) <= 1e-12)
+        return incidence
+    
+    def structure(self, fixed):
+        """Order in which the unknowns are solved given the fixed names: 
+        a list of blocks (the list of unknowns and the list of the indices of 
+        the equations solving for them), where each block only depends on the 
+        fixed values and the blocks before it. Blocks with one unknown are 
+        solved recursively; larger blocks are the core systems solved 
+        jointly. Equations which are not used are implied by the others in 
+        steady state (such as R = Rk if both are fixed) and are checked after 
+        the solve."""
+        key = frozenset(fixed)
+        if key in self._structures:
+            return self._structures[key]
+        from scipy import sparse
+        from scipy.sparse.csgraph import (maximum_bipartite_matching, 
+                                          connected_components)
+        
+        unknowns = self.unknowns(fixed)
+        incidence = self._incidence(fixed, self._initial_values(fixed))
+        
+        # Forward substitution: equations with only one unknown left
+        blocks, solved, used = [], set(), set()
+        progress = True
+        while progress:
+            progress = False
+            for ii in range(len(self.equations)):
+                if ii in used:
+                    continue
+                left = [jj for jj in np.flatnonzero(incidence[ii])
+                        if jj not in solved]
+                if len(left) == 1:
+                    blocks.append(([unknowns[left[0]]], [ii]))
+                    solved.add(left[0])
+                    used.add(ii)
+                    progress = True
+        
+        # Remaining unknowns: each one is matched to an equation, and the 
+        # strongly connected components of the dependencies between them are 
+        # the core systems (in the order of their dependencies)
+        rest = [jj for jj in range(len(unknowns)) if jj not in solved]
+        rows = [ii for ii in range(len(self.equations)) if ii not in used]
+        if rest:
+            graph = sparse.csr_matrix(incidence[np.ix_(rows, rest)]
+                                      .astype(float))
+            match = maximum_bipartite_matching(graph, perm_type = 'row')
+            if (match < 0).any():
+                raise PresolveError('the steady state system is structurally '
+                                    'singular in %s'
+                                    % [unknowns[rest[kk]] for kk in 
+                                       np.flatnonzero(match < 0)])
+            # kk depends on ll if ll enters the equation matched to kk
+            dependencies = incidence[np.ix_([rows[mm] for mm in match], 
+                                            rest)].copy()
+            np.fill_diagonal(dependencies, False)
+            n_components, labels = connected_components( 
+                sparse.csr_matrix(dependencies.astype(float)), 
+                directed = True, connection = 'strong')
+            
+            # Order of the components: every component after those it 
+            # depends on
+            order, placed = [], set()
+            while len(order) < n_components:
+                for cc in range(n_components):
+                    members = np.flatnonzero(labels == cc)
+                    needed = set(labels[np.flatnonzero( 
+                        dependencies[members].any(axis = 0))]) - {cc}
+                    if cc not in placed and needed <= placed:
+                        order.append(cc)
+                        placed.add(cc)
+            for cc in order:
+                members = np.flatnonzero(labels == cc)
+                blocks.append(([unknowns[rest[kk]] for kk in members], 
+                               [rows[match[kk]] for kk in members]))
+        
+        self._structures[key] = blocks
+        return blocks
+    
+    def summary(self, fixed_values = None):
+        """Unknowns solved recursively (in order) and the core systems, given 
+        the fixed names of the YAML file and of `fixed_values`."""
+        blocks = self.structure({**self.default_fixed_values, 
+                                 **(fixed_values or {})})
+        return {'recursive': [bb[0][0] for bb in blocks if len(bb[0]) == 1], 
+                'core': [bb[0] for bb in blocks if len(bb[0]) > 1]}
+    
+    def solve(self, fixed_values = None, guess = None, tol = 1e-8):
+        """Steady state given the fixed values (in addition to those of the 
+        YAML file), starting from `guess` (a dictionary of steady state 
+        values and parameters) if given: block by block (see `structure`), 
+        each a root-finding over its own unknowns only.
+        
+        Returns the dictionary of all fixed values and unknowns; raises a 
+        `PresolveError` if a block cannot be solved or the solution violates 
+        any equation of the steady state by more than `tol`."""
+        from scipy.optimize import root
+        
+        fixed = {**self.default_fixed_values, **(fixed_values or {})}
+        values = self._initial_values(fixed, guess)
+        namespace = {**dict.fromkeys(self.shocks, 0.), **values}
+        
+        for unknowns, rows in self.structure(fixed):
+            def residuals(x):
+                namespace.update(zip(unknowns, x))
+                return [_evaluate(self.code[ii], namespace) for ii in rows]
+            with np.errstate(all = 'ignore'):
+                result = root(residuals, [namespace[nn] for nn in unknowns], 
+                              method = 'hybr', options = {'xtol': 1e-12})
+            if not np.max(np.abs(residuals(result.x))) <= tol:
+                raise PresolveError('no steady state of %s: %s'
+                                    % (unknowns, result.message))
+            namespace.update(zip(unknowns, result.x))
+        
+        values = {nn: float(namespace[nn]) for nn in values}
+        error = np.max(np.abs(self.residuals(values)))
+        if not error <= tol:
+            raise PresolveError('the steady state violates the equations by '
+                                '%s' % error)
+        return values
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the results registry shared by run_models.py and 
+# run_loop_eta_lambda.py: both scripts obtain their model handles and the 
+# solution cache from it, such that the baseline RANK and TANK solutions 
+# computed by one script are served to the other without recomputation. It 
+# also contains the consistency check that TANK with lam = 0 reproduces RANK
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import numpy as np
+import pandas as pd
+from rank_tank.model_handle import ModelHandle, deviation_scale
+from rank_tank.cache import SolutionCache
+
+###############################################################################
+###############################################################################
+
+class ResultsRegistry:
+    """Registry of the models (name: path to the YAML file), their handles 
+    (created on first use) and the solution cache in `cache_directory` (None: 
+    no caching)."""
+    
+    def __init__(self, models, cache_directory = None):
+        self.models = dict(models)
+        self.cache_directory = cache_directory
+        self.cache = None if cache_directory is None else \
+            SolutionCache(cache_directory)
+        self._handles = {}
+    
+    def handle(self, name):
+        """Model handle of `name`."""
+        if name not in self._handles:
+            self._handles[name] = ModelHandle(self.models[name])
+        return self._handles[name]
+    
+    def solve(self, name, shock, fixed_values = None, horizon = None):
+        """Steady state and path of model `name` (served from the cache if any 
+        script solved it before). Returns the path, the flag and the steady 
+        state dictionary."""
+        return self.handle(name).solve(shock, fixed_values, horizon, 
+                                       cache = self.cache)
+
+def default_registry(absolute_path, use_cache = True):
+    """Registry of the RANK and TANK models in the `models` folder, sharing 
+    the solution cache in `.cache/solutions`."""
+    models = {name: os.path.join(absolute_path, "models", name + ".yaml") 
+              for name in ('rank', 'tank')}
+    cache_directory = os.path.join(absolute_path, ".cache", "solutions") \
+        if use_cache else None
+    return ResultsRegistry(models, cache_directory)
+
+###############################################################################
+###############################################################################
+
+def check_tank_nests_rank(registry, shock, fixed_values = None, tol = 1e-6):
+    """Consistency check: with lam = 0, the TANK model collapses to RANK, so 
+    the paths of all variables the two models share have to coincide. Both 
+    paths are taken from (or added to) the cache of the registry.
+    
+    Returns whether the check passed and the data frame of the maximum 
+    absolute deviation per common variable, relative to the steady state of 
+    RANK (absolute for variables whose steady state is below one in absolute 
+    value, such as bprof, see `deviation_scale`)."""
+    fixed_values = dict(fixed_values or {})
+    x_rank, _, _ = registry.solve('rank', shock, fixed_values)
+    x_tank, _, _ = registry.solve('tank', shock, {**fixed_values, 'lam': 0.})
+    
+    variables_rank = registry.handle('rank')['variables']
+    variables_tank = registry.handle('tank')['variables']
+    common = [vv for vv in variables_rank if vv in variables_tank]
+    
+    path_rank = x_rank[:, [variables_rank.index(vv) for vv in common]]
+    path_tank = x_tank[:, [variables_tank.index(vv) for vv in common]]
+    length = min(len(path_rank), len(path_tank))
+    deviation = np.abs(path_tank[:length] - path_rank[:length]) / \
+        deviation_scale(path_rank[-1])
+    
+    deviations = pd.DataFrame({'variable': common, 
+                               'max_deviation': deviation.max(axis = 0)})
+    return bool((deviations['max_deviation'] < tol).all()), deviations
@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the scenarios of the analysis: a scenario describes 
+# either the IRFs of RANK and TANK after a list of shocks (as in run_models.py), 
+# the sweep over eta and lambda after one shock (as in run_loop_eta_lambda.py), 
+# the ZLB stress test over shock sizes or the stochastic simulation, together 
+# with its horizon, grids, workers and output directories. Scenarios are read 
+# from YAML files (see the `scenarios` folder and run_scenarios.py); several 
+# scenarios run in one process share the loaded models. Plotly is only 
+# imported once figures are rendered
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import copy
+import yaml
+import numpy as np
+import pandas as pd
+from rank_tank.model_handle import solve_shock_batch
+from rank_tank.registry import check_tank_nests_rank
+from rank_tank.irf import percent_deviations, irf_frame
+from rank_tank.plotting import FigureSpec, colours_models, colours_agents
+from rank_tank.sweep import (run_sweep, SweepExecutor, sweep_executor, 
+                             select_sweep_horizon, impact_frame)
+from rank_tank.adaptive import run_adaptive_sweep, interpolate_surface
+from rank_tank.feasibility import map_frontier, FeasibilityFrontier
+from rank_tank.linear import run_linear_sweep
+from rank_tank.zlb import run_zlb_stress
+from rank_tank.task_queue import run_queue_sweep
+from rank_tank.streaming import run_streaming_sweep
+from rank_tank.simulation import run_simulation
+from rank_tank.checkpoint import CheckpointStore
+from rank_tank.store import ResultsStore, store_irfs, store_surface
+from rank_tank.metrics import MetricSpec, metric_tensor
+
+###############################################################################
+###############################################################################
+
+# Settings of the scenarios (relative directories are relative to the root of 
+# the repository)
+
+irf_defaults = {'shocks': [('e_z', 0.02), ('e_beta', 0.02)], 
+                'horizon': 50, # Time horizon of the IRFs
+                'path_horizon': None, # Path length (None: econpizza's 
+                                      # default, 'auto': shortest accurate)
+                'percent': 100, # 100 (1): IRFs (not) in percent
+                'fixed_values': {}, # Parameters differing from the YAML files
+                'check_nesting': False, # Check that TANK with lam = 0 is RANK
+                'plot_names': {}, 
+                'plot_directory': 'plots', 
+                'save_plots': False, 
+                'results_directory': 'results', 
+                'save_results': False} # Save the paths to the results store
+
+sweep_defaults = {'shock': ('e_z', 0.02), 
+                  'variable': 'c', # Variable whose impact is compared
+                  'impact': 1, # Time period of impact
+                  'path_horizon': None, # As for the IRFs
+                  'percent': 100, 
+                  'eta': {'start': 0.33, 'stop': 1, 'step': 0.15, 
+                          'include': [1]}, 
+                  'lam': {'start': 0.1, 'stop': 0.46, 'step': 0.05}, 
+                  'mode': 'grid', # 'grid', 'adaptive', 'frontier', 
+                                  # 'linear', 'queue' or 'stream'
+                  'continuation': True, 
+                  'reuse_jacobian': True, # Re-use Jacobians across points
+                  'budget': 200, # Model solves of the adaptive mode
+                  'linear_tol': 0.1, # Relative path error of the linear mode
+                  'verify': 5, # Points verified non-linearly (linear mode)
+                  'use_frontier': False, 
+                  'checkpoint': False, # True (or a path): checkpointed sweep
+                  'queue': True, # File of the queue of the 'queue' mode 
+                                 # (True: results/sweep_queue.sqlite)
+                  'max_attempts': 3, # Attempts of a task of the queue
+                  'axes': {}, # Further parameter axes of the 'stream' mode 
+                              # (e.g. h, Phi, psi; as for eta)
+                  'chunk_size': 1000, # Records per write of the 'stream' mode
+                  'metrics': {}, # Settings of the MetricSpec (None: none)
+                  'workers': None, 
+                  'plot_names': {}, 
+                  'plot_directory': 'plots', 
+                  'save_plots': False, 
+                  'y_range': [-3., 0.], 
+                  'results_directory': 'results', 
+                  'save_results': False, # Save the surface and the records
+                  'store_paths': False} # Also save the paths of all points
+
+zlb_defaults = {'shocks': ['e_beta', 'e_z'], 
+                'sizes': {'start': 0.01, 'stop': 0.255, 'step': 0.01}, 
+                'fixed_values': {}, 
+                'path_horizon': None, 
+                'bracket': True, # Bracket the size at which the ZLB binds
+                'tol': 1e-4, # Width of the bracket
+                'workers': None, 
+                'results_directory': 'results', 
+                'save_results': False}
+
+simulation_defaults = {'shock_sizes': {'e_z': 0.01, 'e_beta': 0.005}, # Std. 
+                                          # deviations of the innovations
+                       'n_draws': 1000, 
+                       'periods': 200, 
+                       'burn_in': 50, 
+                       'method': 'linear', # 'linear' or 'extended_path'
+                       'path_horizon': None, # Length of the impulse 
+                                             # responses/solved paths
+                       'fixed_values': {}, 
+                       'seed': 0, 
+                       'workers': None, 
+                       'results_directory': 'results', 
+                       'save_results': False}
+
+templates = {'irf': irf_defaults, 'sweep': sweep_defaults, 
+             'zlb': zlb_defaults, 'simulation': simulation_defaults}
+
+# Names of the plot folders (and file name prefixes) of the shocks
+plot_names = {'e_z': 'technology', 'e_beta': 'discount'}
+
+# Labels of the variables whose impact is compared in the sweeps
+variable_labels = {'c': 'Consumption', 'y': 'Output', 'n': 'Labour Hours'}
+
+# Key variables of the IRFs
+varlist_rank = 'c', 'n', 'pi', 'R', 'RR', 'y', 'w', 'i', 'prof'
+varlist_tank = 'c', 'cuu', 'chh', 'n', 'nuu', 'nhh', 'pi', 'R', 'RR', 'y', 'w', 'i', 'prof'
+
+# Aggregate responses (for RANK vs TANK): variable, y-axis labeling and file 
+# name suffix
+figures_aggregate = [('c', 'Consumption', 'agg_c'), 
+                     ('n', 'Labour Hours', 'agg_n'), 
+                     ('w', 'Real Wage', 'wage'), 
+                     ('R', 'Nominal Interest Rate', 'interest'), 
+                     ('RR', 'Real Interest Rate', 'rr'), 
+                     ('y', 'Output', 'output'), 
+                     ('pi', 'Inflation', 'infl'), 
+                     ('i', 'Investment', 'inv'), 
+                     ('prof', 'Firm Profits', 'prof')]
+
+# Individual-level responses (for TANK): variables of the hand-to-mouth and 
+# the unconstrained agents, y-axis labeling and file name suffix
+figures_individual = [(('chh', 'cuu'), 'Consumption', 'ind_c'), 
+                      (('nhh', 'nuu'), 'Labour Hours', 'ind_n')]
+
+###############################################################################
+###############################################################################
+
+# Reading scenarios
+
+def grid(values):
+    """Sequence of parameter values: a list of values or a dictionary with 
+    start, stop and step (as for np.arange) and optionally values to 
+    `include` in addition (e.g. the end point)."""
+    if isinstance(values, dict):
+        sequence = np.arange(values['start'], values['stop'], values['step'])
+        return np.append(sequence, values.get('include', []))
+    return np.array(values, dtype = float)
+
+def make_scenario(entry, defaults = None, base_directory = None):
+    """Complete scenario from the settings `entry` (of kind 'irf', 'sweep', 
+    'zlb' or 'simulation'), the `defaults` shared by several scenarios 
+    (settings which do not apply to the kind of scenario are ignored) and the 
+    defaults above. 
+    Relative directories are taken relative to `base_directory`."""
+    defaults = dict(defaults or {})
+    kind = entry.get('kind', defaults.get('kind', 'irf'))
+    if kind not in templates:
+        raise ValueError('unknown kind of scenario: %s' % kind)
+    template = templates[kind]
+    
+    unknown = [kk for kk in entry if kk not in template and 
+               kk not in ('name', 'kind')]
+    if unknown:
+        raise KeyError('%s are no settings of a scenario of kind %s'
+                       % (unknown, kind))
+    
+    scenario = copy.deepcopy(template)
+    scenario.update({kk: vv for kk, vv in defaults.items() if kk in template})
+    scenario.update(copy.deepcopy(entry))
+    scenario['kind'] = kind
+    scenario.setdefault('name', kind)
+    
+    # Shocks as (name, size) tuples, as expected by econpizza
+    if kind == 'irf':
+        scenario['shocks'] = [tuple(shock) for shock in scenario['shocks']]
+    elif kind == 'sweep':
+        scenario['shock'] = tuple(scenario['shock'])
+    
+    base_directory = base_directory or os.getcwd()
+    for key in ('plot_directory', 'results_directory'):
+        if key in scenario:
+            scenario[key] = os.path.join(base_directory, scenario[key])
+    if kind == 'sweep' and scenario['checkpoint']:
+        scenario['checkpoint'] = os.path.join( 
+            scenario['results_directory'], '%s_checkpoint.jsonl' % 
+            scenario['name']) if scenario['checkpoint'] is True else \
+            os.path.join(base_directory, scenario['checkpoint'])
+    if kind == 'sweep': # One queue for all sweeps (tasks are keyed by shock)
+        scenario['queue'] = os.path.join(scenario['results_directory'], 
+                                         'sweep_queue.sqlite') \
+            if scenario['queue'] is True else \
+            os.path.join(base_directory, scenario['queue'])
+    return scenario
+
+def load_scenarios(path, base_directory = None):
+    """List of the scenarios of the YAML file `path`, which has a list of 
+    `scenarios` (settings as in `irf_defaults`, `sweep_defaults`, 
+    `zlb_defaults` and `simulation_defaults`, plus a unique name and the 
+    kind) and optionally common `defaults`."""
+    with open(path) as file:
+        content = yaml.safe_load(file) or {}
+    
+    scenarios = [make_scenario(entry, content.get('defaults'), base_directory)
+                 for entry in content.get('scenarios', [])]
+    names = [scenario['name'] for scenario in scenarios]
+    duplicates = sorted(set(nn for nn in names if names.count(nn) > 1))
+    if duplicates:
+        raise ValueError('scenario names have to be unique: %s' % duplicates)
+    return scenarios
+
+###############################################################################
+###############################################################################
+
+# Running scenarios
+
+def run_irf_scenario(registry, scenario):
+    """IRFs of RANK and TANK after all shocks of the scenario (each steady 
+    state is solved once, see `solve_shock_batch`), served from and added to 
+    the cache of the registry.
+    
+    Returns a dictionary with the stacked paths (shock x time x variable) and 
+    flags per model, the data frame of percent deviations, the results of the 
+    nesting check per shock (if requested) and the figure specs."""
+    handles = {name: registry.handle(name) for name in ('rank', 'tank')}
+    shocks = scenario['shocks']
+    fixed_values = scenario['fixed_values'] or None
+    path_horizon = scenario['path_horizon']
+    if path_horizon == 'auto': # Longest of the horizons of all models/shocks
+        path_horizon = max(handle.select_horizon(shock, fixed_values, 
+                                                 periods = scenario['horizon']) 
+                           for handle in handles.values() for shock in shocks)
+    paths, flags = solve_shock_batch(handles, shocks, fixed_values, 
+                                     path_horizon, cache = registry.cache)
+    
+    # Consistency check: TANK with lam = 0 has to reproduce RANK
+    nesting = {}
+    if scenario['check_nesting']:
+        for shock in shocks:
+            nesting[shock] = check_tank_nests_rank(registry, shock, 
+                                                   fixed_values)
+    
+    # Percent deviations from steady state of all key variables of both 
+    # models (columns: model and variable, rows: shock and quarters); note 
+    # that by construction, the last value of the IRFs is the steady state
+    irfs = percent_deviations(paths, 
+                              {name: handle['variables']
+                               for name, handle in handles.items()}, 
+                              {'rank': varlist_rank, 'tank': varlist_tank}, 
+                              scenario['horizon'], scenario['percent'], 
+                              shock_labels = shocks)
+    
+    if scenario['save_results']: # Full paths (one parameter point)
+        store = ResultsStore(os.path.join(scenario['results_directory'], 
+                                          'store'))
+        store_irfs(store, '%s_paths' % scenario['name'], 
+                   {name: x[None] for name, x in paths.items()}, 
+                   {name: handle['variables'] 
+                    for name, handle in handles.items()}, 
+                   shocks, [scenario['fixed_values']], 
+                   attrs = {'scenario': scenario['name']})
+    
+    names = {**plot_names, **scenario['plot_names']}
+    specs = []
+    for shock in shocks:
+        name = names.get(shock[0], shock[0])
+        directory = os.path.join(scenario['plot_directory'], name)
+        
+        for variable, label, suffix in figures_aggregate:
+            data = irf_frame(irfs, {'RANK': ('rank', variable), 
+                                    'TANK': ('tank', variable)}, shock = shock)
+            path = os.path.join(directory, "%s_%s.svg" % (name, suffix))
+            specs.append(FigureSpec(data, label, 
+                                    path = path if scenario['save_plots']
+                                    else None, 
+                                    columns = ['RANK', 'TANK'], 
+                                    colours = colours_models))
+        
+        for (variable_hh, variable_uu), label, suffix in figures_individual:
+            data = irf_frame(irfs, {'TANK Hand-to-Mouth': ('tank', variable_hh), 
+                                    'TANK Unconstrained': ('tank', variable_uu)}, 
+                             shock = shock)
+            path = os.path.join(directory, "%s_%s.svg" % (name, suffix))
+            specs.append(FigureSpec(data, label, 
+                                    path = path if scenario['save_plots']
+                                    else None, 
+                                    columns = ['TANK Hand-to-Mouth', 
+                                               'TANK Unconstrained'], 
+                                    colours = colours_agents))
+    
+    return {'paths': paths, 'flags': flags, 'irfs': irfs, 'nesting': nesting, 
+            'specs': specs}
+
+def run_sweep_scenario(registry, scenario, executor = None):
+    """Sweep over eta and lambda after the shock of the scenario, in the 
+    given mode (see run_loop_eta_lambda.py), with the workers of `executor` 
+    if an open `SweepExecutor` is given.
+    
+    Returns a dictionary with the data frame of the impact response relative 
+    to RANK (index: lambda, columns: eta), the point records (with the 
+    metrics of the grid modes, see metrics.py), the feasibility frontier (if 
+    mapped or used), the accuracy report of the linear mode (see linear.py) 
+    and the figure specs. In the 'stream' mode (see streaming.py), the 
+    records of all points of the grid of eta, lambda and the further `axes` 
+    are written to <name>_records.csv in the results directory as they are 
+    solved; the data frame and the returned records are those at the first 
+    values of the further axes, and the report holds the number of solved 
+    and failed points."""
+    rank_model, tank_model = registry.models['rank'], registry.models['tank']
+    eta_sequence = grid(scenario['eta'])
+    lambda_sequence = grid(scenario['lam'])
+    shock = scenario['shock']
+    results_directory = scenario['results_directory']
+    common = dict(workers = scenario['workers'], 
+                  cache_directory = registry.cache_directory, 
+                  executor = executor)
+    
+    # File of the feasibility frontier for the shock
+    full_path_frontier = os.path.join(results_directory, 
+                                      "frontier_%s.csv" % shock[0])
+    
+    mode, frontier, report = scenario['mode'], None, None
+    if mode == 'frontier':
+        # Largest feasible lambda for each eta, saved for later sweeps; the 
+        # grid sweep then skips the infeasible points
+        frontier = map_frontier(rank_model, tank_model, eta_sequence, 
+                                lambda_sequence.min(), lambda_sequence.max(), 
+                                shock, **common)
+        os.makedirs(results_directory, exist_ok = True)
+        frontier.save(full_path_frontier)
+        mode = 'grid'
+    elif mode == 'grid' and scenario['use_frontier']:
+        frontier = FeasibilityFrontier.load(full_path_frontier)
+    
+    if mode == 'grid':
+        checkpoint = CheckpointStore(scenario['checkpoint']) \
+            if scenario['checkpoint'] else None
+        metrics = None if scenario['metrics'] is None else \
+            MetricSpec(**scenario['metrics'])
+        impact, records = run_sweep(rank_model, tank_model, eta_sequence, 
+                                    lambda_sequence, shock, 
+                                    variable = scenario['variable'], 
+                                    impact = scenario['impact'], 
+                                    percent = scenario['percent'], 
+                                    continuation = scenario['continuation'], 
+                                    frontier = frontier, 
+                                    checkpoint = checkpoint, 
+                                    metrics = metrics, 
+                                    horizon = scenario['path_horizon'], 
+                                    reuse_jacobian = 
+                                    scenario['reuse_jacobian'], 
+                                    **common)
+    elif mode == 'adaptive':
+        metrics = None
+        points, records = run_adaptive_sweep(rank_model, tank_model, 
+                                             eta_sequence, lambda_sequence, 
+                                             shock, 
+                                             variable = scenario['variable'], 
+                                             impact = scenario['impact'], 
+                                             percent = scenario['percent'], 
+                                             budget = scenario['budget'], 
+                                             **common)
+        
+        # Interpolated surface (on a fine lambda grid for the values of eta 
+        # of the plot)
+        lambda_fine = np.linspace(lambda_sequence.min(), 
+                                  lambda_sequence.max(), 50)
+        impact = interpolate_surface(points, eta_sequence, lambda_fine)
+    elif mode == 'linear':
+        metrics = None
+        impact, records, report = run_linear_sweep(
+            rank_model, tank_model, eta_sequence, lambda_sequence, shock, 
+            variable = scenario['variable'], impact = scenario['impact'], 
+            percent = scenario['percent'], tol = scenario['linear_tol'], 
+            verify = scenario['verify'], **common)
+    elif mode in ('queue', 'stream'):
+        metrics = None if scenario['metrics'] is None else \
+            MetricSpec(**scenario['metrics'])
+        horizon = scenario['path_horizon']
+        if horizon == 'auto': # Chosen once, before the points are solved
+            with sweep_executor(rank_model, tank_model, 1, 
+                                registry.cache_directory, executor) as pool:
+                horizon = select_sweep_horizon(pool, shock, eta_sequence, 
+                                               lambda_sequence, periods = 
+                                               scenario['impact'] + 1 if 
+                                               metrics is None else 50)
+    else:
+        raise ValueError('unknown sweep mode: %s' % mode)
+    
+    if mode == 'queue':
+        # Published to the queue and solved by local workers and by those of 
+        # run_queue_worker.py on other machines
+        impact, records = run_queue_sweep( 
+            rank_model, tank_model, scenario['queue'], eta_sequence, 
+            lambda_sequence, shock, variable = scenario['variable'], 
+            impact = scenario['impact'], percent = scenario['percent'], 
+            workers = scenario['workers'], 
+            cache_directory = registry.cache_directory, metrics = metrics, 
+            horizon = horizon, reuse_jacobian = scenario['reuse_jacobian'], 
+            max_attempts = scenario['max_attempts'])
+    elif mode == 'stream':
+        # All points of eta x lam x the further axes, whose records are 
+        # written to the records file as they are solved; only those at the 
+        # first values of the further axes are kept for the surface
+        axes = {'eta': eta_sequence}
+        for kk, vv in scenario['axes'].items():
+            if kk in ('eta', 'lam'):
+                raise ValueError('%s is not a further axis' % kk)
+            axes[kk] = grid(vv)
+        baseline = {kk: float(vv[0]) for kk, vv in axes.items() 
+                    if kk != 'eta'}
+        records, report = run_streaming_sweep( 
+            rank_model, tank_model, axes, lambda_sequence, shock, 
+            os.path.join(results_directory, '%s_records.csv' % 
+                         scenario['name']), scenario['chunk_size'], 
+            keep = lambda rr: all(rr.get(kk) == vv 
+                                  for kk, vv in baseline.items()), 
+            variable = scenario['variable'], impact = scenario['impact'], 
+            percent = scenario['percent'], 
+            continuation = scenario['continuation'], metrics = metrics, 
+            horizon = horizon, reuse_jacobian = scenario['reuse_jacobian'], 
+            **common)
+        impact = impact_frame(records, eta_sequence, lambda_sequence, 
+                              scenario['percent'])
+    
+    if scenario['save_results']:
+        store = ResultsStore(os.path.join(results_directory, 'store'))
+        attrs = {'scenario': scenario['name'], 'shock': list(shock), 
+                 'variable': scenario['variable'], 
+                 'impact': scenario['impact'], 
+                 'percent': scenario['percent'], 'mode': scenario['mode']}
+        store_surface(store, '%s_impact' % scenario['name'], impact, attrs)
+        # The records of the 'stream' mode are already in the records file
+        if metrics is not None and mode != 'stream': # All metrics
+            store.write('%s_metrics' % scenario['name'], 
+                        metric_tensor(records, metrics, eta_sequence, 
+                                      lambda_sequence), 
+                        ['model', 'metric', 'variable', 'eta', 'lam'], 
+                        {'model': ['rank', 'tank'], 
+                         'metric': list(metrics.metrics), 
+                         'variable': list(metrics.variables), 
+                         'eta': [float(ee) for ee in eta_sequence], 
+                         'lam': [float(ll) for ll in lambda_sequence]}, 
+                        {**attrs, 'metric_spec': vars(metrics)})
+        if mode != 'stream':
+            pd.DataFrame(records).to_csv(os.path.join( 
+                results_directory, '%s_records.csv' % scenario['name']), 
+                index = False)
+        if scenario['store_paths']:
+            store_sweep_paths(store, '%s_paths' % scenario['name'], registry, 
+                              records, shock, attrs)
+    
+    # Path of the plot (depending on the shock), if it should be saved
+    name = {**plot_names, **scenario['plot_names']}.get(shock[0], shock[0])
+    path = os.path.join(scenario['plot_directory'], "sensitivity", 
+                        "sensitivity_%s.svg" % name)
+    label = variable_labels.get(scenario['variable'], scenario['variable'])
+    spec = FigureSpec(impact, '%s Impact Rel. to RANK' % label, 
+                      path = path if scenario['save_plots'] else None, 
+                      kind = 'sensitivity', 
+                      xaxis_title = "\u03BB", # x-axis labeling
+                      legend_title = '\u03B7', 
+                      y_range = scenario['y_range']) # Fix range of y-axis
+    
+    return {'impact': impact, 'records': records, 'frontier': frontier, 
+            'report': report, 'specs': [spec]}
+
+def store_sweep_paths(store, name, registry, records, shock, attrs = None):
+    """Store the paths of RANK and TANK at all solved TANK points of a sweep 
+    (the RANK path at (eta, lambda) is that of eta) as the result `name` (see 
+    `store_irfs`). The paths are taken from the solution cache of the 
+    registry, such that they are only solved again if they are not cached."""
+    points = [{'eta': rr['eta'], 'lam': rr['lam']} for rr in records 
+              if rr['model'] == 'tank' and rr['error'] is None]
+    if not points:
+        return None
+    paths = {'rank': {}, 'tank': []}
+    for point in points:
+        if point['eta'] not in paths['rank']:
+            paths['rank'][point['eta']] = registry.solve(
+                'rank', shock, {'eta': point['eta']})[0]
+        paths['tank'].append(registry.solve('tank', shock, point)[0])
+    paths = {'rank': [paths['rank'][point['eta']][None] for point in points], 
+             'tank': [x[None] for x in paths['tank']]}
+    return store_irfs(store, name, paths, 
+                      {nn: registry.handle(nn)['variables'] for nn in paths}, 
+                      [shock], points, attrs)
+
+def run_zlb_scenario(registry, scenario, executor = None):
+    """ZLB stress test of RANK and TANK over the shock sizes of the scenario 
+    (see zlb.py), with the workers of `executor` if an open `SweepExecutor` 
+    is given.
+    
+    Returns a dictionary with the data frames of the ZLB statistics per 
+    model, shock and size and of the brackets of the size at which the ZLB 
+    starts binding (no figures)."""
+    records, brackets = run_zlb_stress(registry.models['rank'], 
+                                       registry.models['tank'], 
+                                       scenario['shocks'], 
+                                       grid(scenario['sizes']), 
+                                       scenario['fixed_values'] or None, 
+                                       scenario['path_horizon'], 
+                                       scenario['bracket'], scenario['tol'], 
+                                       workers = scenario['workers'], 
+                                       cache_directory = 
+                                       registry.cache_directory, 
+                                       executor = executor)
+    
+    if scenario['save_results']:
+        os.makedirs(scenario['results_directory'], exist_ok = True)
+        for frame, suffix in ((records, 'zlb'), (brackets, 'zlb_brackets')):
+            frame.to_csv(os.path.join(scenario['results_directory'], 
+                                      '%s_%s.csv' % (scenario['name'], 
+                                                     suffix)), index = False)
+    
+    return {'records': records, 'brackets': brackets, 'specs': []}
+
+def run_simulation_scenario(registry, scenario, executor = None):
+    """Stochastic simulation of RANK and TANK along the same draws of the 
+    scenario (see simulation.py), with the workers of `executor` if an open 
+    `SweepExecutor` is given.
+    
+    Returns a dictionary with the data frame of the simulated moments (columns: 
+    model and moment) and the data frame of the ZLB frequency per model (no 
+    figures)."""
+    moments, summary = run_simulation(registry.models['rank'], 
+                                      registry.models['tank'], 
+                                      scenario['shock_sizes'], 
+                                      scenario['n_draws'], 
+                                      scenario['periods'], 
+                                      scenario['burn_in'], 
+                                      scenario['method'], 
+                                      scenario['path_horizon'], 
+                                      scenario['fixed_values'] or None, 
+                                      scenario['seed'], 
+                                      workers = scenario['workers'], 
+                                      cache_directory = 
+                                      registry.cache_directory, 
+                                      executor = executor)
+    
+    if scenario['save_results']:
+        os.makedirs(scenario['results_directory'], exist_ok = True)
+        for frame, suffix in ((moments, 'moments'), (summary, 'zlb')):
+            frame.to_csv(os.path.join(scenario['results_directory'], 
+                                      '%s_%s.csv' % (scenario['name'], 
+                                                     suffix)))
+    
+    return {'moments': moments, 'summary': summary, 'specs': []}
+
+def run_scenarios(registry, scenarios):
+    """Run the scenarios in order, sharing the loaded models: the IRF 
+    scenarios use the model handles of the registry (loaded once in this 
+    process) and all sweep, ZLB and simulation scenarios with the same 
+    number of workers use one `SweepExecutor` (whose workers load each model 
+    once).
+    
+    Returns the dictionary of the results of each scenario by name."""
+    executors = {}
+    results = {}
+    try:
+        for scenario in scenarios:
+            if scenario['kind'] == 'irf':
+                results[scenario['name']] = run_irf_scenario(registry, 
+                                                             scenario)
+                continue
+            workers = scenario['workers']
+            if workers not in executors:
+                executors[workers] = SweepExecutor(registry.models['rank'], 
+                                                   registry.models['tank'], 
+                                                   workers, 
+                                                   registry.cache_directory)
+            run = {'sweep': run_sweep_scenario, 'zlb': run_zlb_scenario, 
+                   'simulation': run_simulation_scenario}[scenario['kind']]
+            results[scenario['name']] = run(registry, scenario, 
+                                            executors[workers])
+    finally:
+        for executor in executors.values():
+            executor.close()
+    return results
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the sequence-space Jacobians of RANK and TANK: around 
+# the steady state of a model, the stacked linear system of its equations 
+# (see linear.py) is factorized once and solved for a unit innovation of 
+# every shock in every period of the horizon. The resulting Jacobian G maps 
+# any sequence of shocks (a larger or smaller shock, a news shock, a shock 
+# lasting several periods, or several sequences at once) to the linear paths 
+# of all variables by one matrix product, without solving the model again. 
+# The factorization is also kept for the non-linear paths, which are solved 
+# by Newton steps with the Jacobian of the steady state, starting from the 
+# linear path
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank.linear import (linear_system, sparse_factor, 
+                              model_functions, newton_path)
+
+###############################################################################
+###############################################################################
+
+_jacobians = {} # The last Jacobians per model and horizon
+
+class SequenceSpaceJacobian:
+    """Sequence-space Jacobians of the model of `handle` (with its steady 
+    state solved) with the horizon `horizon`, i.e. over the `horizon` - 1 
+    periods between the initial and the terminal steady state (like 
+    `find_path`). G[t, i, s, k] is the linear response of the variable i in period 
+    t to a unit innovation of the shock k in period s (known from the first 
+    period on)."""
+    
+    def __init__(self, handle, horizon = 200):
+        from scipy import sparse
+        
+        self.handle = handle
+        self.horizon = horizon
+        self.periods = horizon - 1
+        self.variables = list(handle['variables'])
+        self.shocks = list(handle['shocks'])
+        system, D, self.xss, self.pars = linear_system(handle, horizon)
+        self.solve = sparse_factor(handle, system)
+        
+        # Unit innovations of all shocks in all periods at once
+        rhs = -sparse.kron(sparse.eye(self.periods), sparse.csr_matrix(D))
+        self.G = self.solve(rhs.toarray()).reshape( 
+            self.periods, len(self.xss), self.periods, len(self.shocks))
+    
+    def matches(self, handle):
+        """Whether the Jacobians are those of the current steady state and 
+        parameters of `handle`."""
+        model = handle.model
+        return handle.model_hash == self.handle.model_hash and \
+            np.array_equal(self.xss, [model['stst'][vv]
+                                      for vv in model['variables']]) and \
+            np.array_equal(self.pars, [model['pars'][pp]
+                                       for pp in model['parameters']])
+    
+    def shock_sequence(self, shocks):
+        """Array (... x period x shock) of the shock sequences `shocks`: such 
+        an array (of up to `horizon` - 1 periods), a dictionary of sequences 
+        keyed by the shock (e.g. {'e_beta': [0., 0., 0.005]} for a news 
+        shock) or a (shock, size) pair as taken by `find_path` (an innovation 
+        in the first period). Missing periods are zero."""
+        if isinstance(shocks, tuple):
+            shocks = {shocks[0]: [shocks[1]]}
+        if isinstance(shocks, dict):
+            unknown = set(shocks) - set(self.shocks)
+            if unknown:
+                raise ValueError('unknown shocks: %s' % sorted(unknown))
+            length = max(len(np.atleast_1d(vv)) for vv in shocks.values())
+            array = np.zeros((length, len(self.shocks)))
+            for kk, vv in shocks.items():
+                vv = np.atleast_1d(vv)
+                array[:len(vv), self.shocks.index(kk)] = vv
+            shocks = array
+        shocks = np.asarray(shocks, dtype = float)
+        if shocks.shape[-2] > self.periods:
+            raise ValueError('the shock sequence is longer than the horizon '
+                             '(%d periods)' % self.periods)
+        padding = [(0, 0)]*(shocks.ndim - 2) + \
+            [(0, self.periods - shocks.shape[-2]), (0, 0)]
+        return np.pad(shocks, padding)
+    
+    def irf(self, shocks):
+        """Linear paths after the shock sequence(s) `shocks` (see 
+        `shock_sequence`): one product with G. Returns the path(s) in levels 
+        (... x period x variable), with the initial and the terminal steady 
+        state as first and last row (like the paths of `linear_path`)."""
+        shocks = self.shock_sequence(shocks)
+        dx = np.tensordot(shocks, self.G, axes = ([-2, -1], [2, 3]))
+        steady = np.broadcast_to(self.xss, dx.shape[:-2] + (1, len(self.xss)))
+        return np.concatenate((steady, self.xss + dx, steady), axis = -2)
+    
+    def nonlinear_path(self, shocks, guess = None, tol = 1e-8, max_iter = 30):
+        """Non-linear path after the shock sequence `shocks` (see 
+        `shock_sequence`, a single sequence): Newton steps with the Jacobian 
+        of the steady state (whose factorization is kept), starting from the 
+        linear path or from the path `guess` (in levels, without the initial 
+        and the terminal steady state). If these steps do not converge within 
+        `max_iter` steps (e.g. at the kink of the ZLB), Newton's method with 
+        the Jacobians along the path continues from the last of them.
+        
+        Returns the path (in levels, with the initial and the terminal steady 
+        state as first and last row) and the flag (False if the path was 
+        found), like `find_path`."""
+        _, residuals = model_functions(self.handle)
+        shocks = self.shock_sequence(shocks)
+        x = self.irf(shocks)[1:-1] if guess is None else \
+            np.array(guess, dtype = float)
+        
+        for _ in range(max_iter):
+            full = np.vstack((self.xss, x, self.xss))
+            error = np.asarray(residuals(full, self.xss, shocks, self.pars))
+            if np.max(np.abs(error)) < tol:
+                return full, False
+            x = x - self.solve(error.ravel()).reshape(x.shape)
+            if not np.isfinite(x).all():
+                x = self.irf(shocks)[1:-1]
+                break
+        
+        x, converged = newton_path(self.handle, x, self.xss, self.xss, shocks, 
+                                   self.pars, tol, max_iter)
+        return np.vstack((self.xss, x, self.xss)), not converged
+
+def sequence_space_jacobian(handle, horizon = 200):
+    """Sequence-space Jacobians of the model of `handle` at its current 
+    steady state (see `SequenceSpaceJacobian`): computed once and re-used as 
+    long as the steady state and the parameters do not change (the last 
+    ones are kept per model and horizon)."""
+    key = handle.model_hash, horizon
+    if key not in _jacobians or not _jacobians[key].matches(handle):
+        _jacobians[key] = SequenceSpaceJacobian(handle, horizon)
+    return _jacobians[key]
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the stochastic simulation of RANK and TANK: thousands 
+# of sequences of e_z/e_beta shocks are drawn and both models are simulated 
+# along the same draws, batched across draws with array operations. By 
+# default, the simulation uses the first-order solution: the paths are the 
+# convolution of the shocks with the linear impulse responses (computed once 
+# per model, see linear.py), done by FFT for all draws at once. The optional 
+# extended path mode solves the non-linear model (including the ZLB) period by 
+# period under perfect foresight of the current shock. The simulated moments 
+# (standard deviations, correlations and the frequency of the ZLB) are 
+# reported for both models
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pandas as pd
+from rank_tank.sweep import worker_handle, sweep_executor
+from rank_tank.linear import (linear_system, sparse_factor, sparse_solve, 
+                              model_functions, newton_path)
+from rank_tank.instrumentation import get_recorder
+from rank_tank.model_handle import deviation_scale
+
+###############################################################################
+###############################################################################
+
+# Shocks and paths
+
+def draw_shocks(shock_names, sigmas, n_draws = 1000, periods = 200, seed = 0):
+    """Normally distributed innovations with the standard deviation 
+    sigmas[name] for each shock of `shock_names` (shocks without a standard 
+    deviation are zero). Returns the array of dimension draw x period x 
+    shock; the same `seed` gives the same draws, such that RANK and TANK are 
+    simulated along the same shocks."""
+    generator = np.random.default_rng(seed)
+    draws = generator.standard_normal((n_draws, periods, len(shock_names)))
+    return draws*np.array([sigmas.get(ss, 0.) for ss in shock_names])
+
+def impulse_responses(handle, horizon = 200):
+    """Linear responses of all variables of the model of `handle` (with its 
+    steady state solved) to a unit innovation of each of its shocks in the 
+    first period, as deviations from steady state. Returns the array of 
+    dimension period x variable x shock and the steady state."""
+    system, D, xss, _ = linear_system(handle, horizon)
+    rhs = np.zeros(((horizon - 1)*len(xss), D.shape[1]))
+    rhs[:len(xss)] = -D # All shocks at once
+    dx = sparse_solve(handle, system, rhs)
+    return dx.reshape(horizon - 1, len(xss), D.shape[1]), xss
+
+def simulate_linear(irfs, draws):
+    """First-order paths after the innovations `draws` (draw x period x 
+    shock), starting in the steady state: the sum over the shocks of the 
+    convolution of the innovations with the impulse responses `irfs` 
+    (period x variable x shock), computed by FFT for all draws at once. 
+    Returns the deviations from steady state (draw x period x variable)."""
+    periods = draws.shape[1]
+    length = 1 << int(np.ceil(np.log2(periods + len(irfs) - 1)))
+    spectrum = np.einsum('dfs,fns->dfn', np.fft.rfft(draws, length, axis = 1), 
+                         np.fft.rfft(irfs, length, axis = 0))
+    return np.fft.irfft(spectrum, length, axis = 1)[:, :periods]
+
+def simulate_extended_path(handle, draws, horizon = 50, tol = 1e-8, 
+                           max_iter = 20):
+    """Non-linear paths after the innovations `draws` (draw x period x shock) 
+    by the extended path method: in every period, the model is solved over 
+    `horizon` periods from the current state, given the innovation of the 
+    period and no further ones, and the first period is kept. All draws are 
+    solved together by Newton steps with the stacked Jacobian of the steady 
+    state (factorized once); draws which do not converge that way within 
+    `max_iter` steps (e.g. at the kink of the ZLB or after large shocks) are 
+    solved by Newton's method with the Jacobians along their path, starting 
+    from the last of these steps.
+    
+    Returns the deviations from steady state (draw x period x variable) and 
+    the number of periods which did not converge (NaN in the paths)."""
+    import jax
+    
+    system, _, xss, pars = linear_system(handle, horizon)
+    solve = sparse_factor(handle, system)
+    length = horizon - 1 # Periods between the state and the steady state
+    _, residuals = model_functions(handle)
+    batch_residuals = jax.jit(jax.vmap(residuals, in_axes = (0, None, 0, 
+                                                             None)))
+    
+    n_draws, periods, n_shocks = draws.shape
+    n = len(xss)
+    deviations = np.full((n_draws, periods, n), np.nan)
+    paths = np.tile(xss, (n_draws, length, 1)) # Guesses of the paths
+    state = np.tile(xss, (n_draws, 1))
+    terminal = np.tile(xss, (n_draws, 1, 1))
+    failed = 0
+    
+    for tt in range(periods):
+        shocks = np.zeros((n_draws, length, n_shocks))
+        shocks[:, 0] = draws[:, tt]
+        converged = np.zeros(n_draws, dtype = bool)
+        for _ in range(max_iter):
+            full = np.concatenate((state[:, None], paths, terminal), axis = 1)
+            error = np.asarray(batch_residuals(full, xss, shocks, pars))
+            converged = np.max(np.abs(error), axis = (1, 2)) < tol
+            if converged.all():
+                break
+            step = solve(error[~converged].reshape(-1, length*n).T)
+            paths[~converged] -= step.T.reshape(-1, length, n)
+        
+        for dd in np.flatnonzero(~converged): # From the last iterate
+            guess = paths[dd] if np.isfinite(paths[dd]).all() else \
+                np.tile(xss, (length, 1))
+            paths[dd], converged[dd] = newton_path(handle, guess, state[dd], 
+                                                   xss, shocks[dd], pars, 
+                                                   tol, max_iter)
+        failed += int((~converged).sum())
+        
+        deviations[converged, tt] = paths[converged, 0] - xss
+        state = np.where(converged[:, None], paths[:, 0], state)
+        # Guess of the next period: the expected path, shifted by a period
+        paths = np.concatenate((paths[:, 1:], terminal), axis = 1)
+        paths[~converged] = xss
+    return deviations, failed
+
+###############################################################################
+###############################################################################
+
+# Moments
+
+def simulated_moments(variables, deviations, xss, burn_in = 0, 
+                      correlate = 'y', rate = 'R', bound = 1., tol = 1e-8):
+    """Moments of the simulated deviations from steady state (draw x period 
+    x variable, in levels of the variables `variables` with steady state 
+    `xss`): per variable, the standard deviation (in percent of the steady 
+    state, or in percentage points for variables whose steady state is 
+    below one in absolute value, see `deviation_scale`), the first-order 
+    autocorrelation and the correlation with `correlate`, pooled over the 
+    draws after `burn_in` periods. The correlations of variables which do 
+    not vary (e.g. z without e_z shocks) are not defined (NaN). Also returns 
+    the share of periods in which the rate `rate` is at its lower `bound` 
+    (for first-order paths, the rate is not bounded, so this is the share of 
+    periods in which it would be below the bound)."""
+    relative = deviations[:, burn_in:]/deviation_scale(xss)*100
+    centred = relative - np.nanmean(relative, axis = (0, 1))
+    std = np.sqrt(np.nanmean(centred**2, axis = (0, 1)))
+    varies = std > 0
+    index = variables.index(correlate)
+    with np.errstate(all = 'ignore'):
+        autocorrelation = np.where(varies, np.nanmean( 
+            centred[:, 1:]*centred[:, :-1], axis = (0, 1))/std**2, np.nan)
+        correlation = np.where(varies & varies[index], np.nanmean( 
+            centred*centred[..., index:index + 1], axis = (0, 1))/ 
+            (std*std[index]), np.nan)
+    moments = pd.DataFrame({'std': std, 'autocorrelation': autocorrelation, 
+                            'correlation_%s' % correlate: correlation}, 
+                           index = pd.Index(variables, name = 'variable'))
+    
+    level = deviations[:, burn_in:, variables.index(rate)] + \
+        xss[variables.index(rate)]
+    zlb = float(np.mean(level[~np.isnan(level)] <= bound + tol))
+    return moments, zlb
+
+###############################################################################
+###############################################################################
+
+# The simulation of both models
+
+def _simulation_task(task):
+    """Moments of one model along the draws (used as the function mapped by 
+    the pool)."""
+    name, fixed_values, shock_sizes, options = task
+    result = {'model': name, 'moments': None, 'zlb': np.nan, 'failed': 0, 
+              'error': None}
+    try:
+        handle = worker_handle(name)
+        fixed_values = {kk: vv for kk, vv in (fixed_values or {}).items()
+                        if kk in handle.dictionary['parameters'] or 
+                        kk in handle.default_fixed_values}
+        handle.solve_stst(fixed_values)
+        
+        draws = draw_shocks(handle['shocks'], shock_sizes, options['n_draws'], 
+                            options['periods'] + options['burn_in'], 
+                            options['seed'])
+        with get_recorder().stage('simulate'):
+            if options['method'] == 'linear':
+                irfs, xss = impulse_responses(handle, options['horizon'])
+                deviations = simulate_linear(irfs, draws)
+            elif options['method'] == 'extended_path':
+                deviations, result['failed'] = simulate_extended_path( 
+                    handle, draws, options['horizon'])
+                xss = np.array([handle.model['stst'][vv]
+                                for vv in handle['variables']])
+            else:
+                raise ValueError('unknown simulation method: %s'
+                                 % options['method'])
+        result['moments'], result['zlb'] = simulated_moments( 
+            handle['variables'], deviations, xss, options['burn_in'])
+    except Exception as error:
+        result['error'] = repr(error)
+    return result
+
+def run_simulation(rank_model, tank_model, shock_sizes, n_draws = 1000, 
+                   periods = 200, burn_in = 50, method = 'linear', 
+                   horizon = None, fixed_values = None, seed = 0, 
+                   workers = None, cache_directory = None, executor = None):
+    """Stochastic simulation of RANK and TANK along the same `n_draws` 
+    sequences of innovations with the standard deviations `shock_sizes` 
+    (dictionary keyed by the shock), each of `periods` periods after 
+    `burn_in` periods from the steady state.
+    
+    With method = 'linear', the paths are the first-order solution (see 
+    `simulate_linear`; `horizon` is the length of the impulse responses, 
+    200 by default); with method = 'extended_path', the non-linear model is 
+    solved period by period, which respects the ZLB (see 
+    `simulate_extended_path`; `horizon` is the length of the solved paths, 
+    50 by default). The cost of the first-order solution is mostly the 
+    impulse responses, computed once per model whatever the number of draws.
+    
+    Returns the data frame of the moments (see `simulated_moments`) with 
+    columns model and moment, and the data frame of the ZLB frequency, the 
+    number of periods which did not converge and the error per model."""
+    if horizon is None:
+        horizon = 200 if method == 'linear' else 50
+    options = {'n_draws': n_draws, 'periods': periods, 'burn_in': burn_in, 
+               'method': method, 'horizon': horizon, 'seed': seed}
+    tasks = [(name, fixed_values, shock_sizes, options)
+             for name in ('rank', 'tank')]
+    with sweep_executor(rank_model, tank_model, workers, cache_directory, 
+                        executor) as executor:
+        results = executor.map(_simulation_task, tasks)
+    
+    solved = {rr['model']: rr['moments'] for rr in results
+              if rr['moments'] is not None}
+    moments = pd.concat(solved, axis = 1, names = ['model', 'moment']) \
+        if solved else pd.DataFrame()
+    summary = pd.DataFrame([{kk: rr[kk] for kk in ('model', 'zlb', 'failed', 
+                                                    'error')}
+                            for rr in results]).set_index('model')
+    return moments, summary
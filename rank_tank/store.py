@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the results store: every result (such as the IRF 
+# tensor of model x shock x parameter point x time x variable or the impact 
+# surface of a sweep) is saved as one typed .npy array plus a JSON file with 
+# the names of its dimensions and the labels along each of them (e.g. the 
+# variables of the YAML files). Arrays are opened memory-mapped, such that 
+# reading a single variable or a slice of the grid only reads that part of the 
+# file and downstream analysis does not need to solve the models again
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import json
+import tempfile
+import numpy as np
+
+###############################################################################
+###############################################################################
+
+def _label(value):
+    """Canonical form of a label (tuples and lists, numpy and Python numbers 
+    compare equal)."""
+    return json.dumps(value, sort_keys = True, default = float)
+
+class StoredArray:
+    """Array with named dimensions `dims` and the list of labels along each 
+    dimension in `coords` (a dictionary keyed by the dimension); `attrs` holds 
+    further metadata. `data` is usually a read-only memory map."""
+    
+    def __init__(self, data, dims, coords, attrs = None):
+        self.data = data
+        self.dims = list(dims)
+        self.coords = {dim: list(coords[dim]) for dim in self.dims}
+        self.attrs = dict(attrs or {})
+    
+    @property
+    def shape(self):
+        return self.data.shape
+    
+    def index(self, dim, label):
+        """Position of `label` along dimension `dim`."""
+        labels = [_label(ll) for ll in self.coords[dim]]
+        try:
+            return labels.index(_label(label))
+        except ValueError:
+            raise KeyError('%s is not a label of %s' % (label, dim)) from None
+    
+    def select(self, **selection):
+        """Read a part of the array, selected by labels: a single label drops 
+        the dimension, a list of labels keeps it (e.g. 
+        `select(model = 'tank', variable = ['c', 'y'])`). Only the selected 
+        part is read from disk.
+        
+        Returns the numpy array and the list of the remaining dimensions."""
+        unknown = [dim for dim in selection if dim not in self.dims]
+        if unknown:
+            raise KeyError('%s are no dimensions of the array %s'
+                           % (unknown, self.dims))
+        
+        # Single labels first (basic indexing reads only that slice of a 
+        # memory map), lists of labels afterwards on the smaller array
+        basic = tuple(self.index(dim, selection[dim])
+                      if dim in selection and not
+                      isinstance(selection[dim], list) else slice(None)
+                      for dim in self.dims)
+        data = self.data[basic]
+        dims = [dim for dim, bb in zip(self.dims, basic)
+                if isinstance(bb, slice)]
+        for dim in list(dims):
+            if dim in selection:
+                positions = [self.index(dim, ll) for ll in selection[dim]]
+                data = np.take(data, positions, axis = dims.index(dim))
+        return np.array(data), dims
+
+class ResultsStore:
+    """Results store in `directory` (one `<name>.npy` and `<name>.json` file 
+    per result)."""
+    
+    def __init__(self, directory = os.path.join('results', 'store')):
+        self.directory = directory
+        os.makedirs(directory, exist_ok = True)
+    
+    def _path(self, name, extension):
+        return os.path.join(self.directory, name + extension)
+    
+    def names(self):
+        """Names of all stored results."""
+        return sorted(entry[:-5] for entry in os.listdir(self.directory)
+                      if entry.endswith('.json'))
+    
+    def write(self, name, data, dims, coords, attrs = None):
+        """Store the array `data` (with dimensions `dims` and labels `coords`, 
+        see `StoredArray`) as `name`, replacing an earlier result of that 
+        name. Both files are written atomically. Returns the opened result."""
+        data = np.asarray(data)
+        if len(dims) != data.ndim or \
+                [len(coords[dim]) for dim in dims] != list(data.shape):
+            raise ValueError('the labels %s do not match the shape %s'
+                             % ({dim: len(coords[dim]) for dim in dims}, 
+                                data.shape))
+        metadata = {'dims': list(dims), 'dtype': data.dtype.str, 
+                    'shape': list(data.shape), 
+                    'coords': {dim: list(coords[dim]) for dim in dims}, 
+                    'attrs': dict(attrs or {})}
+        
+        handle, tmp_path = tempfile.mkstemp(dir = self.directory, 
+                                            suffix = '.tmp')
+        with os.fdopen(handle, 'wb') as file:
+            np.save(file, data)
+        os.replace(tmp_path, self._path(name, '.npy'))
+        
+        handle, tmp_path = tempfile.mkstemp(dir = self.directory, 
+                                            suffix = '.tmp')
+        with os.fdopen(handle, 'w') as file:
+            json.dump(metadata, file, indent = 1, default = float)
+        os.replace(tmp_path, self._path(name, '.json'))
+        return self.open(name)
+    
+    def open(self, name, mmap_mode = 'r'):
+        """Open the result `name` (memory-mapped, unless `mmap_mode` is 
+        None)."""
+        with open(self._path(name, '.json')) as file:
+            metadata = json.load(file)
+        data = np.load(self._path(name, '.npy'), mmap_mode = mmap_mode)
+        return StoredArray(data, metadata['dims'], metadata['coords'], 
+                           metadata['attrs'])
+
+###############################################################################
+###############################################################################
+
+# Results of the analysis
+
+def irf_tensor(paths, variables):
+    """Stack the paths of several models into one tensor of dimension model x 
+    shock x point x time x variable.
+    
+    `paths` is a dictionary keyed by the model name holding the array of 
+    paths of dimension point x shock x time x variable; `variables` holds the 
+    list of variables of each model (as in the YAML files). The variables of 
+    the tensor are those of all models (in the order of first appearance); 
+    variables missing in a model and periods beyond a shorter path are NaN.
+    
+    Returns the tensor and the list of its variables."""
+    names = list(paths)
+    union = list(dict.fromkeys(vv for name in names for vv in variables[name]))
+    n_points, n_shocks = np.shape(paths[names[0]])[:2]
+    length = max(np.shape(paths[name])[2] for name in names)
+    
+    tensor = np.full((len(names), n_shocks, n_points, length, len(union)), 
+                     np.nan)
+    for mm, name in enumerate(names):
+        x = np.asarray(paths[name])
+        columns = [union.index(vv) for vv in variables[name]]
+        tensor[mm][:, :, :x.shape[2], columns] = np.swapaxes(x, 0, 1)
+    return tensor, union
+
+def store_irfs(store, name, paths, variables, shocks, points, attrs = None):
+    """Store the paths of all models (see `irf_tensor`) after `shocks` (list 
+    of (name, size) tuples) at the parameter `points` (list of dictionaries 
+    of fixed values) as the result `name` with dimensions model, shock, 
+    point, time and variable. The paths are stored in levels; by construction, 
+    their last value is the steady state (see irf.py for the deviations)."""
+    tensor, union = irf_tensor(paths, variables)
+    coords = {'model': list(paths), 
+              'shock': [list(shock) for shock in shocks], 
+              'point': [dict(point) for point in points], 
+              'time': list(range(tensor.shape[3])), 
+              'variable': union}
+    return store.write(name, tensor, 
+                       ['model', 'shock', 'point', 'time', 'variable'], 
+                       coords, attrs)
+
+def store_surface(store, name, surface, attrs = None):
+    """Store the impact surface of a sweep (data frame with index lambda and 
+    columns eta) as the result `name` with dimensions lam and eta."""
+    coords = {'lam': [float(ll) for ll in surface.index], 
+              'eta': [float(ee) for ee in surface.columns]}
+    return store.write(name, surface.to_numpy(dtype = float), ['lam', 'eta'], 
+                       coords, attrs)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the streaming sweep for very large grids (e.g. over 
+# eta, lam, h, Phi and psi together): the grid points are generated lazily, 
+# only a bounded number of tasks is handed to the workers at any time, the 
+# summary record of every point (impact, metrics, failure reason) is yielded 
+# as soon as it is solved and the full paths are dropped unless they are 
+# asked for. The records are written to a CSV file in chunks, such that the 
+# memory of a sweep does not grow with the size of its grid
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import itertools
+import numpy as np
+import pandas as pd
+from rank_tank.sweep import sweep_executor, solve_lambda_ray
+
+###############################################################################
+###############################################################################
+
+# Grid points
+
+def grid_points(axes):
+    """Yield the points of the grid with the parameter axes `axes` as 
+    dictionaries of fixed values, one after another (the last axis varies 
+    fastest)."""
+    names = list(axes)
+    for values in itertools.product(*(axes[nn] for nn in names)):
+        yield dict(zip(names, (float(vv) for vv in values)))
+
+def _stream_task(task):
+    """Records of RANK and TANK along the lambda grid at one point of the 
+    other axes, with the TANK impact response relative to RANK (used as the 
+    function mapped by the pool)."""
+    fixed_values, lambda_sequence, specific_shock, variable, impact, \
+        percent, kwargs = task
+    records = solve_lambda_ray(fixed_values, lambda_sequence, specific_shock, 
+                               variable, impact, **kwargs)
+    rank = records[0]
+    rank.update(fixed_values)
+    for rr in records[1:]:
+        rr['relative'] = percent*(rr['impact'] - rank['impact']) \
+            if rank['error'] is None and rr['error'] is None else np.nan
+    return records
+
+###############################################################################
+###############################################################################
+
+# Writing the records
+
+class RecordWriter:
+    """Writer of point records to the CSV file `path` in chunks of 
+    `chunk_size` records. The columns are `columns` (defaults to those of 
+    the first chunk); entries of the records which are no columns (e.g. the 
+    paths) are not written."""
+    
+    def __init__(self, path, chunk_size = 1000, columns = None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.columns = None if columns is None else list(columns)
+        self.written = 0
+        self._chunk = []
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        if os.path.exists(path): # A new file for every sweep
+            os.remove(path)
+    
+    def write(self, record):
+        if self.columns is not None: # Do not hold the entries not written
+            record = {kk: record[kk] for kk in self.columns if kk in record}
+        self._chunk.append(record)
+        if len(self._chunk) >= self.chunk_size:
+            self.flush()
+    
+    def flush(self):
+        """Append the records of the current chunk to the file."""
+        if not self._chunk:
+            return
+        if self.columns is None:
+            self.columns = list(dict.fromkeys(kk for rr in self._chunk
+                                              for kk in rr))
+        frame = pd.DataFrame(self._chunk).reindex(columns = self.columns)
+        frame.to_csv(self.path, mode = 'a', header = self.written == 0, 
+                     index = False)
+        self.written += len(self._chunk)
+        self._chunk = []
+    
+    def close(self):
+        self.flush()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+def read_records(path, chunk_size = 100000):
+    """Yield the records written by a `RecordWriter` as data frames of up to 
+    `chunk_size` rows (such that also the analysis of a large sweep does not 
+    need to hold all of its records)."""
+    yield from pd.read_csv(path, chunksize = chunk_size)
+
+###############################################################################
+###############################################################################
+
+# The streaming sweep
+
+def stream_sweep(rank_model, tank_model, axes, lambda_sequence, 
+                 specific_shock, variable = 'c', impact = 1, percent = 100, 
+                 continuation = True, max_halvings = 4, metrics = None, 
+                 horizon = None, reuse_jacobian = False, keep_paths = False, 
+                 workers = None, cache_directory = None, executor = None, 
+                 max_pending = None):
+    """Generator of the records of a sweep over the grid of the parameter 
+    axes `axes` (dictionary of sequences keyed by the parameter, e.g. eta, 
+    h, Phi and psi) and `lambda_sequence`. At every point of `axes`, RANK 
+    and each TANK point along the (sorted) lambda grid are solved by one 
+    worker (see `solve_lambda_ray`; with `continuation`, warm-started along 
+    lambda), and the records of these points are yielded as soon as they 
+    are finished (in the order in which they finish). The TANK records also 
+    hold the impact response relative to RANK at the same point of `axes` 
+    as 'relative' (in percent with percent = 100).
+    
+    The points are generated lazily and at most `max_pending` of them 
+    (defaults to twice the number of workers) are handed to the workers at 
+    any time (see `SweepExecutor.istream`); the records only hold the 
+    summary of each point (the impact response, the metrics of `metrics`, 
+    see metrics.py, and the failure reason) unless `keep_paths`, with which 
+    they also hold the path as 'x'. The other settings are those of 
+    `run_sweep`."""
+    kwargs = {'continuation': continuation, 'max_halvings': max_halvings, 
+              'keep_paths': keep_paths, 'metrics': metrics, 
+              'horizon': horizon, 'reuse_jacobian': reuse_jacobian}
+    lambda_sequence = [float(ll) for ll in np.sort(lambda_sequence)]
+    tasks = ((fixed_values, lambda_sequence, specific_shock, variable, 
+              impact, percent, kwargs) for fixed_values in grid_points(axes))
+    with sweep_executor(rank_model, tank_model, workers, cache_directory, 
+                        executor) as executor:
+        for _, records in executor.istream(_stream_task, tasks, max_pending):
+            yield from records
+
+def run_streaming_sweep(rank_model, tank_model, axes, lambda_sequence, 
+                        specific_shock, path, chunk_size = 1000, 
+                        keep = None, **kwargs):
+    """Streaming sweep (see `stream_sweep`, which takes the keyword 
+    arguments `kwargs`) whose records are written to the CSV file `path` in 
+    chunks of `chunk_size` records (see `RecordWriter`). Only the records 
+    for which the function `keep` returns True (e.g. those of a slice of the 
+    grid for a plot) are also kept in memory.
+    
+    Returns the list of the kept records and a report with the number of 
+    RANK and TANK points, the number of failed points by reason and the 
+    file."""
+    columns = list(dict.fromkeys(list(axes) + ['lam']))
+    columns += ['model', 'shock', 'size', 'variable', 'period', 'impact', 
+                'relative', 'flag', 'reason', 'error', 'horizon', 'steps']
+    if kwargs.get('metrics') is not None:
+        columns += ['metric_spec'] + list(kwargs['metrics'].columns())
+    
+    kept, points, failed = [], {'rank': 0, 'tank': 0}, {}
+    with RecordWriter(path, chunk_size, columns) as writer:
+        for record in stream_sweep(rank_model, tank_model, axes, 
+                                   lambda_sequence, specific_shock, 
+                                   **kwargs):
+            writer.write(record)
+            points[record['model']] += 1
+            if record['reason'] is not None:
+                failed[record['reason']] = failed.get(record['reason'], 0) + 1
+            if keep is not None and keep(record):
+                kept.append(record)
+    
+    report = {'points': points, 'failed': failed, 'records': path}
+    return kept, report
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the execution engine for the eta x lambda sweep: each 
+# (eta, lambda) grid point is solved in a worker process of a process pool 
+# (which compiles each model only once, see model_handle.py) and the results 
+# are gathered back into the impact data frame
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import itertools
+import contextlib
+from concurrent.futures import (ProcessPoolExecutor, as_completed, wait, 
+                                FIRST_COMPLETED)
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+from rank_tank.model_handle import ModelHandle, SolveError
+from rank_tank.cache import SolutionCache
+from rank_tank.checkpoint import point_key
+
+###############################################################################
+###############################################################################
+
+# Worker state (each worker process owns its own copy of the models and 
+# compiles each of them once, when it is first needed); the models are given 
+# as paths to their YAML files (or as parsed model dictionaries)
+
+_worker_models = {}
+_worker_handles = {}
+_worker_cache = {}
+
+def _init_worker(rank_model, tank_model, cache_directory = None):
+    """Store the models (and the solution cache, if any) in the worker 
+    process."""
+    _worker_models['rank'] = rank_model
+    _worker_models['tank'] = tank_model
+    _worker_handles.clear()
+    _worker_cache['cache'] = None if cache_directory is None else \
+        SolutionCache(cache_directory)
+
+def worker_handle(name):
+    """The model handle of `name` in this worker (loaded on first use)."""
+    if name not in _worker_handles:
+        _worker_handles[name] = ModelHandle(_worker_models[name])
+    return _worker_handles[name]
+
+###############################################################################
+###############################################################################
+
+# Solving a single grid point
+
+def impact_response(model, x, variable, impact):
+    """Relative deviation of `variable` from its steady state in period 
+    `impact` (the last value of the path is the steady state by 
+    construction)."""
+    index = model['variables'].index(variable)
+    stst = x[-1, index]
+    return float((x[impact, index] - stst)/stst)
+
+def solve_point(name, fixed_values, specific_shock, variable, impact, 
+                guess = None, metrics = None, horizon = None, 
+                reuse_jacobian = False):
+    """Re-parameterize the (once compiled) model `name` with the given fixed 
+    values, solve for its steady state and for the path after 
+    `specific_shock`. Returns a record with the impact response of 
+    `variable`, the flag of `find_path` and, if the parameter combination 
+    does not work, the stage at which it failed ('steady_state' or 'path', 
+    also if `find_path` returned a flag) and the error message. The record 
+    also holds the hash of the model and its fixed values which differ from 
+    the YAML file, which identify the point (see `point_key`). 
+    
+    If `guess` (the warm start of a previously solved point) is given, the 
+    steady state root-finding starts from its steady state and `find_path` 
+    starts from its path. The warm start of this point is returned alongside 
+    the record (None if the point could not be solved). 
+    
+    If a `MetricSpec` is given as `metrics` (see metrics.py), the record also 
+    holds its metrics of the path for all of its variables. `horizon` is the 
+    path length (None: the default of econpizza). With `reuse_jacobian`, 
+    `find_path` first tries the Jacobian of the point solved before by this 
+    worker (see `ModelHandle.find_path`)."""
+    record = dict(fixed_values, model = name, shock = specific_shock[0], 
+                  size = specific_shock[1], variable = variable, 
+                  period = impact, impact = np.nan, flag = None, 
+                  reason = None, error = None, horizon = horizon, 
+                  model_hash = None, fixed_values = dict(fixed_values))
+    if metrics is not None:
+        record['metric_spec'] = metrics.label()
+        record.update(dict.fromkeys(metrics.columns(), np.nan))
+    try: # Some parameter combinations might not work
+        handle = worker_handle(name)
+        record.update(model_hash = handle.model_hash, fixed_values = 
+                      handle.canonical_fixed_values(fixed_values))
+        x, flag, stst = handle.solve(specific_shock, fixed_values, 
+                                     horizon = horizon, guess = guess, 
+                                     cache = _worker_cache.get('cache'), 
+                                     reuse_jacobian = reuse_jacobian)
+        record['flag'] = flag
+        record['impact'] = impact_response(handle, x, variable, impact)
+        if metrics is not None: # All metrics in one pass over the path
+            record.update(metrics.compute(handle['variables'], x))
+        if flag: # Do not warm-start from paths that did not converge
+            record.update(reason = 'path', 
+                          error = 'find_path did not converge')
+            return record, None
+        return record, {'stst': stst, 'x': x}
+    except SolveError as error:
+        record.update(reason = error.stage, error = repr(error.error))
+        return record, None
+    except Exception as error:
+        record.update(reason = 'other', error = repr(error))
+        return record, None
+
+def solve_continuation(name, fixed_values, key, target, start, guess, 
+                       specific_shock, variable, impact, max_halvings = 4, 
+                       **options):
+    """Solve the model at `fixed_values` with `key` set to `target` by 
+    continuation from a solved point at `key = start` with warm start `guess`. 
+    If a step fails, it is halved (at most `max_halvings` times in a row) and 
+    the continuation proceeds from the intermediate point. `options` are 
+    passed on to `solve_point` (metrics, horizon, reuse_jacobian)."""
+    value, step, halvings, steps = start, target - start, 0, 0
+    
+    while True:
+        trial = target if abs(target - value - step) < 1e-12 else value + step
+        record, new_guess = solve_point(name, {**fixed_values, key: trial}, 
+                                        specific_shock, variable, impact, 
+                                        guess, **options)
+        steps += 1
+        if new_guess is not None and trial == target:
+            break
+        if new_guess is not None: # Intermediate point solved: aim for target
+            value, guess, step, halvings = trial, new_guess, target - trial, 0
+        elif halvings < max_halvings: # Step failed: halve it
+            step, halvings = step/2, halvings + 1
+        else:
+            break
+    
+    if trial != target: # The continuation got stuck before the target
+        record.update(impact = np.nan, error = record['error'] or 
+                      'continuation stopped at %s = %s' % (key, trial), 
+                      fixed_values = {**record['fixed_values'], key: target})
+    record[key] = target
+    record['steps'] = steps
+    return record, new_guess
+
+def solve_ray(ee, lambda_sequence, specific_shock, variable, impact, 
+              continuation = True, max_halvings = 4, **options):
+    """Solve RANK and TANK along the lambda grid for a given eta (see 
+    `solve_lambda_ray`)."""
+    return solve_lambda_ray({'eta': ee}, lambda_sequence, specific_shock, 
+                            variable, impact, continuation, max_halvings, 
+                            **options)
+
+def solve_lambda_ray(fixed_values, lambda_sequence, specific_shock, variable, 
+                     impact, continuation = True, max_halvings = 4, 
+                     keep_paths = False, **options):
+    """Solve RANK at `fixed_values` (without those which are no parameters 
+    or fixed values of RANK) and TANK at `fixed_values` along the lambda 
+    grid. With `continuation`, each TANK point is warm-started from the 
+    previous solved point along the grid (with step-halving), otherwise from 
+    the cold initial guesses of the YAML file. With `keep_paths`, the 
+    records of the solved points also hold their path as 'x'. `options` are 
+    passed on to `solve_point`."""
+    rank = worker_handle('rank')
+    rank_values = {kk: vv for kk, vv in fixed_values.items()
+                   if kk in rank.dictionary['parameters'] or 
+                   kk in rank.default_fixed_values}
+    record, guess = solve_point('rank', rank_values, specific_shock, variable, 
+                                impact, **options)
+    if keep_paths and guess is not None:
+        record['x'] = guess['x']
+    records = [record]
+    
+    guess, ll_solved = None, None
+    for ll in lambda_sequence:
+        if continuation and guess is not None:
+            record, new_guess = solve_continuation('tank', fixed_values, 'lam', 
+                                                   ll, ll_solved, guess, 
+                                                   specific_shock, variable, 
+                                                   impact, max_halvings, 
+                                                   **options)
+            if new_guess is None: # Fall back to the cold initial guesses
+                cold_record, new_guess = solve_point('tank', 
+                                                     {**fixed_values, 
+                                                      'lam': ll}, 
+                                                     specific_shock, variable, 
+                                                     impact, **options)
+                if new_guess is not None:
+                    record = cold_record
+        else:
+            record, new_guess = solve_point('tank', 
+                                            {**fixed_values, 'lam': ll}, 
+                                            specific_shock, variable, impact, 
+                                            **options)
+        if keep_paths and new_guess is not None:
+            record['x'] = new_guess['x']
+        records.append(record)
+        if new_guess is not None:
+            guess, ll_solved = new_guess, ll
+    
+    return records
+
+def _solve_task(task):
+    """Unpack a task tuple (used as the function mapped by the pool); the 
+    optional sixth entry is the dictionary of options of `solve_point`."""
+    return solve_point(*task[:5], **(task[5] if len(task) > 5 else {}))[0]
+
+def _solve_ray_task(task):
+    """Unpack a task tuple for a whole eta ray (the last entry is the 
+    dictionary of options of `solve_point`)."""
+    return solve_ray(*task[:-1], **task[-1])
+
+def _horizon_task(task):
+    """Horizon chosen by `ModelHandle.select_horizon` for the model `name` at 
+    the given fixed values (None if the point cannot be solved)."""
+    name, fixed_values, specific_shock, kwargs = task
+    try:
+        return worker_handle(name).select_horizon(specific_shock, fixed_values, 
+                                                  **kwargs)
+    except Exception:
+        return None
+
+###############################################################################
+###############################################################################
+
+# Execution of tasks
+
+class SweepExecutor:
+    """Pool of `workers` processes (defaults to the number of cores; 
+    `workers = 1` solves everything in the calling process), each of which 
+    holds its own handles of the RANK and TANK models. The pool is kept alive 
+    between calls of `map`, such that the workers only compile the models 
+    once, also across several rounds of tasks."""
+    
+    def __init__(self, rank_model, tank_model, workers = None, 
+                 cache_directory = None):
+        self.workers = os.cpu_count() if workers is None else workers
+        initargs = (rank_model, tank_model, cache_directory)
+        
+        if self.workers == 1:
+            _init_worker(*initargs)
+            self.pool = None
+        else:
+            # Use fresh ('spawn') processes, as JAX does not support forking
+            self.pool = ProcessPoolExecutor(max_workers = self.workers, 
+                                            mp_context = mp.get_context('spawn'),
+                                            initializer = _init_worker, 
+                                            initargs = initargs)
+    
+    def map(self, function, tasks):
+        """Results of `function` for all tasks, in the order of the tasks 
+        (independent of which worker finishes first)."""
+        if self.pool is None:
+            return [function(task) for task in tasks]
+        return list(self.pool.map(function, tasks))
+    
+    def imap(self, function, tasks):
+        """Yield (index of the task, result) pairs as soon as the tasks are 
+        finished."""
+        if self.pool is None:
+            for index, task in enumerate(tasks):
+                yield index, function(task)
+            return
+        futures = {self.pool.submit(function, task): index 
+                   for index, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    
+    def istream(self, function, tasks, max_pending = None):
+        """Yield (index of the task, result) pairs as soon as the tasks are 
+        finished, like `imap`, but take the tasks from the iterable `tasks` 
+        only as workers become free: at most `max_pending` tasks (defaults to 
+        twice the number of workers) are submitted at any time, such that 
+        the memory does not grow with the number of tasks (e.g. for a 
+        generator of the points of a very large grid)."""
+        tasks = enumerate(tasks)
+        if self.pool is None:
+            for index, task in tasks:
+                yield index, function(task)
+            return
+        max_pending = max_pending or 2*self.workers
+        futures = {}
+        for index, task in itertools.islice(tasks, max_pending):
+            futures[self.pool.submit(function, task)] = index
+        while futures:
+            finished, _ = wait(futures, return_when = FIRST_COMPLETED)
+            for future in finished:
+                index = futures.pop(future)
+                for new_index, task in itertools.islice(tasks, 1):
+                    futures[self.pool.submit(function, task)] = new_index
+                yield index, future.result()
+    
+    def solve_points(self, points, specific_shock, variable = 'c', impact = 1, 
+                     solved_etas = ()):
+        """Solve RANK for every eta (except those in `solved_etas`, e.g. 
+        solved by an earlier call) and TANK for every (eta, lambda) pair in 
+        `points`. Returns the dictionary of RANK records keyed by eta and the 
+        list of TANK records."""
+        etas = sorted(set(ee for ee, _ in points) - set(solved_etas))
+        tasks = [('rank', {'eta': ee}, specific_shock, variable, impact) 
+                 for ee in etas]
+        tasks += [('tank', {'eta': ee, 'lam': ll}, specific_shock, variable, 
+                   impact) for ee, ll in points]
+        records = self.map(_solve_task, tasks)
+        return dict(zip(etas, records[:len(etas)])), records[len(etas):]
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+def sweep_executor(rank_model, tank_model, workers = None, 
+                   cache_directory = None, executor = None):
+    """Context manager of the executor of one sweep: the given `executor` 
+    (which stays open, such that several sweeps share its workers and hence 
+    their loaded models) or a new `SweepExecutor` (closed after the sweep)."""
+    if executor is not None:
+        return contextlib.nullcontext(executor)
+    return SweepExecutor(rank_model, tank_model, workers, cache_directory)
+
+###############################################################################
+###############################################################################
+
+# The sweep
+
+def run_sweep(rank_model, tank_model, eta_sequence, lambda_sequence, 
+              specific_shock, variable = 'c', impact = 1, percent = 100, 
+              workers = None, continuation = False, max_halvings = 4, 
+              cache_directory = None, frontier = None, checkpoint = None, 
+              executor = None, metrics = None, horizon = None, 
+              horizon_options = None, reuse_jacobian = False):
+    """Solve RANK for every eta and TANK for every (eta, lambda) pair in a 
+    process pool with `workers` processes (see `SweepExecutor`).
+    
+    With `continuation`, each eta ray is solved by one worker, which walks 
+    along the (sorted) lambda grid and warm-starts every TANK point from the 
+    previous one (see `solve_ray`); otherwise every grid point is a separate 
+    task solved from the cold initial guesses. If `cache_directory` is given, 
+    the workers share the solution cache in that directory (see cache.py). 
+    If a `FeasibilityFrontier` is given (see feasibility.py), the TANK points 
+    beyond it are not solved but recorded with reason 'pruned'. If a 
+    `CheckpointStore` is given (see checkpoint.py), every solved point is 
+    appended to it as soon as it is finished and points already in the store 
+    (with the same models, horizon and fixed values) are not solved again 
+    (such that an interrupted sweep resumes and an extended grid only solves 
+    the new points); failed points are solved again. An open `SweepExecutor` may be 
+    given as `executor` to re-use its workers (then `workers` and 
+    `cache_directory` are those of the executor). If a `MetricSpec` is given 
+    as `metrics` (see metrics.py), every record also holds all of its metrics 
+    of the path, such that one sweep serves several questions. 
+    
+    `horizon` is the path length of all solves (None: the default of 
+    econpizza). With horizon = 'auto', the shortest sufficient horizon is 
+    chosen at the corners of the grid first (see 
+    `ModelHandle.select_horizon`, whose keyword arguments can be given as 
+    `horizon_options`; by default, the paths have to be accurate up to 
+    period `impact`, or for 50 periods with metrics) and the longest of them 
+    is used for all points.
+    
+    The Jacobian of the stacked system of `find_path` depends on eta and 
+    lambda only through the steady state, such that with `reuse_jacobian` 
+    every worker first tries the Jacobian of the point it solved before 
+    (along the lambda ray with `continuation`, the neighbouring point) and 
+    only computes a fresh one if the solve fails with it.
+    
+    Returns the data frame of the TANK impact response relative to RANK 
+    (index: lambda, columns: eta) and the list of all point records."""
+    
+    # Prune the points known to be infeasible
+    lambdas = {ee: [ll for ll in np.sort(lambda_sequence) if frontier is None 
+                    or not frontier.is_outside(ee, ll)] for ee in eta_sequence}
+    pruned = [dict(eta = ee, lam = ll, model = 'tank', impact = np.nan, 
+                   flag = None, reason = 'pruned', 
+                   error = 'outside the feasibility frontier') 
+              for ee in eta_sequence for ll in lambda_sequence 
+              if ll not in lambdas[ee]]
+    
+    with sweep_executor(rank_model, tank_model, workers, cache_directory, 
+                        executor) as executor:
+        if horizon == 'auto': # The metrics use the paths beyond the impact
+            horizon_options = {'periods': impact + 1 if metrics is None 
+                               else 50, **(horizon_options or {})}
+            horizon = select_sweep_horizon(executor, specific_shock, 
+                                           eta_sequence, lambda_sequence, 
+                                           **horizon_options)
+        
+        # Points already solved by an earlier (interrupted) run, keyed as 
+        # their records (the models are only parsed here, not loaded)
+        stored, handles = {}, {}
+        if checkpoint is not None:
+            stored = checkpoint.completed()
+            handles = {'rank': ModelHandle(rank_model, presolve = False), 
+                       'tank': ModelHandle(tank_model, presolve = False)}
+        def lookup(model, ee, ll = None):
+            if not stored:
+                return None
+            fixed_values = {'eta': ee} if ll is None else {'eta': ee, 'lam': ll}
+            return stored.get(point_key({ 
+                'model': model, 'model_hash': handles[model].model_hash, 
+                'fixed_values': 
+                    handles[model].canonical_fixed_values(fixed_values), 
+                'horizon': horizon, 'shock': specific_shock[0], 
+                'size': specific_shock[1], 'variable': variable, 
+                'period': impact, 'metric_spec': None if metrics is None 
+                else metrics.label()}))
+        done = [lookup('rank', ee) for ee in eta_sequence if lookup('rank', ee)]
+        done += [lookup('tank', ee, ll) for ee in eta_sequence 
+                 for ll in lambdas[ee] if lookup('tank', ee, ll)]
+        
+        options = {'metrics': metrics, 'horizon': horizon, 
+                   'reuse_jacobian': reuse_jacobian}
+        
+        if continuation:
+            # One task per eta ray (with the lambdas still to be solved)
+            function = _solve_ray_task
+            tasks = [(ee, [ll for ll in lambdas[ee] 
+                           if not lookup('tank', ee, ll)], 
+                      specific_shock, variable, impact, True, max_halvings, 
+                      options) for ee in eta_sequence]
+            tasks = [tt for tt in tasks if tt[1] or not lookup('rank', tt[0])]
+        else:
+            # One task per RANK model (for each eta) and per TANK model (for 
+            # each (eta, lambda) pair)
+            function = _solve_task
+            tasks = [('rank', {'eta': ee}, specific_shock, variable, impact, 
+                      options) for ee in eta_sequence 
+                     if not lookup('rank', ee)]
+            tasks += [('tank', {'eta': ee, 'lam': ll}, specific_shock, 
+                       variable, impact, options) for ee in eta_sequence 
+                      for ll in lambdas[ee] if not lookup('tank', ee, ll)]
+        
+        results = [None]*len(tasks)
+        for index, result in executor.imap(function, tasks):
+            results[index] = result
+            if checkpoint is not None: # Persist as soon as it is finished
+                checkpoint.append(result if continuation else [result])
+    
+    # Flatten the lists of records of the eta rays; the order of the tasks 
+    # fixes the order of the records, independent of which worker finishes 
+    # first
+    records = [rr for result in results for rr in result] if continuation \
+        else results
+    
+    # Only keep one RANK record per eta (solved again in continuation mode)
+    solved_rank = [rr['eta'] for rr in records if rr['model'] == 'rank']
+    records = [rr for rr in done if rr['model'] == 'tank' or 
+               rr['eta'] not in solved_rank] + records + pruned
+    
+    return impact_frame(records, eta_sequence, lambda_sequence, percent), records
+
+def select_sweep_horizon(executor, specific_shock, eta_sequence, 
+                         lambda_sequence, **kwargs):
+    """Horizon for a sweep: the longest of the horizons chosen by 
+    `ModelHandle.select_horizon` (with keyword arguments `kwargs`) for RANK 
+    at the smallest and largest eta and for TANK at the four corners of the 
+    grid, computed in the workers of `executor` (None if no corner can be 
+    solved, i.e. the default of econpizza)."""
+    etas = sorted(set([min(eta_sequence), max(eta_sequence)]))
+    lams = sorted(set([min(lambda_sequence), max(lambda_sequence)]))
+    tasks = [('rank', {'eta': ee}, specific_shock, kwargs) for ee in etas]
+    tasks += [('tank', {'eta': ee, 'lam': ll}, specific_shock, kwargs) 
+              for ee in etas for ll in lams]
+    horizons = [hh for hh in executor.map(_horizon_task, tasks) 
+                if hh is not None]
+    return max(horizons) if horizons else None
+
+def impact_frame(records, eta_sequence, lambda_sequence, percent = 100, 
+                 column = 'impact'):
+    """Gather the point records into the data frame of TANK impact responses 
+    relative to the RANK model with the same eta (or of another `column` of 
+    the records, such as the metric 'y_peak', see metrics.py)."""
+    impact_eta_lambda = pd.DataFrame(np.nan, # Fill the data frame with NAs
+                                     index = lambda_sequence, 
+                                     columns = eta_sequence)
+    
+    impact_rank = {rr['eta']: rr[column] for rr in records 
+                   if rr['model'] == 'rank' and rr['error'] is None}
+    
+    for rr in records:
+        if rr['model'] == 'tank' and rr['error'] is None:
+            impact_eta_lambda.loc[rr['lam'], rr['eta']] = \
+                percent * (rr[column] - impact_rank.get(rr['eta'], np.nan))
+    
+    return impact_eta_lambda
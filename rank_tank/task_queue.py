@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the work queue of the sweep for runs on several 
+# machines: the grid points are published as tasks to a SQLite file (no 
+# outside service needed), any number of worker processes on any host with 
+# access to the file claim and solve them with their own loaded copies of 
+# rank.yaml and tank.yaml (see run_queue_worker.py), failed tasks are retried 
+# up to a bounded number of attempts and a reducer assembles the impact data 
+# frame from the completed tasks
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import json
+import time
+import socket
+import sqlite3
+import contextlib
+from dataclasses import asdict
+import multiprocessing as mp
+import numpy as np
+from rank_tank.sweep import (_init_worker, _solve_task, impact_frame, 
+                             worker_handle)
+from rank_tank.model_handle import ModelHandle
+from rank_tank.checkpoint import point_key, _to_json
+from rank_tank.metrics import MetricSpec
+
+###############################################################################
+###############################################################################
+
+# The queue
+
+class TaskQueue:
+    """Queue of tasks in the SQLite file `path`. Every task is a JSON payload 
+    under a unique key; its status is 'pending', 'running' (claimed by a 
+    worker until its lease expires), 'done' or 'failed' (after 
+    `max_attempts` attempts)."""
+    
+    def __init__(self, path, max_attempts = 3, timeout = 60.):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.timeout = timeout # Seconds to wait for a lock of the file
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        with self._transaction() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS tasks ('
+                               'key TEXT PRIMARY KEY, payload TEXT NOT NULL, '
+                               'status TEXT NOT NULL, attempts INTEGER '
+                               'NOT NULL DEFAULT 0, worker TEXT, lease REAL, '
+                               'record TEXT, error TEXT)')
+    
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Connection holding the write lock of the file (such that claims of 
+        several workers do not interfere), committed at the end."""
+        connection = sqlite3.connect(self.path, timeout = self.timeout, 
+                                     isolation_level = None)
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        finally:
+            connection.close()
+    
+    def publish(self, tasks):
+        """Add the (key, payload) pairs of `tasks`; keys already in the queue 
+        (pending, running or finished) are left as they are. Returns the 
+        number of tasks added."""
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany('INSERT OR IGNORE INTO tasks (key, payload, '
+                                   "status) VALUES (?, ?, 'pending')", 
+                                   [(key, json.dumps(payload, 
+                                                     default = _to_json))
+                                    for key, payload in tasks])
+            return connection.total_changes - before
+    
+    def claim(self, worker, lease = 3600., hashes = None):
+        """Claim the next pending task (or a running one whose lease expired, 
+        e.g. as its worker was killed) for `lease` seconds; only tasks of 
+        the model hashes `hashes`, if given. Returns the key and the payload, 
+        or None if there is no task to claim."""
+        now = time.time()
+        hashes = None if hashes is None else list(hashes)
+        with self._transaction() as connection:
+            # Expired tasks without attempts left have failed
+            connection.execute("UPDATE tasks SET status = 'failed', error = "
+                               "coalesce(error, 'lease expired') WHERE status "
+                               "= 'running' AND lease < ? AND attempts >= ?", 
+                               (now, self.max_attempts))
+            row = connection.execute("SELECT key, payload FROM tasks WHERE "
+                                     "(status = 'pending' OR (status = "
+                                     "'running' AND lease < ?))" + 
+                                     ('' if hashes is None else 
+                                      " AND json_extract(payload, "
+                                      "'$.model_hash') IN (%s)" % 
+                                      ', '.join('?'*len(hashes))) + 
+                                     " ORDER BY rowid LIMIT 1", 
+                                     [now] + (hashes or [])).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE tasks SET status = 'running', worker = "
+                               "?, lease = ?, attempts = attempts + 1 WHERE "
+                               "key = ?", (worker, now + lease, row[0]))
+        return row[0], json.loads(row[1])
+    
+    def complete(self, key, record):
+        """Store the record of the solved task `key`."""
+        with self._transaction() as connection:
+            connection.execute("UPDATE tasks SET status = 'done', record = ?, "
+                               "error = NULL WHERE key = ?", 
+                               (json.dumps(record, default = _to_json), key))
+    
+    def fail(self, key, error, record = None):
+        """Record a failed attempt of the task `key`: it is pending again if 
+        it has attempts left and failed otherwise (keeping the last record, 
+        if any)."""
+        with self._transaction() as connection:
+            connection.execute("UPDATE tasks SET status = CASE WHEN attempts "
+                               "< ? THEN 'pending' ELSE 'failed' END, error = "
+                               "?, record = ? WHERE key = ?", 
+                               (self.max_attempts, error, 
+                                None if record is None else 
+                                json.dumps(record, default = _to_json), key))
+    
+    def counts(self, keys = None):
+        """Number of tasks per status (of the tasks `keys`, or of all)."""
+        counts = dict.fromkeys(('pending', 'running', 'done', 'failed'), 0)
+        for _, status, _, _, _ in self._rows(keys):
+            counts[status] += 1
+        return counts
+    
+    def finished(self, keys = None, hashes = None):
+        """Whether all tasks (of `keys`, or all of the queue; only those of 
+        the model hashes `hashes`, if given) are done or failed."""
+        if hashes is None:
+            counts = self.counts(keys)
+            return counts['pending'] + counts['running'] == 0
+        return not any(status in ('pending', 'running') and 
+                       json.loads(payload).get('model_hash') in hashes
+                       for _, status, payload, _, _ in self._rows(keys))
+    
+    def unfinished(self, keys = None):
+        """Keys of the tasks (of `keys`, or of all) which are pending or 
+        running."""
+        return [key for key, status, _, _, _ in self._rows(keys) 
+                if status in ('pending', 'running')]
+    
+    def records(self, keys = None):
+        """Records of the finished tasks (of `keys`, or of all). Tasks which 
+        failed without a record get one with the reason 'queue' and the last 
+        error."""
+        records = []
+        for _, status, payload, record, error in self._rows(keys):
+            if status not in ('done', 'failed'):
+                continue
+            if record is not None:
+                records.append(json.loads(record))
+                continue
+            payload = json.loads(payload)
+            records.append(dict(payload['fixed_values'], 
+                                model = payload['model'], 
+                                shock = payload['shock'][0], 
+                                size = payload['shock'][1], 
+                                variable = payload['variable'], 
+                                period = payload['impact'], impact = np.nan, 
+                                flag = None, reason = 'queue', error = error))
+        return records
+    
+    def _rows(self, keys = None):
+        connection = sqlite3.connect(self.path, timeout = self.timeout)
+        try:
+            rows = connection.execute('SELECT key, status, payload, record, '
+                                      'error FROM tasks').fetchall()
+        finally:
+            connection.close()
+        if keys is None:
+            return rows
+        keys = set(keys)
+        return [row for row in rows if row[0] in keys]
+
+###############################################################################
+###############################################################################
+
+# Tasks of the sweep
+
+def task_key(payload, handle):
+    """Key of the task of a grid point, the same as that of its record (see 
+    `point_key`): the model hash and the fixed values which differ from the 
+    YAML file are those of `handle` (the handle of the model of the task, 
+    which only needs to be parsed), such that tasks of a changed model or of 
+    another horizon are not taken for finished ones."""
+    metrics = payload['options'].get('metrics')
+    return json.dumps(point_key(dict( 
+        payload['fixed_values'], model = payload['model'], 
+        model_hash = handle.model_hash, 
+        fixed_values = handle.canonical_fixed_values(payload['fixed_values']), 
+        horizon = payload['options'].get('horizon'), 
+        shock = payload['shock'][0], size = payload['shock'][1], 
+        variable = payload['variable'], period = payload['impact'], 
+        metric_spec = None if metrics is None else 
+        MetricSpec(**metrics).label())))
+
+def sweep_tasks(rank_model, tank_model, eta_sequence, lambda_sequence, 
+                specific_shock, variable = 'c', impact = 1, metrics = None, 
+                horizon = None, reuse_jacobian = False):
+    """Tasks (key and payload) of RANK for every eta and of TANK for every 
+    (eta, lambda) pair of the grid. The models are only parsed (to key the 
+    tasks by their hash), not loaded."""
+    handles = {'rank': ModelHandle(rank_model, presolve = False), 
+               'tank': ModelHandle(tank_model, presolve = False)}
+    options = {'metrics': None if metrics is None else asdict(metrics), 
+               'horizon': horizon, 'reuse_jacobian': reuse_jacobian}
+    points = [('rank', {'eta': float(ee)}) for ee in eta_sequence]
+    points += [('tank', {'eta': float(ee), 'lam': float(ll)})
+               for ee in eta_sequence for ll in lambda_sequence]
+    payloads = [{'model': name, 'model_hash': handles[name].model_hash, 
+                 'fixed_values': fixed_values, 
+                 'shock': [specific_shock[0], float(specific_shock[1])], 
+                 'variable': variable, 'impact': impact, 'options': options}
+                for name, fixed_values in points]
+    return [(task_key(payload, handles[payload['model']]), payload) 
+            for payload in payloads]
+
+def solve_task(payload):
+    """Record of the grid point of a task payload (see `solve_point`)."""
+    options = dict(payload['options'])
+    if options.get('metrics') is not None:
+        options['metrics'] = MetricSpec(**{kk: tuple(vv)
+                                           if isinstance(vv, list) else vv
+                                           for kk, vv in 
+                                           options['metrics'].items()})
+    return _solve_task((payload['model'], payload['fixed_values'], 
+                        tuple(payload['shock']), payload['variable'], 
+                        payload['impact'], options))
+
+def run_queue_worker(path, rank_model, tank_model, cache_directory = None, 
+                     worker = None, max_attempts = 3, lease = 3600., 
+                     poll = 5., wait = False, max_tasks = None):
+    """Claim and solve the tasks of the queue in `path` until it is finished 
+    (with `wait`, keep polling every `poll` seconds for new tasks instead) or 
+    `max_tasks` tasks are solved. The models are loaded once, when first 
+    needed, and re-parameterized for every task. Points at which the steady 
+    state or the path cannot be found are results (recorded as by 
+    `solve_point`); only unexpected errors are retried. A worker only claims 
+    the tasks of its own models (by their hash): tasks of another version of 
+    a model (e.g. left from a run before the YAML file was changed, or 
+    published after this worker was started) are left to workers with that 
+    version and do not keep it from solving the others. Returns the number 
+    of tasks solved (without the failed attempts)."""
+    queue = TaskQueue(path, max_attempts)
+    worker = worker or '%s:%d' % (socket.gethostname(), os.getpid())
+    _init_worker(rank_model, tank_model, cache_directory)
+    # The models are only parsed for their hashes
+    hashes = [worker_handle(name).model_hash for name in ('rank', 'tank')]
+    
+    solved = 0
+    while max_tasks is None or solved < max_tasks:
+        task = queue.claim(worker, lease, hashes)
+        if task is None:
+            if queue.finished(hashes = hashes) and not wait:
+                break
+            time.sleep(poll) # Tasks of other workers may still be retried
+            continue
+        
+        key, payload = task
+        try:
+            record = solve_task(payload)
+        except Exception as error:
+            queue.fail(key, repr(error))
+            continue
+        if record['reason'] == 'other':
+            queue.fail(key, record['error'], record)
+        else:
+            queue.complete(key, record)
+            solved += 1
+    return solved
+
+###############################################################################
+###############################################################################
+
+# The sweep through the queue
+
+def reduce_sweep(queue, rank_model, tank_model, eta_sequence, 
+                 lambda_sequence, specific_shock, variable = 'c', impact = 1, 
+                 percent = 100, metrics = None, horizon = None):
+    """Assemble the data frame of the TANK impact response relative to RANK 
+    (index: lambda, columns: eta) from the finished tasks of the grid in 
+    `queue` (points not finished yet are NaN). Returns the data frame and 
+    the list of the records."""
+    keys = [key for key, _ in sweep_tasks(rank_model, tank_model, 
+                                          eta_sequence, lambda_sequence, 
+                                          specific_shock, variable, impact, 
+                                          metrics, horizon)]
+    records = queue.records(keys)
+    return impact_frame(records, eta_sequence, lambda_sequence, percent), \
+        records
+
+def run_queue_sweep(rank_model, tank_model, path, eta_sequence, 
+                    lambda_sequence, specific_shock, variable = 'c', 
+                    impact = 1, percent = 100, workers = None, 
+                    cache_directory = None, metrics = None, horizon = None, 
+                    reuse_jacobian = False, max_attempts = 3, lease = 3600., 
+                    poll = 5., join_timeout = 60., timeout = None):
+    """Sweep over eta and lambda through the queue in `path`: the grid points 
+    are published as tasks (points already in the queue, e.g. solved by an 
+    earlier run, are not published again), `workers` local worker processes 
+    (defaults to the number of cores; 0: only workers started elsewhere, see 
+    run_queue_worker.py) solve them, and once all tasks of the grid are 
+    finished, the impact data frame is assembled from them (see 
+    `reduce_sweep`). A `RuntimeError` naming the unfinished tasks is raised 
+    if all local workers have stopped (e.g. crashed) before the grid is 
+    finished, or if it is not finished after `timeout` seconds (if given; 
+    with `workers = 0`, the only guard against waiting for workers which 
+    never connect). Local workers which have not stopped `join_timeout` 
+    seconds after the grid is finished (or the sweep is interrupted) are 
+    terminated; the tasks they had claimed are retried once their lease 
+    expires."""
+    queue = TaskQueue(path, max_attempts)
+    tasks = sweep_tasks(rank_model, tank_model, eta_sequence, lambda_sequence, 
+                        specific_shock, variable, impact, metrics, horizon, 
+                        reuse_jacobian)
+    queue.publish(tasks)
+    keys = [key for key, _ in tasks]
+    
+    # Use fresh ('spawn') processes, as JAX does not support forking
+    context = mp.get_context('spawn')
+    processes = [context.Process(target = run_queue_worker, 
+                                 args = (path, rank_model, tank_model, 
+                                         cache_directory), 
+                                 kwargs = {'max_attempts': max_attempts, 
+                                           'lease': lease, 'poll': poll})
+                 for _ in range(os.cpu_count() if workers is None
+                                else workers)]
+    for process in processes:
+        process.start()
+    start = time.time()
+    try:
+        while not queue.finished(keys):
+            if processes and not any(pp.is_alive() for pp in processes):
+                if queue.finished(keys): # Finished as the workers stopped
+                    break
+                raise RuntimeError('all local workers stopped (exit codes %s) '
+                                   'before the tasks %s were finished' % 
+                                   ([pp.exitcode for pp in processes], 
+                                    queue.unfinished(keys)))
+            if timeout is not None and time.time() - start > timeout:
+                raise RuntimeError('the tasks %s were not finished within %g '
+                                   'seconds' % (queue.unfinished(keys), 
+                                                timeout))
+            time.sleep(poll)
+    finally:
+        deadline = time.time() + join_timeout
+        for process in processes:
+            process.join(max(deadline - time.time(), 0.))
+            if process.is_alive(): # E.g. solving a task of another grid
+                process.terminate()
+                process.join()
+    
+    return reduce_sweep(queue, rank_model, tank_model, eta_sequence, 
+                        lambda_sequence, specific_shock, variable, impact, 
+                        percent, metrics, horizon)
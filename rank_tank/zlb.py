@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the ZLB stress test: for each model and shock, the 
+# paths after a sequence of shock sizes are solved around one steady state 
+# (each path warm-started from the path of the previous size), the duration of 
+# the ZLB spell R = max(1, Rn) = 1 is recorded per size and the size at which 
+# the ZLB starts binding is bracketed by bisection
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pandas as pd
+from rank_tank.sweep import worker_handle, sweep_executor
+from rank_tank.instrumentation import get_recorder
+
+###############################################################################
+###############################################################################
+
+def zlb_spell(variables, x, rate = 'R', bound = 1., tol = 1e-8):
+    """ZLB statistics of the path `x`: the number of periods in which the 
+    nominal interest rate `rate` is at its lower `bound`, the first of 
+    them (None if it never binds) and the lowest notional rate Rn (if the 
+    model has it)."""
+    at_bound = x[:, variables.index(rate)] <= bound + tol
+    periods = np.flatnonzero(at_bound)
+    return {'binding': bool(at_bound.any()), 'duration': int(at_bound.sum()), 
+            'first': int(periods[0]) if len(periods) else None, 
+            'min_R': float(x[:, variables.index(rate)].min()), 
+            'min_Rn': float(x[:, variables.index('Rn')].min())
+            if 'Rn' in variables else np.nan}
+
+class ShockPaths:
+    """Paths of the model of `handle` after shocks of different sizes around 
+    one steady state (solved once for the `fixed_values`); every path is 
+    warm-started from the solved path of the closest size."""
+    
+    def __init__(self, handle, shock_name, fixed_values = None, 
+                 horizon = None):
+        self.handle = handle
+        self.shock_name = shock_name
+        self.horizon = horizon
+        self.solved = {} # Converged paths by size
+        handle.solve_stst(fixed_values)
+    
+    def solve(self, size):
+        """ZLB statistics (see `zlb_spell`) and flag of the path after the 
+        shock of `size`."""
+        guess = None
+        if self.solved:
+            closest = min(self.solved, key = lambda ss: abs(ss - size))
+            guess = self.solved[closest]
+        kwargs = {} if self.horizon is None else {'horizon': self.horizon}
+        with get_recorder().stage('find_path'):
+            x, flag = self.handle.find_path((self.shock_name, size), 
+                                            guess = guess, **kwargs)
+        if not flag:
+            self.solved[size] = x
+        return dict(zlb_spell(self.handle['variables'], np.asarray(x)), 
+                    flag = flag)
+
+def bracket_zlb(paths, low, high, tol = 1e-4, max_size = 1.):
+    """Bracket the shock size at which the ZLB starts binding by bisection 
+    between `low` (not binding) and `high` (binding; doubled up to `max_size` 
+    if it does not bind yet) to a width of `tol`. Returns the largest size 
+    found not to bind and the smallest size found to bind (NaN if there is 
+    none)."""
+    def binds(size):
+        result = paths.solve(size)
+        if result['flag']:
+            raise RuntimeError('no path for size %s (flag %s)'
+                               % (size, result['flag']))
+        return result['binding']
+    
+    if binds(low):
+        return np.nan, low
+    while not binds(high):
+        low, high = high, 2*high
+        if high > max_size:
+            return low, np.nan
+    while high - low > tol:
+        middle = (low + high)/2
+        if binds(middle):
+            high = middle
+        else:
+            low = middle
+    return low, high
+
+def _zlb_task(task):
+    """ZLB records of all sizes and the bracket of the binding size for one 
+    model and shock (used as the function mapped by the pool)."""
+    name, shock_name, sizes, fixed_values, horizon, bracket, tol = task
+    base = {'model': name, 'shock': shock_name}
+    try:
+        handle = worker_handle(name)
+        # Only the fixed values the model has (e.g. no lam for RANK)
+        fixed_values = {kk: vv for kk, vv in (fixed_values or {}).items()
+                        if kk in handle.dictionary['parameters'] or 
+                        kk in handle.default_fixed_values}
+        paths = ShockPaths(handle, shock_name, fixed_values, horizon)
+    except Exception as error:
+        return [dict(base, size = ss, error = repr(error)) for ss in sizes], \
+            dict(base, size_not_binding = np.nan, size_binding = np.nan, 
+                 error = repr(error))
+    
+    records = []
+    for size in sorted(sizes, key = abs): # Outwards from the steady state
+        try:
+            records.append(dict(base, size = size, error = None, 
+                                **paths.solve(size)))
+        except Exception as error:
+            records.append(dict(base, size = size, error = repr(error)))
+    
+    result = dict(base, size_not_binding = np.nan, size_binding = np.nan, 
+                  error = None)
+    if bracket:
+        # Start from the sizes of the sequence next to the switch
+        solved = [rr for rr in records if rr['error'] is None and 
+                  not rr['flag']]
+        not_binding = [rr['size'] for rr in solved if not rr['binding']]
+        binding = [rr['size'] for rr in solved if rr['binding']]
+        low = max(not_binding) if not_binding else 0.
+        higher = [ss for ss in binding if ss > low]
+        high = min(higher) if higher else max(2*low, max(sizes))
+        try:
+            result['size_not_binding'], result['size_binding'] = \
+                bracket_zlb(paths, low, high, tol)
+        except Exception as error:
+            result['error'] = repr(error)
+    return records, result
+
+def run_zlb_stress(rank_model, tank_model, shock_names, sizes, 
+                   fixed_values = None, horizon = None, bracket = True, 
+                   tol = 1e-4, workers = None, cache_directory = None, 
+                   executor = None):
+    """ZLB stress test of RANK and TANK for each shock of `shock_names` and 
+    each (positive) size of `sizes`, one task per model and shock.
+    
+    Returns the data frame of the ZLB statistics per model, shock and size 
+    (whether the ZLB binds, the duration of the spell, its first period and 
+    the lowest actual and notional rates) and the data frame of the brackets 
+    of the size at which the ZLB starts binding."""
+    tasks = [(name, shock_name, list(sizes), fixed_values, horizon, bracket, 
+              tol) for name in ('rank', 'tank') for shock_name in shock_names]
+    with sweep_executor(rank_model, tank_model, workers, cache_directory, 
+                        executor) as executor:
+        results = executor.map(_zlb_task, tasks)
+    
+    records = pd.DataFrame([rr for result, _ in results for rr in result])
+    brackets = pd.DataFrame([bb for _, bb in results])
+    return records, brackets
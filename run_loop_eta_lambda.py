@@ -7,76 +7,115 @@
 ###############################################################################
 ###############################################################################
 # This script loops over the parameter values of eta and lambda in the RANK and 
-# TANK models (lambda only in TANK)
+# TANK models (lambda only in TANK); the same scenario can also be run from a 
+# YAML file with run_scenarios.py
 ###############################################################################
 ###############################################################################
 
 # Import packages
 import os
 import time as tm
-import econpizza as ep
 import numpy as np
-import pandas as pd
-import copy
-import plotly.express as px
-import plotly.io as pio
+from rank_tank.scenarios import make_scenario, run_sweep_scenario
+from rank_tank.plotting import render_figures
+from rank_tank.instrumentation import enable, hotspot_summary
+from rank_tank.registry import default_registry
 
 ###############################################################################
 ###############################################################################
 
 # Preliminaries 
 
-pio.renderers.default = "svg" # For plotting in the Spyder window
+show_plots = True # If true, the plot is displayed (False: headless run)
 save_plot_yes = False # If true, it saves the plots after creating them
+save_results = False # If true, the impact surface is saved to results/store 
+                     # (see rank_tank/store.py) and the point records to 
+                     # results/run_loop_eta_lambda_records.csv
 start = tm.time() # Start timer
 
 percent = 100 # Turn to 100 (1) if impact effect should (not) be in percent
 varlist_consumption = 'c' # Specify variable to be checked (here: aggregate 
                           # consumption)
 impact = 1 # Time period of impact (if desired, another time period can be set)
+path_horizon = None # Length of the solved paths (None: default of econpizza, 
+                    # 'auto': shortest sufficient length, chosen at the 
+                    # corners of the grid)
+metric_variables = ['c', 'y', 'n', 'pi', 'w', 'i', 'R', 'RR'] # Variables for 
+                   # which impact, peak, trough, half-life, cumulative 
+                   # discounted response and time to return are kept for 
+                   # every grid point (see rank_tank/metrics.py)
+workers = None # Number of worker processes for the sweep (None: all cores)
+continuation = True # If true, TANK points are warm-started along the lambda 
+                    # grid (from the previous solved point)
+reuse_jacobian = True # If true, find_path first takes Newton steps with the 
+                      # factorized Jacobian of the point solved before by the 
+                      # same worker (econpizza solves the path if they fail)
+use_cache = True # If true, solutions are cached on disk (in .cache/solutions, 
+                 # shared with run_models.py)
+
+sweep_mode = 'grid' # 'grid' solves the grid below, 'adaptive' starts from it 
+                    # and refines where the impact changes fastest or where 
+                    # solutions start failing, 'frontier' maps the feasibility 
+                    # frontier along the eta values of the grid, 'linear' 
+                    # solves the grid to first order and only solves the 
+                    # points near the ZLB (or with large errors) non-linearly, 
+                    # 'queue' publishes the grid points to 
+                    # results/sweep_queue.sqlite, where `workers` local 
+                    # processes and those of run_queue_worker.py on other 
+                    # machines solve them, 'stream' also sweeps over 
+                    # `further_axes` and writes the records of all points to 
+                    # results/run_loop_eta_lambda_records.csv as they are 
+                    # solved, without holding them in memory
+further_axes = {} # Further parameter axes of both models in the 'stream' 
+                  # mode, e.g. {'h': [0.6, 0.7, 0.8], 'Phi': [2., 4., 6.]} 
+                  # (the plot shows the surface at their first values)
+solve_budget = 200 # Maximum number of model solves in the adaptive mode
+use_frontier = False # If true, the grid sweep skips the points beyond the 
+                     # feasibility frontier saved by the 'frontier' mode
+use_checkpoint = True # If true, every solved grid point is saved at once (in 
+                      # results/sweep_checkpoint.jsonl), such that an 
+                      # interrupted grid sweep resumes where it stopped and an 
+                      # extended grid only solves the new points
+instrument = False # If true, the time of each stage of every model solve is 
+                   # recorded (in .cache/instrumentation) and summarised
 
 ###############################################################################
 ###############################################################################
 
 # Specify shock here (one at a time)
 specific_shock = ('e_z', 0.02) # Technology shock
-#specific_shock = ('e_beta', 0.02) # Discount factor shock # 0.198
+#specific_shock = ('e_beta', 0.02) # Discount factor shock # 0.198 (the sizes 
+                                   # at which the ZLB binds are found by the 
+                                   # 'zlb' scenarios of run_scenarios.py)
 
 ###############################################################################
 ###############################################################################
 
-# Load and duplicate models
+# Models
 
 # Set working directory accordingly
 absolute_path = os.getcwd()
 
-# Set path for RANK model, load the model and solve for its steady state
-relative_path_rank = os.path.join("models", "rank.yaml")
-full_path_rank = os.path.join(absolute_path, relative_path_rank)
+# Directory of the instrumentation records
+full_path_instrumentation = os.path.join(absolute_path, ".cache", 
+                                         "instrumentation")
 
-# Load baseline RANK model
-rank_model_loop = full_path_rank 
-
-# Duplicate the RANK model
-rank_dictionary_0 = ep.parse(rank_model_loop)
-rank_copy_eta = copy.deepcopy(rank_dictionary_0)
-
-# Set path for TANK model, load the model and solve for its steady state
-relative_path_tank = os.path.join("models", "tank.yaml")
-full_path_tank = os.path.join(absolute_path, relative_path_tank)
-
-# Load baseline TANK model
-tank_model_loop = full_path_tank
-
-# Duplicate the TANK model
-tank_dictionary_0 = ep.parse(tank_model_loop)
-tank_copy_eta_lambda = copy.deepcopy(tank_dictionary_0)
+# Registry of the RANK and TANK models (models/rank.yaml and models/tank.yaml) 
+# and of the solution cache shared with run_models.py; the workers of the 
+# sweep load the models from these paths and re-parameterize them for every 
+# grid point
+registry = default_registry(absolute_path, use_cache)
 
 ###############################################################################
 ###############################################################################
 
 # Preparations for the loop
 
+# File of the checkpoint of the grid sweep (shared by all shocks, as the 
+# records are keyed by the shock)
+full_path_checkpoint = os.path.join(absolute_path, "results", 
+                                    "sweep_checkpoint.jsonl")
+
 # Sequence of lambda values
 lambda_sequence = np.arange(0.1, 0.46, 0.05)
 
@@ -84,93 +123,64 @@ lambda_sequence = np.arange(0.1, 0.46, 0.05)
 eta_sequence = np.arange(0.33, 1, 0.15)
 eta_sequence = np.append(eta_sequence, 1) # Make sure 1 is included
 
-# Initialise empty container for impact values
-impact_eta_lambda = pd.DataFrame(np.nan, # Fill the data frame with NAs
-                                 index = lambda_sequence, 
-                                 columns = eta_sequence)
-
-###############################################################################
-###############################################################################
-
-# For loop over eta and lambda values
-
-for ee in eta_sequence:
-    # RANK for eta = ee
-    rank_copy_eta['steady_state']['fixed_values']['eta'] = ee
-    model_rank_eta = ep.load(rank_copy_eta)
-    _ = model_rank_eta.solve_stst()
-    x_rank_eta, flag_rank_eta = model_rank_eta.find_path(shock = specific_shock)
+# Everything below only runs in the main process: the workers of the sweep 
+# are fresh processes which import this script without executing the sweep
+if __name__ == "__main__":
     
-    indx_rank_eta = [model_rank_eta['variables'].index(v) for v in varlist_consumption]
-    rank_eta_index_c = indx_rank_eta[0]
-    stst_rank_eta_c = x_rank_eta[-1, rank_eta_index_c]
-    impact_rank_eta_c = (x_rank_eta[impact, rank_eta_index_c] - stst_rank_eta_c)/stst_rank_eta_c
-    
-    for ll in lambda_sequence:
-        try: # Some parameter combinations might not work
-            # For a given eta, do TANK for lambda = ll
-            tank_copy_eta_lambda['steady_state']['fixed_values']['eta'] = ee
-            tank_copy_eta_lambda['steady_state']['fixed_values']['lam'] = ll
-            model_tank_eta_lambda = ep.load(tank_copy_eta_lambda)
-            _ = model_tank_eta_lambda.solve_stst()
-            x_tank_eta_lambda, flag_tank_eta_lambda = model_tank_eta_lambda.find_path(shock = specific_shock)
-            
-            indx_tank_eta_lambda = [model_tank_eta_lambda['variables'].index(v) for v in varlist_consumption]
-            tank_eta_lambda_index_c = indx_tank_eta_lambda[0]
-            stst_tank_eta_lambda_c = x_tank_eta_lambda[-1, tank_eta_lambda_index_c]
-            impact_tank_eta_lambda_c = (x_tank_eta_lambda[impact, tank_eta_lambda_index_c] - stst_tank_eta_lambda_c)/stst_tank_eta_lambda_c
-            
-            # Store results
-            impact_eta_lambda.loc[ll, ee] = percent * (impact_tank_eta_lambda_c - impact_rank_eta_c)
-        except:
-            continue # Simply skip the parameter combinations that do not work
-
-###############################################################################
-###############################################################################
-
-# Plotting
-
-newnames = {'0.33':'0.33', '0.48': '0.48', '0.6299999999999999': '0.63', 
-            '0.7799999999999999': '0.78', '0.9299999999999999': '0.93', 
-            '1.0': '1.0'} 
-            # Correct machine precision for readbale legend in plot
-
-fig = px.line(impact_eta_lambda, markers = True, 
-              color_discrete_sequence=px.colors.qualitative.Plotly[:len(eta_sequence)]) 
-fig.update_yaxes(range=[-3., 0.]) # Fix range of y-axis
-fig.update_traces(line=dict(width=4),
-                  marker=dict(size=14))
-fig.for_each_trace(lambda t: t.update(name = newnames[t.name],
-                                      legendgroup = newnames[t.name],
-                                      hovertemplate = t.hovertemplate.replace(t.name, 
-                                                                              newnames[t.name])))
-fig.update_layout(title='', # Empty title
-                   xaxis_title="\u03BB", # x-axis labeling
-                   yaxis_title='Consumption Impact Rel. to RANK', # y-axis labeling
-                   plot_bgcolor = 'whitesmoke', 
-                   font=dict(size=20), 
-                   margin=dict(l=15, r=15, t=5, b=5), 
-                   legend=dict(orientation="h", # For horizontal legend
-                               yanchor="bottom", y=1, xanchor="right", x=1),
-                   legend_title='\u03B7')
-fig.show() # Display plot
-
-# Save plot as SVG
-relative_path_plots = os.path.join("plots", "sensitivity")
-full_path_plots = os.path.join(absolute_path, relative_path_plots)
-
-if specific_shock[0] == 'e_z' and save_plot_yes == True:
-    full_path_plots_sensitivity_technology = os.path.join(full_path_plots, 
-                                                          "sensitivity_technology.svg")
-    fig.write_image(full_path_plots_sensitivity_technology)
-
-if specific_shock[0] == 'e_beta' and save_plot_yes == True:
-    full_path_plots_sensitivity_discount = os.path.join(full_path_plots, 
-                                                        "sensitivity_discount.svg")
-    fig.write_image(full_path_plots_sensitivity_discount)
-
-###############################################################################
-###############################################################################
-
-# Print run time
-print('It took', (tm.time()-start)/60, 'minutes to execute this script.')
+    if instrument: # Also enables the instrumentation in the worker processes
+        enable(full_path_instrumentation)
+
+    ###########################################################################
+    ###########################################################################
+
+    # Sweep over eta and lambda values (each grid point is solved in a worker 
+    # of a process pool, see rank_tank/sweep.py); in the 'frontier' mode, the 
+    # frontier is saved to results/frontier_<shock>.csv and the grid sweep 
+    # then skips the infeasible points
+
+    scenario = make_scenario({'name': 'run_loop_eta_lambda', 'kind': 'sweep', 
+                              'shock': specific_shock, 
+                              'variable': varlist_consumption, 
+                              'impact': impact, 'percent': percent, 
+                              'path_horizon': path_horizon, 
+                              'eta': eta_sequence, 'lam': lambda_sequence, 
+                              'mode': sweep_mode, 'axes': further_axes, 
+                              'continuation': continuation, 
+                              'reuse_jacobian': reuse_jacobian, 
+                              'budget': solve_budget, 
+                              'use_frontier': use_frontier, 
+                              'checkpoint': full_path_checkpoint 
+                              if use_checkpoint else False, 
+                              'metrics': {'variables': metric_variables}, 
+                              'workers': workers, 
+                              'save_plots': save_plot_yes, 
+                              'save_results': save_results}, 
+                             base_directory = absolute_path)
+    result = run_sweep_scenario(registry, scenario)
+    impact_eta_lambda = result['impact'] # Index: lambda, columns: eta
+    records_eta_lambda = result['records']
+    if sweep_mode == 'frontier':
+        print(result['frontier'].frontier)
+    if sweep_mode in ('linear', 'stream'): # Points solved and failed
+        print(result['report'])
+
+    ###########################################################################
+    ###########################################################################
+
+    # Plotting (see rank_tank/scenarios.py for the figure)
+
+    # Display and save plot as SVG
+    if show_plots:
+        import plotly.io as pio # Only needed (and imported) for displaying
+        pio.renderers.default = "svg" # For plotting in the Spyder window
+    render_figures(result['specs'], show = show_plots, workers = 1)
+
+    ###########################################################################
+    ###########################################################################
+
+    # Hotspots of the run (wall time per stage, summed over all processes)
+    if instrument:
+        print(hotspot_summary(full_path_instrumentation))
+
+    # Print run time
+    print('It took', (tm.time()-start)/60, 'minutes to execute this script.')
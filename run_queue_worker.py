@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This script starts workers of the sweep queue (see rank_tank/task_queue.py): 
+# run_loop_eta_lambda.py with sweep_mode = 'queue' (or a 'queue' sweep of 
+# run_scenarios.py) publishes the grid points to the queue file, and any 
+# number of these workers, on this or on other machines with access to the 
+# file (and to a copy of the repository), claim and solve them. Each worker 
+# process loads rank.yaml and tank.yaml once
+#
+# Run from the root of the repository, e.g.
+#     python run_queue_worker.py results/sweep_queue.sqlite --workers 8
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import sys
+import time as tm
+import argparse
+import multiprocessing as mp
+from rank_tank.registry import default_registry
+from rank_tank.task_queue import run_queue_worker
+
+###############################################################################
+###############################################################################
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Solve the tasks of a '
+                                     'sweep queue')
+    parser.add_argument('queue', help = 'SQLite file of the queue')
+    parser.add_argument('--workers', type = int, default = None, 
+                        help = 'worker processes (default: all cores)')
+    parser.add_argument('--max-attempts', type = int, default = 3, 
+                        help = 'attempts of a task before it fails')
+    parser.add_argument('--lease', type = float, default = 3600., 
+                        help = 'seconds after which the task of an '
+                        'unresponsive worker is handed to another one')
+    parser.add_argument('--wait', action = 'store_true', 
+                        help = 'keep waiting for new tasks once the queue is '
+                        'finished')
+    parser.add_argument('--no-cache', action = 'store_true', 
+                        help = 'do not use the solution cache')
+    args = parser.parse_args(argv)
+    
+    start = tm.time() # Start timer
+    registry = default_registry(os.getcwd(), not args.no_cache)
+    workers = os.cpu_count() if args.workers is None else args.workers
+    kwargs = {'cache_directory': registry.cache_directory, 
+              'max_attempts': args.max_attempts, 'lease': args.lease, 
+              'wait': args.wait}
+    
+    # Use fresh ('spawn') processes, as JAX does not support forking
+    context = mp.get_context('spawn')
+    processes = [context.Process(target = run_queue_worker, 
+                                 args = (args.queue, registry.models['rank'], 
+                                         registry.models['tank']), 
+                                 kwargs = kwargs) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    
+    print('It took', (tm.time()-start)/60, 'minutes to work off the queue.')
+    return 0
+
+# Only runs in the main process: the workers are fresh processes which import 
+# this script without starting further workers
+if __name__ == "__main__":
+    sys.exit(main())
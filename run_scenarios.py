@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This script runs the scenarios of a YAML file (see the `scenarios` folder 
+# and rank_tank/scenarios.py): the IRFs of run_models.py and the sweeps of 
+# run_loop_eta_lambda.py, with shocks, grids, horizons, output directories and 
+# worker counts taken from the file instead of the globals of the scripts. All 
+# scenarios of one run share the loaded models, and the figures of all of them 
+# are rendered in one stage at the end (plotly is not even imported for 
+# solve-only runs)
+#
+# Run from the root of the repository, e.g.
+#     python run_scenarios.py scenarios/paper.yaml --only irfs --solve-only
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import sys
+import time as tm
+import argparse
+from rank_tank.registry import default_registry
+from rank_tank.instrumentation import enable, hotspot_summary
+from rank_tank.scenarios import load_scenarios, run_scenarios
+
+###############################################################################
+###############################################################################
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Run the RANK/TANK '
+                                     'scenarios of a YAML file')
+    parser.add_argument('scenarios', nargs = '+', 
+                        help = 'YAML files of scenarios')
+    parser.add_argument('--only', nargs = '+', default = None, 
+                        help = 'names of the scenarios to run (default: all)')
+    parser.add_argument('--workers', type = int, default = None, 
+                        help = 'worker processes of all sweeps (overrides '
+                        'the scenario files)')
+    parser.add_argument('--plot-workers', type = int, default = None, 
+                        help = 'worker processes exporting the plots '
+                        '(default: one exporter in this process)')
+    parser.add_argument('--solve-only', action = 'store_true', 
+                        help = 'skip the plotting stage')
+    parser.add_argument('--show', action = 'store_true', 
+                        help = 'display the figures')
+    parser.add_argument('--no-cache', action = 'store_true', 
+                        help = 'do not use the solution cache')
+    parser.add_argument('--instrument', action = 'store_true', 
+                        help = 'record and summarise the time of each stage')
+    args = parser.parse_args(argv)
+    
+    start = tm.time() # Start timer
+    absolute_path = os.getcwd()
+    
+    full_path_instrumentation = os.path.join(absolute_path, ".cache", 
+                                             "instrumentation")
+    if args.instrument: # Also enables the instrumentation in the workers
+        enable(full_path_instrumentation)
+    
+    scenarios = [scenario for path in args.scenarios 
+                 for scenario in load_scenarios(path, absolute_path)]
+    if args.only is not None:
+        missing = [nn for nn in args.only 
+                   if nn not in [ss['name'] for ss in scenarios]]
+        if missing:
+            parser.error('unknown scenarios: %s' % missing)
+        scenarios = [ss for ss in scenarios if ss['name'] in args.only]
+    if args.workers is not None:
+        for scenario in scenarios:
+            if scenario['kind'] != 'irf':
+                scenario['workers'] = args.workers
+    
+    # Solve all scenarios (sharing the models and the solution cache)
+    registry = default_registry(absolute_path, not args.no_cache)
+    results = run_scenarios(registry, scenarios)
+    
+    for name, result in results.items():
+        for shock, (passed, _) in result.get('nesting', {}).items():
+            print(name, ': TANK with lam = 0 reproduces RANK after', shock, 
+                  ':', passed)
+        if result.get('frontier') is not None:
+            print(name, ': feasibility frontier')
+            print(result['frontier'].frontier)
+        if result.get('brackets') is not None:
+            print(name, ': shock sizes at which the ZLB starts binding')
+            print(result['brackets'])
+        if result.get('moments') is not None:
+            print(name, ': simulated moments and ZLB frequency')
+            print(result['moments'])
+            print(result['summary'])
+    
+    # Plotting stage (plotly is imported here, when the first figure is built)
+    if not args.solve_only:
+        from rank_tank.plotting import render_figures
+        specs = [spec for result in results.values() 
+                 for spec in result['specs']]
+        paths = render_figures(specs, show = args.show, 
+                               workers = args.plot_workers)
+        print('Exported', len(paths), 'figures.')
+    
+    # Hotspots of the run (wall time per stage, summed over all processes)
+    if args.instrument:
+        print(hotspot_summary(full_path_instrumentation))
+    
+    print('It took', (tm.time()-start)/60, 'minutes to run', len(scenarios), 
+          'scenarios.')
+    return 0
+
+# Only runs in the main process: the workers of the sweeps are fresh 
+# processes which import this script without running the scenarios
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# This module contains the fixtures shared by the tests: the handles of RANK 
+# and TANK are loaded (and compiled) once per test session. Tests which solve 
+# the models are skipped if econpizza is not installed
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import pytest
+
+###############################################################################
+###############################################################################
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+rank_model = os.path.join(root, 'models', 'rank.yaml')
+tank_model = os.path.join(root, 'models', 'tank.yaml')
+
+shock = ('e_beta', 0.005) # Small shock of the tests
+lambda_sequence = [0.2, 0.25] # Small grid of the tests
+
+@pytest.fixture(scope = 'session')
+def rank_handle():
+    pytest.importorskip('econpizza')
+    from rank_tank.model_handle import ModelHandle
+    return ModelHandle(rank_model)
+
+@pytest.fixture(scope = 'session')
+def tank_handle():
+    pytest.importorskip('econpizza')
+    from rank_tank.model_handle import ModelHandle
+    return ModelHandle(tank_model)
+
+@pytest.fixture
+def executor(rank_handle, tank_handle):
+    """Executor solving in the calling process (`workers = 1`), whose worker 
+    state holds the handles of the session such that the models are not 
+    compiled again."""
+    from rank_tank import sweep
+    with sweep.SweepExecutor(rank_model, tank_model, workers = 1) as executor:
+        sweep._worker_handles.update(rank = rank_handle, tank = tank_handle)
+        yield executor
+    sweep._worker_handles.clear()
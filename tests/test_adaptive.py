@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the adaptive sweep over eta and lambda (rank_tank/adaptive.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank.adaptive import run_adaptive_sweep
+from tests.conftest import rank_model, tank_model, shock
+
+###############################################################################
+###############################################################################
+
+class SyntheticExecutor:
+    """Executor whose TANK impact response jumps at lam = 0.2 (without 
+    solving the models); it counts the solves of each model."""
+    
+    workers = 2
+    
+    def __init__(self):
+        self.solves = {'rank': [], 'tank': []}
+    
+    def solve_points(self, points, specific_shock, variable = 'c', 
+                     impact = 1, solved_etas = ()):
+        etas = sorted(set(ee for ee, _ in points) - set(solved_etas))
+        self.solves['rank'] += etas
+        self.solves['tank'] += list(points)
+        rank = {ee: {'model': 'rank', 'eta': ee, 'impact': 0., 'error': None}
+                for ee in etas}
+        tank = [{'model': 'tank', 'eta': ee, 'lam': ll, 'error': None, 
+                 'impact': np.tanh(100*(ll - 0.2)) + 0.01*ee}
+                for ee, ll in points]
+        return rank, tank
+
+def test_budget_and_refinement():
+    executor = SyntheticExecutor()
+    budget = 60
+    points, records = run_adaptive_sweep(rank_model, tank_model, 
+                                         [0.5, 1., 1.5], [0.1, 0.3, 0.5], 
+                                         shock, budget = budget, 
+                                         executor = executor)
+    solves = executor.solves
+    
+    # Every solve counts against the budget, RANK is solved once per eta
+    assert len(solves['rank']) + len(solves['tank']) == len(records)
+    assert budget - 5 < len(records) <= budget
+    assert len(set(solves['rank'])) == len(solves['rank'])
+    assert len(set(solves['tank'])) == len(solves['tank'])
+    
+    # The refined points concentrate around the jump at lam = 0.2
+    refined = points[~points['lam'].isin([0.1, 0.3, 0.5])]
+    assert (refined['lam'] < 0.3).mean() > 0.8
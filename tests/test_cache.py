@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the on-disk solution cache (rank_tank/cache.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import numpy as np
+import pytest
+from rank_tank.cache import SolutionCache, solution_key
+from tests.conftest import shock
+
+###############################################################################
+###############################################################################
+
+def test_put_get_round_trip(tmp_path):
+    cache = SolutionCache(str(tmp_path))
+    key = solution_key('model', {'lam': 0.2}, shock, 200)
+    x = np.arange(12.).reshape(4, 3)
+    cache.put(key, x, False, {'c': 0.5, 'beta': 0.99})
+    
+    cached_x, flag, stst = cache.get(key)
+    assert np.array_equal(cached_x, x)
+    assert flag is False
+    assert stst == {'c': 0.5, 'beta': 0.99}
+    assert cache.get(solution_key('model', {'lam': 0.3}, shock, 200)) is None
+
+def test_failed_put_leaves_no_temporary_file(tmp_path):
+    cache = SolutionCache(str(tmp_path))
+    with pytest.raises(ValueError):
+        cache.put('key', np.zeros(3), False, {'c': 'not a number'})
+    assert os.listdir(str(tmp_path)) == []
+
+def test_eviction(tmp_path):
+    cache = SolutionCache(str(tmp_path), max_bytes = 0)
+    cache.put('key', np.zeros(3), False, {'c': 0.5})
+    assert cache.get('key') is None
+
+def test_running_size(tmp_path, monkeypatch):
+    cache = SolutionCache(str(tmp_path))
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, 'evict', lambda: scans.append(1) or evict())
+    for ii in range(5):
+        cache.put('key%d' % ii, np.zeros(3), False, {'c': 0.5})
+    cache.put('key0', np.zeros(5), False, {'c': 0.5}) # Replaced
+    
+    # The directory is only scanned by the first put while the cache fits
+    sizes = [entry.stat().st_size for entry in os.scandir(str(tmp_path))]
+    assert len(scans) == 1 and cache.size == sum(sizes)
+    
+    # Beyond max_bytes, the least recently used entries are evicted
+    cache.max_bytes = sum(sizes[:4])
+    cache.put('key5', np.zeros(3), False, {'c': 0.5})
+    assert len(scans) == 2 and cache.size <= cache.max_bytes
+    assert cache.get('key1') is None and cache.get('key5') is not None
+
+def test_solve_round_trip(tmp_path, rank_handle):
+    cache = SolutionCache(str(tmp_path))
+    x, flag, stst = rank_handle.solve(shock, cache = cache)
+    assert flag is False
+    
+    cached_x, cached_flag, cached_stst = rank_handle.solve(shock, cache = cache)
+    assert cached_flag is False
+    assert np.allclose(cached_x, x)
+    assert np.isclose(cached_stst['c'], stst['c'])
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the checkpoint store of the sweep (rank_tank/checkpoint.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank import sweep
+from rank_tank.checkpoint import point_key, CheckpointStore
+from tests.conftest import rank_model, tank_model, shock
+
+###############################################################################
+###############################################################################
+
+record = {'model': 'tank', 'model_hash': 'abc', 'fixed_values': {'lam': 0.2}, 
+          'horizon': 100, 'shock': 'e_beta', 'size': 0.005, 'variable': 'c', 
+          'period': 1, 'reason': None}
+
+def test_point_key():
+    assert point_key(record) == point_key(dict(record, fixed_values = 
+                                               {'lam': 0.1 + 0.1}))
+    for change in [{'model_hash': 'def'}, {'horizon': 200}, 
+                   {'fixed_values': {'lam': 0.2, 'h': 0.5}}]:
+        assert point_key(record) != point_key(dict(record, **change))
+
+def test_failed_records_are_not_stored(tmp_path):
+    store = CheckpointStore(str(tmp_path/'checkpoint.jsonl'))
+    store.append([record, dict(record, fixed_values = {'lam': 0.3}, 
+                               reason = 'path')])
+    assert list(store.completed()) == [point_key(record)]
+
+def test_resumed_sweep(executor, tmp_path, monkeypatch):
+    solved, solve_point = [], sweep.solve_point
+    def counting_solve_point(*args, **kwargs):
+        solved.append(args[:2])
+        return solve_point(*args, **kwargs)
+    monkeypatch.setattr(sweep, 'solve_point', counting_solve_point)
+    
+    store = CheckpointStore(str(tmp_path/'checkpoint.jsonl'))
+    def run(horizon):
+        return sweep.run_sweep(rank_model, tank_model, [1.], [0.2], shock, 
+                               checkpoint = store, horizon = horizon, 
+                               executor = executor)
+    frame, _ = run(100)
+    assert len(solved) == 2
+    resumed, records = run(100) # Nothing left to solve
+    assert len(solved) == 2 and len(records) == 2
+    assert np.allclose(resumed, frame)
+    run(150) # Other horizon: solved again
+    assert len(solved) == 4
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the feasibility frontier (rank_tank/feasibility.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank.feasibility import (is_feasible, map_frontier, 
+                                   FeasibilityFrontier)
+from tests.conftest import rank_model, tank_model, shock
+
+###############################################################################
+###############################################################################
+
+class RuleExecutor:
+    """Executor whose points are feasible according to `rule(eta, lam)`."""
+    
+    def __init__(self, rule):
+        self.rule = rule
+    
+    def map(self, function, tasks):
+        return [{'eta': fixed_values['eta'], 'lam': fixed_values['lam'], 
+                 'flag': not self.rule(fixed_values['eta'], 
+                                       fixed_values['lam']), 
+                 'reason': None, 'error': None}
+                for _, fixed_values, *_ in tasks]
+
+def test_is_feasible():
+    assert is_feasible({'error': None, 'flag': False})
+    assert not is_feasible({'error': None, 'flag': True})
+    assert not is_feasible({'error': 'failed', 'flag': None})
+
+def test_bisection():
+    executor = RuleExecutor(lambda eta, lam: lam < 0.3 + 0.1*eta)
+    frontier = map_frontier(rank_model, tank_model, [0., 1., 2.], 0.1, 0.45, 
+                            shock, tol = 0.001, executor = executor)
+    limits = frontier.frontier.set_index('eta')
+    assert np.allclose(limits['lam_infeasible'], [0.3, 0.4, np.nan], 
+                       atol = 0.001, equal_nan = True)
+    assert (limits['lam_feasible'] <
+            limits['lam_infeasible'].fillna(np.inf)).all()
+    assert frontier.is_outside(1., 0.41) and not frontier.is_outside(1., 0.39)
+
+def test_infeasible_lower_end():
+    executor = RuleExecutor(lambda eta, lam: lam > 0.2 or eta > 1.)
+    frontier = map_frontier(rank_model, tank_model, [0., 2.], 0.1, 0.45, 
+                            shock, executor = executor)
+    limits = frontier.frontier.set_index('eta')
+    assert np.allclose(limits['lam_feasible'], 0.45)
+    assert limits['lam_infeasible'].isna().all()
+    assert not frontier.is_outside(0., 0.45)
+
+def test_save_load(tmp_path):
+    executor = RuleExecutor(lambda eta, lam: lam < 0.3)
+    frontier = map_frontier(rank_model, tank_model, [1.], 0.1, 0.45, shock, 
+                            executor = executor)
+    frontier.save(str(tmp_path/'frontier.csv'))
+    loaded = FeasibilityFrontier.load(str(tmp_path/'frontier.csv'))
+    assert np.isclose(loaded.limit(1.), frontier.limit(1.))
+
+def test_map_frontier(executor):
+    frontier = map_frontier(rank_model, tank_model, [1.], 0.2, 0.25, shock, 
+                            executor = executor)
+    assert frontier.points['feasible'].all()
+    assert np.isclose(frontier.frontier['lam_feasible'][0], 0.25)
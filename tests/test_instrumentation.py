@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the instrumentation of the solve pipeline 
+# (rank_tank/instrumentation.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import pytest
+from rank_tank import instrumentation
+from rank_tank.instrumentation import (ENVIRONMENT_VARIABLE, NullRecorder, 
+                                       Recorder, enable, disable, 
+                                       get_recorder, load_records, 
+                                       hotspot_summary, path_iterations)
+from tests.conftest import shock
+
+###############################################################################
+###############################################################################
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    """Directory of the records, with the instrumentation disabled before 
+    and after the test."""
+    monkeypatch.delenv(ENVIRONMENT_VARIABLE, raising = False)
+    instrumentation._recorder.clear()
+    yield str(tmp_path/'instrumentation')
+    disable()
+
+def test_lifecycle(directory):
+    assert isinstance(get_recorder(), NullRecorder)
+    enable(directory)
+    assert os.environ[ENVIRONMENT_VARIABLE] == directory
+    recorder = get_recorder()
+    assert isinstance(recorder, Recorder) and recorder is get_recorder()
+    with recorder.stage('parse'):
+        pass
+    assert len(load_records(directory)) == 1
+    
+    disable()
+    assert ENVIRONMENT_VARIABLE not in os.environ
+    assert not instrumentation._recorder
+    assert isinstance(get_recorder(), NullRecorder)
+    enable(directory) # Records of earlier runs are removed
+    assert load_records(directory) == []
+
+def test_path_iterations():
+    output = ('    Iteration   1 | max error 1.00e-02 | lapsed 0.1s\n'
+              '    Iteration   2 | max error 1.00e-09 | lapsed 0.2s\n')
+    assert path_iterations(output) == 2
+    assert path_iterations('') is None
+
+def test_solve_records(rank_handle, directory):
+    enable(directory)
+    rank_handle.solve(shock, horizon = 100)
+    rank_handle.solve(shock, {'eta': 0.5}, horizon = 100, 
+                      reuse_jacobian = True)
+    fresh, reused = load_records(directory)[-2:]
+    assert fresh['flag'] is False and fresh['path_iterations'] > 0
+    assert reused['flag'] is False and reused['path_iterations'] > 0
+    assert 'iterations' in fresh or 'residual' in fresh
+    assert {'solve_stst', 'find_path'} <= set(hotspot_summary(directory).index)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the IRF post-processing (rank_tank/irf.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank.irf import deviations, percent_deviations, irf_frame
+
+###############################################################################
+###############################################################################
+
+# Paths of two shocks (shock x time x variable; the last period is the 
+# steady state) of a model with the variables y, c and pi
+x = np.array([[[2., 1., 1.01], [2.02, 0.99, 1.01], [2., 1., 1.01]], 
+              [[2., 1., 1.01], [1.98, 1.03, 1.0201], [2., 1., 1.01]]])
+variables = ['y', 'c', 'pi']
+
+def test_deviations():
+    assert np.allclose(deviations(x[0], [1, 0], 2), 
+                       [[0., 0.], [-1., 1.]])
+    assert np.allclose(deviations(x, [0], 2, percent = 1)[:, 1, 0], 
+                       [0.01, -0.01])
+
+def test_irf_frame():
+    irfs = percent_deviations({'rank': x, 'tank': x[:, :, :2]}, 
+                              {'rank': variables, 'tank': variables[:2]}, 
+                              {'rank': ['c', 'pi'], 'tank': ['c']}, 2, 
+                              shock_labels = [('e_z', 0.02), 
+                                              ('e_beta', 0.02)])
+    assert list(irfs.columns) == [('rank', 'c'), ('rank', 'pi'), 
+                                  ('tank', 'c')]
+    
+    frame = irf_frame(irfs, {'RANK': ('rank', 'c'), 'TANK': ('tank', 'c'), 
+                             'Inflation': ('rank', 'pi')}, 
+                      shock = ('e_beta', 0.02))
+    assert list(frame.columns) == ['Quarters', 'RANK', 'TANK', 'Inflation']
+    assert list(frame['Quarters']) == [0, 1]
+    # Percent deviations from steady state in the period of impact
+    assert np.allclose(frame.loc[1, ['RANK', 'TANK', 'Inflation']], 
+                       [3., 3., 1.])
+    assert np.allclose(frame.loc[0, ['RANK', 'TANK', 'Inflation']], 0.)
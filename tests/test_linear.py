@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the linear fast path (rank_tank/linear.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pytest
+from rank_tank.linear import linear_path, solve_linear_point, run_linear_sweep
+from tests.conftest import rank_model, tank_model
+
+###############################################################################
+###############################################################################
+
+small_shock = ('e_beta', 0.001)
+
+@pytest.mark.parametrize('model, fixed_values', [ 
+    ('rank', {}), ('tank', {'eta': 0.48, 'lam': 0.2})])
+def test_linear_path_matches_find_path(model, fixed_values, request):
+    handle = request.getfixturevalue(model + '_handle')
+    handle.solve_stst(fixed_values)
+    x, flag = handle.find_path(small_shock, horizon = 100)
+    x_linear, path_error = linear_path(handle, small_shock, horizon = 100)
+    
+    assert flag is False
+    assert x_linear.shape == x.shape
+    deviation = np.max(np.abs(np.asarray(x) - x[-1]))
+    assert np.max(np.abs(x_linear - x)) < 1e-2*deviation
+    assert path_error < 1e-2
+
+@pytest.mark.parametrize('model, fixed_values', [ 
+    ('rank', {'eta': 0.48}), ('tank', {'eta': 0.48, 'lam': 0.2})])
+@pytest.mark.parametrize('specific_shock', [('e_z', 0.02), ('e_z', 0.005)])
+def test_linear_points_at_paper_shocks(model, fixed_values, specific_shock, 
+                                       executor):
+    # The error of the linear path is relative to the size of the response, 
+    # such that the points of the paper's technology shocks are accepted
+    record = solve_linear_point(model, fixed_values, specific_shock, 'c', 1)
+    assert record['error'] is None
+    assert record['linear_ok'] and 0 < record['path_error'] < 0.1
+
+def test_solve_linear_point(executor):
+    record = solve_linear_point('tank', {'eta': 0.48, 'lam': 0.2}, 
+                                small_shock, 'c', 1, horizon = 100)
+    assert record['error'] is None
+    assert record['linear_ok'] and record['zlb'] is False
+    assert record['impact'] < 0
+
+def test_run_linear_sweep(executor):
+    frame, records, report = run_linear_sweep(rank_model, tank_model, [1.], 
+                                              [0.2, 0.25], small_shock, 
+                                              horizon = 100, verify = 1, 
+                                              executor = executor)
+    assert np.isfinite(frame.values).all()
+    assert report['verified'] == 1 and report['max_error'] < 1e-2
+
+def test_linear_sweep_compares_equal_methods(executor):
+    # The linear points of an eta with a verified point are still relative to 
+    # the linear RANK point
+    kwargs = {'horizon': 100, 'executor': executor}
+    frame, records, report = run_linear_sweep(rank_model, tank_model, [1.], 
+                                              [0.2, 0.25, 0.3], small_shock, 
+                                              verify = 1, **kwargs)
+    linear_frame, _, _ = run_linear_sweep(rank_model, tank_model, [1.], 
+                                          [0.2, 0.25, 0.3], small_shock, 
+                                          verify = 0, **kwargs)
+    methods = {rr['lam']: rr['method'] for rr in records
+               if rr['model'] == 'tank'}
+    assert sorted(methods.values()) == ['linear', 'linear', 'nonlinear']
+    for ll, method in methods.items():
+        if method == 'linear':
+            assert frame.loc[ll, 1.] == linear_frame.loc[ll, 1.]
+    
+    # The error of the verified point is the difference of the values of the 
+    # two frames
+    ll = [ll for ll, method in methods.items() if method == 'nonlinear'][0]
+    assert np.isclose(report['max_error'], 
+                      abs(frame.loc[ll, 1.] - linear_frame.loc[ll, 1.]))
+    assert sorted(rr['method'] for rr in records if rr['model'] == 'rank') \
+        == ['linear', 'nonlinear']
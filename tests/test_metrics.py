@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the metrics of the sweep paths (rank_tank/metrics.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank.metrics import path_metrics, MetricSpec
+
+###############################################################################
+###############################################################################
+
+# Relative deviations from steady state of three variables (the last period 
+# is the steady state, above one such that the deviations are relative): a decaying response, a response which flips its sign 
+# and one which does not return before the terminal condition
+deviations = np.array([[0., 0., 0.], 
+                       [0.08, -0.1, 0.01], 
+                       [0.04, 0.07, 0.02], 
+                       [0.02, -0.04, 0.03], 
+                       [0.01, 0., 0.04], 
+                       [1e-5, 0., 0.05], 
+                       [0., 0., 0.]])
+stst = np.array([2., 1.5, 1.])
+x = stst*(1 + deviations)
+
+def test_path_metrics():
+    metrics = path_metrics(x, [0, 1, 2], discount = 0.5)
+    assert np.allclose(metrics['impact'], [0.08, -0.1, 0.01])
+    assert np.allclose(metrics['peak'], [0.08, 0.07, 0.05])
+    assert np.allclose(metrics['trough'], [0., -0.1, 0.])
+    # Periods after the largest absolute deviation until it has halved
+    assert np.array_equal(metrics['half_life'], [1., 2., np.nan], 
+                          equal_nan = True)
+    assert np.allclose(metrics['cumulative'], 
+                       (0.5**np.arange(7)[:, None]*deviations).sum(axis = 0))
+    assert np.allclose(metrics['cumulative'][1], 
+                       -0.1/2 + 0.07/4 - 0.04/8)
+    # Below the tolerance from a period on (not only in the steady state)
+    assert np.array_equal(metrics['time_to_return'], [5., 4., np.nan], 
+                          equal_nan = True)
+
+def test_stacked_paths_and_spec():
+    stacked = path_metrics(np.stack((x, x[:, ::-1])), [0, 2], 
+                           metrics = ('peak', 'half_life'))
+    assert set(stacked) == {'peak', 'half_life'}
+    assert stacked['peak'].shape == (2, 2)
+    assert np.allclose(stacked['peak'], [[0.08, 0.05], [0.05, 0.08]])
+    
+    spec = MetricSpec(variables = ('y', 'c', 'pi'), metrics = ('impact',), 
+                      discount = 0.5)
+    columns = spec.compute(['y', 'c'], x[:, :2])
+    assert np.isclose(columns['y_impact'], 0.08)
+    assert np.isclose(columns['c_impact'], -0.1)
+    assert np.isnan(columns['pi_impact']) # Not a variable of the model
+
+def test_zero_steady_state():
+    # Deviations of variables with a steady state below one (such as bprof, 
+    # which is zero in RANK) are absolute
+    levels = np.column_stack((deviations[:, 1], 0.5 + deviations[:, 1]))
+    metrics = path_metrics(levels, [0, 1], discount = 0.5)
+    for values in metrics.values():
+        assert np.isclose(values[0], values[1])
+    assert np.allclose(metrics['impact'], -0.1)
+    assert np.allclose(metrics['peak'], 0.07)
+    assert np.array_equal(metrics['time_to_return'], [4., 4.])
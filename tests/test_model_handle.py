@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the model handle (rank_tank/model_handle.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank.model_handle import terminal_deviation
+from tests.conftest import shock
+
+###############################################################################
+###############################################################################
+
+def test_terminal_deviation_of_zero_steady_state():
+    x = np.array([[1., 0.], [2., 1e-9], [2., 0.]])
+    assert np.isclose(terminal_deviation(x), 1e-9)
+
+def test_fast_converging_shock_selects_short_horizon(rank_handle):
+    options = {'periods': 10, 'candidates': (30, 50, 75, 100), 'tol': 1e-5}
+    fast = rank_handle.select_horizon(('e_z', 0.005), {'rho_z': 0.2}, 
+                                      **options)
+    persistent = rank_handle.select_horizon(('e_z', 0.005), **options)
+    assert fast < persistent <= 100
+    assert rank_handle.select_horizon(('e_z', 0.005), {'rho_z': 0.2}, 
+                                      **options) == fast # Remembered
+
+def test_reuse_jacobian_matches_fresh_path(tank_handle):
+    tank_handle.solve_stst({'lam': 0.2})
+    x, _ = tank_handle.find_path(shock, horizon = 100, reuse_jacobian = True)
+    tank_handle.solve_stst({'lam': 0.25})
+    x_fresh, flag_fresh = tank_handle.find_path(shock, guess = x, 
+                                                horizon = 100)
+    jacobian = tank_handle.path_jacobian
+    x_reuse, flag_reuse = tank_handle.find_path(shock, guess = x, 
+                                                horizon = 100, 
+                                                reuse_jacobian = True)
+    assert flag_fresh is False and flag_reuse is False
+    assert tank_handle.path_jacobian is jacobian # That of lam = 0.2
+    assert np.allclose(x_reuse, x_fresh, atol = 1e-6)
+
+def test_solve_shocks(rank_handle):
+    shocks = [shock, ('e_z', 0.005)]
+    paths, flags = rank_handle.solve_shocks(shocks, horizon = 100)
+    assert flags == [False, False]
+    for ss, path in zip(shocks, paths):
+        x, _ = rank_handle.find_path(ss, horizon = 100)
+        assert np.allclose(path, x, atol = 1e-6)
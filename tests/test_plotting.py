@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the rendering stage of the figures (rank_tank/plotting.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import pandas as pd
+from rank_tank import plotting
+from rank_tank.plotting import FigureSpec, render_figures
+
+###############################################################################
+###############################################################################
+
+def test_unchanged_figures_are_skipped(tmp_path, monkeypatch):
+    exported = []
+    def export(spec): # Write a file instead of running Kaleido
+        exported.append(spec.path)
+        with open(spec.path, 'w') as file:
+            file.write('<svg/>')
+        return spec.path
+    monkeypatch.setattr(plotting, '_export', export)
+    
+    data = pd.DataFrame({'Quarters': range(3), 'RANK': [0., 1., 0.5]})
+    specs = [FigureSpec(data, 'Output', path = str(tmp_path/('%s.svg' % ff)), 
+                        columns = ['RANK']) for ff in ('a', 'b')]
+    manifest = str(tmp_path/'manifest.json')
+    render = lambda specs, **kwargs: render_figures(specs, 
+                                                    manifest = manifest, 
+                                                    **kwargs)
+    
+    assert render(specs) == [specs[0].path, specs[1].path]
+    assert render(specs) == [] # Unchanged
+    
+    # Changed data or labels, a deleted file and `force` export again
+    changed = FigureSpec(data*2, 'Output', path = specs[0].path, 
+                         columns = ['RANK'])
+    assert render([changed, specs[1]]) == [specs[0].path]
+    relabelled = FigureSpec(data*2, 'Consumption', path = specs[0].path, 
+                            columns = ['RANK'])
+    assert render([relabelled, specs[1]]) == [specs[0].path]
+    (tmp_path/'b.svg').unlink()
+    assert render([relabelled, specs[1]]) == [specs[1].path]
+    assert render([relabelled, specs[1]], force = True) == \
+        [specs[0].path, specs[1].path]
+    assert len(exported) == 7
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the steady state presolver (rank_tank/presolve.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pytest
+from rank_tank.presolve import (SteadyStatePresolver, PresolveError, 
+                                evaluate_values)
+
+###############################################################################
+###############################################################################
+
+@pytest.fixture(params = ['rank', 'tank'])
+def handle(request, rank_handle, tank_handle):
+    return {'rank': rank_handle, 'tank': tank_handle}[request.param]
+
+def test_structure(handle):
+    presolver = SteadyStatePresolver(handle.dictionary)
+    fixed = presolver.default_fixed_values
+    blocks = presolver.structure(fixed)
+    summary = presolver.summary()
+    
+    # Every unknown is solved in exactly one block, by as many equations
+    unknowns = [nn for bb in blocks for nn in bb[0]]
+    assert sorted(unknowns) == sorted(presolver.unknowns(fixed))
+    assert all(len(bb[0]) == len(bb[1]) for bb in blocks)
+    # The recursive part: e.g. RR = R/pi, qb from the bond price and the
+    # marginal product of capital from the rental rate
+    assert {'RR', 'qb', 'MPK', 'cap_util_costs'} <= set(summary['recursive'])
+    assert len(summary['recursive']) + sum(map(len, summary['core'])) == \
+        len(unknowns)
+    if 'lam' in handle.dictionary['parameters']: # TANK
+        assert any('chi' in core for core in summary['core'])
+    
+    # The equations of each block only involve its unknowns and those of the
+    # blocks before it
+    incidence = presolver._incidence(fixed, presolver._initial_values(fixed))
+    names = presolver.unknowns(fixed)
+    known = set()
+    for block, rows in blocks:
+        known |= set(block)
+        assert {names[jj] for jj in np.flatnonzero(incidence[rows].any( 
+            axis = 0))} <= known
+
+def test_presolved_steady_state_matches_solve_stst(handle):
+    fixed_values = {'eta': 0.48}
+    if 'lam' in handle.dictionary['parameters']:
+        fixed_values['lam'] = 0.2
+    presolver = SteadyStatePresolver(handle.dictionary)
+    presolved = presolver.solve(fixed_values)
+    handle.solve_stst(fixed_values)
+    solved = handle.steady_state()
+    for nn in handle.variables + ['chi']:
+        assert np.isclose(presolved[nn], solved[nn], rtol = 1e-6, 
+                          atol = 1e-8), nn
+
+def test_expressions_are_restricted():
+    assert evaluate_values({'pi': '1.02^.25', 'R': 'pi/0.98'}) == \
+        pytest.approx({'pi': 1.02**.25, 'R': 1.02**.25/0.98})
+    for expression in ('__import__("os")', 'pi.real', '[1][0]', 
+                       'exp(x = 1)'):
+        with pytest.raises(PresolveError):
+            evaluate_values({'pi': 1., 'x': expression})
+    with pytest.raises(PresolveError):
+        evaluate_values({'x': '1/0'})
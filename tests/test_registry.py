@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the results registry (rank_tank/registry.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank.registry import ResultsRegistry, check_tank_nests_rank
+from tests.conftest import rank_model, tank_model, shock
+
+###############################################################################
+###############################################################################
+
+def test_zero_steady_state_does_not_fail_nesting(monkeypatch):
+    registry = ResultsRegistry({'rank': rank_model, 'tank': tank_model})
+    variables = {'rank': ['y', 'bprof'], 'tank': ['y', 'bprof', 'chh']}
+    x_rank = np.array([[2., 0.], [2.01, 1e-12], [2., 0.]])
+    x_tank = np.column_stack((x_rank, [1., 1., 1.]))
+    x_tank[1, 1] = 2e-12 # Both zero up to numerical noise
+    monkeypatch.setattr(registry, 'handle', 
+                        lambda name: {'variables': variables[name]})
+    monkeypatch.setattr(registry, 'solve', lambda name, *args: 
+                        ({'rank': x_rank, 'tank': x_tank}[name], False, {}))
+    passed, deviations = check_tank_nests_rank(registry, shock)
+    assert passed
+    assert list(deviations['variable']) == ['y', 'bprof']
+
+def test_tank_without_hand_to_mouth_agents_is_rank(rank_handle, tank_handle):
+    registry = ResultsRegistry({'rank': rank_model, 'tank': tank_model})
+    registry._handles.update(rank = rank_handle, tank = tank_handle)
+    passed, deviations = check_tank_nests_rank(registry, shock)
+    assert passed, deviations.sort_values('max_deviation').tail()
+    assert {'c', 'y', 'bprof'} <= set(deviations['variable'])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the scenario files (rank_tank/scenarios.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import os
+import numpy as np
+import pytest
+from rank_tank.scenarios import load_scenarios, make_scenario, grid
+from tests.conftest import root
+
+###############################################################################
+###############################################################################
+
+def test_paper_scenarios(tmp_path):
+    scenarios = load_scenarios(os.path.join(root, 'scenarios', 'paper.yaml'), 
+                               base_directory = str(tmp_path))
+    kinds = {scenario['name']: scenario['kind'] for scenario in scenarios}
+    assert kinds == {'irfs': 'irf', 'sensitivity_technology': 'sweep', 
+                     'sensitivity_discount': 'sweep', 'zlb_stress': 'zlb', 
+                     'moments': 'simulation'}
+    scenarios = {scenario['name']: scenario for scenario in scenarios}
+    
+    irfs = scenarios['irfs']
+    assert irfs['shocks'] == [('e_z', 0.02), ('e_beta', 0.02)]
+    assert irfs['save_plots'] is True # From the defaults of the file
+    assert irfs['plot_directory'] == str(tmp_path/'plots')
+    
+    sweep = scenarios['sensitivity_discount']
+    assert sweep['shock'] == ('e_beta', 0.02) and sweep['workers'] is None
+    assert sweep['checkpoint'] == str(tmp_path/'results'/ 
+                                      'sensitivity_discount_checkpoint.jsonl')
+    assert sweep['queue'] == str(tmp_path/'results'/'sweep_queue.sqlite')
+    assert np.allclose(grid(sweep['eta']), [0.33, 0.48, 0.63, 0.78, 0.93, 1])
+    assert np.allclose(grid(sweep['lam']), np.arange(0.1, 0.46, 0.05))
+    
+    # Settings of the defaults which do not apply to a kind are ignored
+    assert 'save_plots' not in scenarios['zlb_stress']
+    assert scenarios['moments']['shock_sizes'] == {'e_z': 0.01, 
+                                                   'e_beta': 0.005}
+
+def test_make_scenario(tmp_path):
+    scenario = make_scenario({'kind': 'sweep', 'shock': ['e_z', 0.01], 
+                              'checkpoint': 'runs/checkpoint.jsonl'}, 
+                             base_directory = str(tmp_path))
+    assert scenario['name'] == 'sweep' and scenario['shock'] == ('e_z', 0.01)
+    assert scenario['checkpoint'] == str(tmp_path/'runs'/'checkpoint.jsonl')
+    assert scenario['mode'] == 'grid' # Default
+    with pytest.raises(KeyError):
+        make_scenario({'kind': 'irf', 'eta': [1.]})
+    with pytest.raises(ValueError):
+        make_scenario({'kind': 'hank'})
+
+def test_unique_names(tmp_path):
+    path = tmp_path/'scenarios.yaml'
+    path.write_text('scenarios:\n  - {name: a, kind: irf}\n'
+                    '  - {name: a, kind: zlb}\n')
+    with pytest.raises(ValueError):
+        load_scenarios(str(path))
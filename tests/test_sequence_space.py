@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the sequence-space Jacobians (rank_tank/sequence_space.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pytest
+from rank_tank.sequence_space import sequence_space_jacobian
+
+###############################################################################
+###############################################################################
+
+small_shock = ('e_beta', 0.001)
+
+@pytest.fixture
+def jacobian(tank_handle):
+    tank_handle.solve_stst({'eta': 0.48, 'lam': 0.2})
+    return sequence_space_jacobian(tank_handle, 100)
+
+def test_irf_matches_find_path(jacobian, tank_handle):
+    x, flag = tank_handle.find_path(small_shock, horizon = 100)
+    x_irf = jacobian.irf(small_shock)
+    
+    assert flag is False
+    assert x_irf.shape == x.shape
+    deviation = np.max(np.abs(np.asarray(x) - x[-1]))
+    assert np.max(np.abs(x_irf - x)) < 1e-2*deviation
+
+def test_nonlinear_path_matches_find_path(jacobian, tank_handle):
+    x, _ = tank_handle.find_path(('e_beta', 0.005), horizon = 100)
+    x_nonlinear, flag = jacobian.nonlinear_path(('e_beta', 0.005))
+    assert flag is False
+    assert np.allclose(x_nonlinear, x, atol = 1e-7)
+
+def test_irf_is_linear_in_the_shocks(jacobian, tank_handle):
+    assert sequence_space_jacobian(tank_handle, 100) is jacobian
+    news = jacobian.irf({'e_beta': [0., 0., 0.001]})
+    double = jacobian.irf(('e_beta', 0.002))
+    single = jacobian.irf(small_shock)
+    assert np.allclose(double - jacobian.xss, 2*(single - jacobian.xss))
+    assert not np.allclose(news[1:3], jacobian.xss) # Anticipated
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the stochastic simulation (rank_tank/simulation.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pytest
+from rank_tank.simulation import (draw_shocks, impulse_responses, 
+                                  simulate_linear, simulate_extended_path, 
+                                  simulated_moments, run_simulation)
+from rank_tank.sweep import worker_handle
+from tests.conftest import rank_model, tank_model
+
+###############################################################################
+###############################################################################
+
+sigmas = {'e_beta': 0.001}
+
+def test_extended_path_matches_linear_for_small_shocks(tank_handle):
+    tank_handle.solve_stst({'eta': 0.48, 'lam': 0.2})
+    draws = draw_shocks(tank_handle['shocks'], sigmas, n_draws = 3, 
+                        periods = 5)
+    irfs, xss = impulse_responses(tank_handle, 50)
+    linear = simulate_linear(irfs, draws)
+    nonlinear, failed = simulate_extended_path(tank_handle, draws, 50)
+    
+    assert irfs.shape == (49, len(xss), len(tank_handle['shocks']))
+    assert failed == 0
+    assert np.max(np.abs(nonlinear - linear)) < 5e-2*np.max(np.abs(linear))
+
+@pytest.mark.parametrize('method', ['linear', 'extended_path'])
+def test_run_simulation(method, executor):
+    moments, summary = run_simulation(rank_model, tank_model, sigmas, 
+                                      n_draws = 2, periods = 5, burn_in = 0, 
+                                      method = method, 
+                                      fixed_values = {'eta': 0.48, 
+                                                      'lam': 0.2}, 
+                                      executor = executor)
+    assert summary['error'].isna().all()
+    assert (summary['failed'] == 0).all()
+    assert np.isfinite(moments[('tank', 'std')]['c'])
+    
+    # Moments are finite also for variables with a zero steady state (such 
+    # as bprof in RANK); only the correlations of constant variables are not
+    for model in ('rank', 'tank'):
+        own = moments[model].loc[worker_handle(model)['variables']]
+        assert np.isfinite(own['std']).all()
+        assert np.isfinite(own[own['std'] > 0]).all().all()
+
+def test_moments_of_zero_steady_states():
+    variables = ['y', 'bprof', 'z', 'R']
+    xss = np.array([2., 0., 1., 1.005])
+    deviations = np.random.default_rng(0).normal(size = (3, 20, 4))*1e-3
+    deviations[..., 2] = 0. # z does not vary
+    with np.errstate(all = 'raise'):
+        moments, zlb = simulated_moments(variables, deviations, xss)
+    assert np.isclose(moments['std']['bprof'], 
+                      np.std(deviations[..., 1])*100)
+    assert moments['std']['z'] == 0 and np.isnan(moments.loc['z']).sum() == 2
+    assert np.isfinite(moments.drop('z')).all().all()
+    assert 0 <= zlb <= 1
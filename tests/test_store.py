@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the results store (rank_tank/store.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pandas as pd
+import pytest
+from rank_tank.store import ResultsStore, irf_tensor, store_irfs, store_surface
+
+###############################################################################
+###############################################################################
+
+def test_round_trip(tmp_path):
+    store = ResultsStore(str(tmp_path/'store'))
+    data = np.arange(24.).reshape(2, 3, 4)
+    coords = {'model': ['rank', 'tank'], 'shock': [['e_z', 0.02], 
+                                                  ['e_beta', 0.02], 
+                                                  ['e_beta', 0.05]], 
+              'time': [0, 1, 2, 3]}
+    store.write('irfs', data, ['model', 'shock', 'time'], coords, 
+                {'horizon': 4})
+    
+    stored = store.open('irfs')
+    assert isinstance(stored.data, np.memmap) and stored.shape == (2, 3, 4)
+    assert stored.attrs == {'horizon': 4} and store.names() == ['irfs']
+    assert np.array_equal(stored.data, data)
+    
+    # Single labels drop the dimension, lists of labels keep it (and tuples 
+    # compare equal to the stored lists)
+    part, dims = stored.select(model = 'tank', shock = ('e_beta', 0.02))
+    assert dims == ['time'] and np.array_equal(part, data[1, 1])
+    part, dims = stored.select(time = [3, 0])
+    assert dims == ['model', 'shock', 'time']
+    assert np.array_equal(part, data[..., [3, 0]])
+    with pytest.raises(KeyError):
+        stored.select(model = 'hank')
+    with pytest.raises(ValueError): # Labels do not match the shape
+        store.write('bad', data, ['model', 'shock', 'time'], 
+                    {**coords, 'time': [0, 1]})
+    
+    # Writing again replaces the result
+    store.write('irfs', data[:1], ['model', 'shock', 'time'], 
+                {**coords, 'model': ['rank']})
+    assert store.open('irfs').shape == (1, 3, 4)
+
+def test_irfs_and_surface(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    paths = {'rank': np.ones((1, 2, 3, 2)), # point x shock x time x variable
+             'tank': 2*np.ones((1, 2, 4, 3))}
+    variables = {'rank': ['y', 'c'], 'tank': ['c', 'chh', 'y']}
+    tensor, union = irf_tensor(paths, variables)
+    assert union == ['y', 'c', 'chh'] and tensor.shape == (2, 2, 1, 4, 3)
+    assert np.isnan(tensor[0, :, :, 3]).all() # Shorter RANK paths
+    assert np.isnan(tensor[0, ..., 2]).all() # chh is not a RANK variable
+    
+    stored = store_irfs(store, 'paths', paths, variables, 
+                        [('e_z', 0.02), ('e_beta', 0.02)], [{'eta': 1.}])
+    c_tank, dims = stored.select(model = 'tank', variable = 'c', 
+                                 point = {'eta': 1.})
+    assert dims == ['shock', 'time'] and (c_tank == 2).all()
+    
+    surface = pd.DataFrame([[1., 2.], [3., np.nan]], index = [0.1, 0.2], 
+                           columns = [0.5, 1.])
+    stored = store_surface(store, 'surface', surface)
+    assert stored.coords == {'lam': [0.1, 0.2], 'eta': [0.5, 1.]}
+    assert np.array_equal(stored.data, surface.to_numpy(), equal_nan = True)
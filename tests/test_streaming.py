@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the streaming sweep (rank_tank/streaming.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+import pandas as pd
+from rank_tank.sweep import run_sweep
+from rank_tank.streaming import (grid_points, RecordWriter, read_records, 
+                                 stream_sweep, run_streaming_sweep)
+from tests.conftest import rank_model, tank_model, shock, lambda_sequence
+
+###############################################################################
+###############################################################################
+
+def test_grid_points():
+    points = grid_points({'eta': [0.5, 1], 'h': [0.4, 0.6]})
+    assert next(points) == {'eta': 0.5, 'h': 0.4}
+    assert list(points) == [{'eta': 0.5, 'h': 0.6}, {'eta': 1., 'h': 0.4}, 
+                            {'eta': 1., 'h': 0.6}]
+
+def test_record_writer(tmp_path):
+    path = str(tmp_path/'records.csv')
+    with RecordWriter(path, chunk_size = 2, columns = ['eta', 'impact']) \
+            as writer:
+        for ii in range(5):
+            writer.write({'eta': ii, 'impact': ii/10, 'x': np.ones(3)})
+    assert writer.written == 5
+    chunks = list(read_records(path, chunk_size = 3))
+    assert [len(chunk) for chunk in chunks] == [3, 2]
+    frame = pd.concat(chunks, ignore_index = True)
+    assert list(frame.columns) == ['eta', 'impact'] # Not the paths
+    assert np.allclose(frame['impact'], np.arange(5)/10)
+
+def test_stream_matches_batch_sweep(executor, tmp_path):
+    etas = [0.5, 1.]
+    expected, _ = run_sweep(rank_model, tank_model, etas, lambda_sequence, 
+                            shock, continuation = True, horizon = 100, 
+                            executor = executor)
+    records = list(stream_sweep(rank_model, tank_model, {'eta': etas}, 
+                                lambda_sequence, shock, horizon = 100, 
+                                executor = executor))
+    assert len(records) == len(etas)*(1 + len(lambda_sequence))
+    streamed = pd.DataFrame([rr for rr in records if rr['model'] == 'tank'])
+    streamed = streamed.pivot(index = 'lam', columns = 'eta', 
+                              values = 'relative')
+    assert np.allclose(streamed.loc[expected.index, expected.columns], 
+                       expected)
+    
+    # The same records through the file
+    _, report = run_streaming_sweep(rank_model, tank_model, {'eta': etas}, 
+                                    lambda_sequence, shock, 
+                                    str(tmp_path/'records.csv'), 
+                                    horizon = 100, executor = executor)
+    assert report['points'] == {'rank': len(etas), 
+                                'tank': len(etas)*len(lambda_sequence)}
+    assert report['failed'] == {}
+    written = pd.concat(read_records(report['records']))
+    assert np.allclose(np.sort(written['relative'].dropna()), 
+                       np.sort(expected.to_numpy().ravel()))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the sweep over eta and lambda (rank_tank/sweep.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank.sweep import solve_point, solve_lambda_ray, run_sweep
+from tests.conftest import rank_model, tank_model, shock, lambda_sequence
+
+###############################################################################
+###############################################################################
+
+def test_solve_point(executor):
+    record, guess = solve_point('tank', {'lam': 0.2}, shock, 'c', 1)
+    assert record['flag'] is False
+    assert record['reason'] is None and record['error'] is None
+    assert np.isfinite(record['impact'])
+    assert set(guess) == {'stst', 'x'}
+
+def test_second_lambda_point_is_warm_started(executor, tank_handle, 
+                                             monkeypatch):
+    tank = tank_handle
+    guesses, solve = [], tank.solve
+    def recording_solve(*args, **kwargs):
+        guesses.append(kwargs.get('guess'))
+        return solve(*args, **kwargs)
+    monkeypatch.setattr(tank, 'solve', recording_solve)
+    
+    records = solve_lambda_ray({}, lambda_sequence, shock, 'c', 1)
+    assert [rr['reason'] for rr in records] == [None]*3
+    assert guesses[0] is None
+    assert guesses[1] is not None # From the solved point lam = 0.2
+    assert np.isclose(guesses[1]['stst']['lam'], 0.2)
+    assert records[2]['steps'] == 1
+
+def test_warm_start_matches_cold_solve(executor):
+    cold, _ = solve_point('tank', {'lam': 0.25}, shock, 'c', 1)
+    _, guess = solve_point('tank', {'lam': 0.2}, shock, 'c', 1)
+    warm, _ = solve_point('tank', {'lam': 0.25}, shock, 'c', 1, guess)
+    assert warm['reason'] is None
+    assert np.isclose(warm['impact'], cold['impact'], rtol = 1e-6)
+
+def test_executor_solve_points(executor):
+    rank, tank = executor.solve_points([(1., 0.2)], shock)
+    assert rank[1.]['flag'] is False
+    assert [rr['lam'] for rr in tank] == [0.2]
+
+def test_run_sweep(executor):
+    frame, records = run_sweep(rank_model, tank_model, [1.], lambda_sequence, 
+                               shock, continuation = True, 
+                               executor = executor)
+    assert frame.shape == (2, 1)
+    assert np.isfinite(frame.values).all()
+    assert all(rr['reason'] is None for rr in records)
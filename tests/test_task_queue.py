@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the work queue of the sweep (rank_tank/task_queue.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import json
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from rank_tank import sweep, task_queue
+from rank_tank.checkpoint import point_key
+from rank_tank.task_queue import (TaskQueue, sweep_tasks, run_queue_worker, 
+                                  reduce_sweep, run_queue_sweep)
+from tests.conftest import rank_model, tank_model, shock, lambda_sequence
+
+###############################################################################
+###############################################################################
+
+def test_task_keys():
+    pytest.importorskip('econpizza')
+    tasks = sweep_tasks(rank_model, tank_model, [0.5, 1.], lambda_sequence, 
+                        shock, horizon = 100)
+    keys = [key for key, _ in tasks]
+    assert len(set(keys)) == len(keys) == 2*(1 + len(lambda_sequence))
+    other = sweep_tasks(rank_model, tank_model, [0.5, 1.], lambda_sequence, 
+                        shock, horizon = 150)
+    assert not set(keys) & {key for key, _ in other}
+
+def worker_handles(tasks, stale = False):
+    """Replacement of `worker_handle` returning handles with the model hash 
+    of the tasks (or another one, if `stale`), without loading the models."""
+    hashes = {payload['model']: payload['model_hash'] for _, payload in tasks}
+    return lambda name: SimpleNamespace(model_hash = 'stale' if stale else 
+                                        hashes[name])
+
+def test_worker_counts_successes(tmp_path, monkeypatch):
+    pytest.importorskip('econpizza')
+    tasks = sweep_tasks(rank_model, tank_model, [1.], lambda_sequence, shock)
+    def solve_task(payload): # The RANK task fails
+        if payload['model'] == 'rank':
+            raise RuntimeError('failed')
+        return {'model_hash': payload['model_hash'], 'reason': None}
+    monkeypatch.setattr(task_queue, '_init_worker', lambda *args: None)
+    monkeypatch.setattr(task_queue, 'worker_handle', worker_handles(tasks))
+    monkeypatch.setattr(task_queue, 'solve_task', solve_task)
+    
+    path = str(tmp_path/'queue.sqlite')
+    TaskQueue(path).publish(tasks)
+    assert run_queue_worker(path, rank_model, tank_model, 
+                            max_attempts = 2, poll = 0.) == \
+        len(lambda_sequence)
+    counts = TaskQueue(path).counts()
+    assert counts['done'] == len(lambda_sequence) and counts['failed'] == 1
+
+def test_stale_worker(tmp_path, monkeypatch):
+    pytest.importorskip('econpizza')
+    tasks = sweep_tasks(rank_model, tank_model, [1.], lambda_sequence, shock)
+    solved = []
+    def solve_task(payload):
+        solved.append(payload)
+        return {'model_hash': payload['model_hash'], 'reason': None}
+    monkeypatch.setattr(task_queue, '_init_worker', lambda *args: None)
+    monkeypatch.setattr(task_queue, 'solve_task', solve_task)
+    
+    path = str(tmp_path/'queue.sqlite')
+    TaskQueue(path, max_attempts = 1).publish(tasks)
+    
+    # A worker with another model claims none of the tasks and stops
+    monkeypatch.setattr(task_queue, 'worker_handle', 
+                        worker_handles(tasks, stale = True))
+    assert run_queue_worker(path, rank_model, tank_model, max_attempts = 1, 
+                            poll = 0.) == 0
+    assert not solved and TaskQueue(path).counts()['pending'] == len(tasks)
+    
+    # A worker with the model of the tasks solves all of them
+    monkeypatch.setattr(task_queue, 'worker_handle', worker_handles(tasks))
+    assert run_queue_worker(path, rank_model, tank_model, max_attempts = 1, 
+                            poll = 0.) == len(tasks) == len(solved)
+    assert TaskQueue(path).counts()['done'] == len(tasks)
+
+def test_stale_task_does_not_stop_workers(tmp_path, monkeypatch):
+    pytest.importorskip('econpizza')
+    tasks = sweep_tasks(rank_model, tank_model, [1.], lambda_sequence, shock)
+    monkeypatch.setattr(task_queue, '_init_worker', lambda *args: None)
+    monkeypatch.setattr(task_queue, 'worker_handle', worker_handles(tasks))
+    monkeypatch.setattr(task_queue, 'solve_task', lambda payload: { 
+        'model_hash': payload['model_hash'], 'reason': None})
+    
+    # A task left from a run with another version of the model comes first
+    key, payload = tasks[0]
+    path = str(tmp_path/'queue.sqlite')
+    queue = TaskQueue(path)
+    queue.publish([('old' + key, dict(payload, model_hash = 'oldhash'))])
+    queue.publish(tasks)
+    
+    # Each worker solves the tasks of its model and leaves the stale one
+    for expected in (len(tasks), 0):
+        assert run_queue_worker(path, rank_model, tank_model, poll = 0.) == \
+            expected
+        assert queue.finished([key for key, _ in tasks])
+        assert queue.unfinished() == ['old' + key]
+
+def test_queue_sweep(executor, tmp_path, monkeypatch):
+    init_worker = task_queue._init_worker
+    def keep_handles(*args): # Do not compile the models again
+        handles = dict(sweep._worker_handles)
+        init_worker(*args)
+        sweep._worker_handles.update(handles)
+    monkeypatch.setattr(task_queue, '_init_worker', keep_handles)
+    
+    path = str(tmp_path/'queue.sqlite')
+    queue = TaskQueue(path)
+    tasks = sweep_tasks(rank_model, tank_model, [1.], lambda_sequence, shock, 
+                        horizon = 100)
+    queue.publish(tasks)
+    assert run_queue_worker(path, rank_model, tank_model, poll = 0.) == \
+        len(tasks)
+    
+    frame, records = reduce_sweep(queue, rank_model, tank_model, [1.], 
+                                  lambda_sequence, shock, horizon = 100)
+    assert {json.dumps(point_key(rr)) for rr in records} == \
+        {key for key, _ in tasks}
+    expected, _ = sweep.run_sweep(rank_model, tank_model, [1.], 
+                                  lambda_sequence, shock, horizon = 100, 
+                                  executor = executor)
+    assert np.allclose(frame, expected)
+
+def test_queue_sweep_without_workers_times_out(tmp_path):
+    pytest.importorskip('econpizza')
+    with pytest.raises(RuntimeError, match = 'not finished'):
+        run_queue_sweep(rank_model, tank_model, str(tmp_path/'queue.sqlite'), 
+                        [1.], lambda_sequence, shock, workers = 0, poll = 0., 
+                        timeout = 0.)
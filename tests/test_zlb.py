@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: Andreas Koundouros [koundouros.andreas@gmail.com]
+"""
+
+###############################################################################
+###############################################################################
+# Tests of the ZLB stress test (rank_tank/zlb.py)
+###############################################################################
+###############################################################################
+
+# Import packages
+import numpy as np
+from rank_tank.zlb import zlb_spell, ShockPaths, bracket_zlb, run_zlb_stress
+from tests.conftest import rank_model, tank_model
+
+###############################################################################
+###############################################################################
+
+def test_bracket_finds_the_binding_size(rank_handle):
+    # Known size: the notional rate reaches the bound between these sizes
+    rank_handle.solve_stst()
+    sizes, min_Rn = [0.06, 0.07], []
+    for size in sizes:
+        x, flag = rank_handle.find_path(('e_beta', size), horizon = 100)
+        assert flag is False
+        min_Rn.append(zlb_spell(rank_handle['variables'], 
+                                np.asarray(x))['min_Rn'])
+    assert min_Rn[0] > 1. > min_Rn[1]
+    known = np.interp(1., min_Rn[::-1], sizes[::-1])
+    
+    paths = ShockPaths(rank_handle, 'e_beta', horizon = 100)
+    low, high = bracket_zlb(paths, 0.03, 0.1, tol = 1e-3)
+    assert high - low <= 1e-3
+    assert low - 1e-3 < known < high + 1e-3
+    assert len(paths.solved) > 2 # The converged paths are kept as warm starts
+    assert paths.solve(high)['binding'] and not paths.solve(low)['binding']
+
+def test_run_zlb_stress(executor):
+    records, brackets = run_zlb_stress(rank_model, tank_model, ['e_beta'], 
+                                       [0.01, 0.1], horizon = 100, 
+                                       bracket = False, executor = executor)
+    assert records['error'].isna().all()
+    assert not records['flag'].any()
+    binding = records.set_index(['model', 'size'])['binding']
+    assert not binding[('rank', 0.01)] and binding[('rank', 0.1)]
+    assert list(brackets['model']) == ['rank', 'tank']